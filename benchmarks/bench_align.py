@@ -0,0 +1,219 @@
+#!/usr/bin/env python
+# coding: utf-8
+"""
+Benchmarks alignment on synthetic comparable documents.
+
+Measures dictionary and model load times and, for every document size and
+aligner engine, the alignment latency, the number of sentence pairs scored
+per second and the peak memory. The alignments must be the same for all the
+engines and, with --compare, the same as in the compared results (see
+`alignments_digest`).
+
+Usage:
+    bench_align.py [options]
+
+Options:
+  -s --sizes=<sizes>      Comma separated document sizes [default: 10,25,50,100]
+  -r --repeat=<repeat>    Repetitions of each measure, the best is kept [default: 3]
+  --span=<span>           Scrambling span of the documents [default: 10]
+  --noise=<noise>         Fraction of unrelated sentences in document B [default: 0.2]
+  --seed=<seed>           Random seed [default: 0]
+  -o --output=<file>      Save the results as json to <file>
+  -c --compare=<file>     Compare the results with the ones saved in <file>
+"""
+
+import os
+import sys
+import hashlib
+import shutil
+import tempfile
+
+from docopt import docopt
+
+from yalign.evaluation import F_score
+from yalign.yalignmodel import YalignModel
+from yalign.wordpairscore import WordPairScore
+from yalign.sequencealigner import SequenceAligner
+from yalign.sentencepairscore import SentencePairScore
+from yalign.train_data_generation import training_alignments_from_documents
+
+from common import best_of, peak_memory, save_results, load_results, \
+    print_results, compare
+from synthetic import synthetic_dictionary, synthetic_parallel_documents, \
+    synthetic_comparable_documents
+
+TRAINING_SIZE = 200
+OPTIMIZATION_SIZE = 40
+
+
+class ExhaustiveAligner(object):
+    """
+    Dynamic programming aligner that scores every pair of sentences, with
+    the same costs as `SequenceAligner`. It finds an optimal alignment too,
+    so both must give the same alignments.
+    """
+    def __init__(self, score, gap_penalty):
+        self.score = score
+        self.penalty = gap_penalty
+
+    def __call__(self, xs, ys, score=None, penalty=None):
+        if score is None:
+            score = self.score
+        if penalty is None:
+            penalty = self.penalty
+        N, M = len(xs), len(ys)
+        # cost[i][j] is the cost of aligning xs[i:] and ys[j:]
+        cost = [[0.0] * (M + 1) for _ in xrange(N + 1)]
+        move = [[None] * (M + 1) for _ in xrange(N + 1)]
+        for i in xrange(N, -1, -1):
+            for j in xrange(M, -1, -1):
+                options = []
+                if i < N and j < M:
+                    w = score(xs[i], ys[j])
+                    options.append((w + cost[i + 1][j + 1], (i, j, w)))
+                if i < N:
+                    options.append((penalty + cost[i + 1][j],
+                                    (i, None, penalty)))
+                if j < M:
+                    options.append((penalty + cost[i][j + 1],
+                                    (None, j, penalty)))
+                if options:
+                    cost[i][j], move[i][j] = min(options,
+                                                 key=lambda x: x[0])
+        path = []
+        i = j = 0
+        while move[i][j] is not None:
+            a, b, w = move[i][j]
+            path.append(move[i][j])
+            i = i + 1 if a is not None else i
+            j = j + 1 if b is not None else j
+        return path
+
+
+ENGINES = {
+    "astar": SequenceAligner,
+    "exhaustive": ExhaustiveAligner,
+}
+
+
+class CountingScore(object):
+    def __init__(self, score):
+        self.score = score
+        self.calls = 0
+
+    def __call__(self, a, b):
+        self.calls += 1
+        return self.score(a, b)
+
+
+def train_model(dictionary, seed):
+    A, B = synthetic_parallel_documents(TRAINING_SIZE, seed=seed)
+    sentence_pair_score = SentencePairScore()
+    training = training_alignments_from_documents(A, B, seed=seed)
+    sentence_pair_score.train(training, dictionary)
+    model = YalignModel(SequenceAligner(sentence_pair_score, 0.1), 1.0)
+    A, B, alignments = synthetic_comparable_documents(OPTIMIZATION_SIZE,
+                                                      seed=seed + 1)
+    # A deterministic search, so no global random state is needed
+    model.optimize_gap_penalty_and_threshold(A, B, alignments,
+                                             optimizer="grid")
+    return model
+
+
+def bench_loading(tmpdir, dictionary_path, model, repeat):
+    dictionary_seconds, _ = best_of(repeat, WordPairScore, dictionary_path)
+    model_path = os.path.join(tmpdir, "model")
+    os.mkdir(model_path)
+    model.save(model_path)
+    model_seconds, _ = best_of(repeat, YalignModel.load, model_path)
+    return {
+        "dictionary_load_seconds": dictionary_seconds,
+        "model_load_seconds": model_seconds,
+    }
+
+
+def alignments_digest(alignments):
+    """
+    Returns a hash of the sentence indexes of `alignments`, stored with the
+    results to check that later runs give the same alignments.
+    """
+    data = ";".join("{},{}".format(a, b) for a, b, _ in alignments)
+    return hashlib.sha1(data).hexdigest()
+
+
+def bench_alignment(model, engine, size, repeat, span, noise, seed):
+    A, B, real = synthetic_comparable_documents(size, span, noise, seed=seed)
+    score = CountingScore(model.sentence_pair_score)
+    aligner = engine(score, model.document_pair_aligner.penalty)
+    engine_model = YalignModel(aligner, model.threshold)
+    seconds, alignments = best_of(repeat, engine_model.align_costs, A, B)
+    calls = score.calls / repeat
+    memory, _ = peak_memory(engine_model.align_costs, A, B)
+    predicted = [(a, b) for a, b, _ in alignments]
+    F, precision, recall = F_score(predicted, real)
+    result = {
+        "align_seconds": seconds,
+        "scored_pairs": calls,
+        "pairs_per_second": calls / seconds if seconds else 0.0,
+        "peak_memory_bytes": memory,
+        "alignments": len(alignments),
+        "alignments_digest": alignments_digest(alignments),
+        "F": F,
+        "precision": precision,
+        "recall": recall,
+    }
+    return result, alignments
+
+
+def main(args):
+    sizes = [int(x) for x in args["--sizes"].split(",")]
+    repeat = int(args["--repeat"])
+    span = int(args["--span"])
+    noise = float(args["--noise"])
+    seed = int(args["--seed"])
+
+    tmpdir = tempfile.mkdtemp()
+    try:
+        dictionary_path = os.path.join(tmpdir, "dictionary.csv")
+        entries = synthetic_dictionary(dictionary_path, seed=seed)
+        model = train_model(WordPairScore(dictionary_path), seed)
+        results = {"loading": bench_loading(tmpdir, dictionary_path, model,
+                                            repeat)}
+        results["loading"]["dictionary_entries"] = entries
+    finally:
+        shutil.rmtree(tmpdir)
+
+    old = load_results(args["--compare"]) if args["--compare"] else {}
+    mismatches = []
+    for size in sizes:
+        reference = None
+        for name, engine in sorted(ENGINES.items()):
+            result, alignments = bench_alignment(model, engine, size, repeat,
+                                                 span, noise, seed)
+            case = "align {} n={}".format(name, size)
+            results[case] = result
+            if reference is None:
+                reference = alignments
+            elif alignments != reference:
+                mismatches.append("Engine {} gives different alignments than "
+                                  "the others for n={}".format(name, size))
+            previous = old.get(case, {}).get("alignments_digest")
+            if previous is not None and \
+                    previous != result["alignments_digest"]:
+                mismatches.append("Engine {} gives different alignments than "
+                                  "in {} for n={}".format(
+                                      name, args["--compare"], size))
+
+    print_results(results, sys.stdout)
+    if args["--output"]:
+        save_results(args["--output"], "align", results)
+    if old:
+        compare(old, results, sys.stdout)
+    if mismatches:
+        for mismatch in mismatches:
+            sys.stderr.write(mismatch + "\n")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main(docopt(__doc__))
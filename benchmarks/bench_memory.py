@@ -0,0 +1,99 @@
+#!/usr/bin/env python
+# coding: utf-8
+"""
+Benchmarks the memory used by the documents of a corpus loaded as lists of
+Sentences and as compact `Document`s, and the time to load and to iterate
+them.
+
+The size of the documents is the sum of `sys.getsizeof` of every object
+reachable from them, words shared between sentences counted once.
+
+Usage:
+    bench_memory.py [options]
+
+Options:
+  --corpus=<file>         Parallel corpus or tmx file [default: ../tests/data/parallel-en-es.txt]
+  --lang-a=<lang>         Language A of a tmx corpus [default: en]
+  --lang-b=<lang>         Language B of a tmx corpus [default: es]
+  -r --repeat=<repeat>    Repetitions of each measure, the best is kept [default: 3]
+  -o --output=<file>      Save the results as json to <file>
+  -c --compare=<file>     Compare the results with the ones saved in <file>
+"""
+
+import sys
+from array import array
+
+from docopt import docopt
+
+from yalign.datatypes import Document, Vocabulary
+from yalign.input_conversion import parallel_corpus_to_documents, \
+    tmx_file_to_documents
+
+from common import best_of, save_results, load_results, print_results, \
+    compare
+
+
+def deep_size(obj, seen=None):
+    """ Bytes used by `obj` and every list, dict or object it holds. """
+    if seen is None:
+        seen = set()
+    if id(obj) in seen:
+        return 0
+    seen.add(id(obj))
+    size = sys.getsizeof(obj)
+    if isinstance(obj, (list, tuple)):
+        size += sum(deep_size(x, seen) for x in obj)
+    elif isinstance(obj, dict):
+        size += sum(deep_size(k, seen) + deep_size(v, seen)
+                    for k, v in obj.iteritems())
+    elif isinstance(obj, (Document, Vocabulary)) or \
+            hasattr(obj, "__dict__") and not isinstance(obj, array):
+        size += deep_size(obj.__dict__, seen)
+    return size
+
+
+def load(filepath, lang_a, lang_b, compact):
+    if filepath.endswith(".tmx"):
+        return tmx_file_to_documents(filepath, lang_a, lang_b,
+                                     compact=compact)
+    return parallel_corpus_to_documents(filepath, compact=compact)
+
+
+def iterate(documents):
+    return sum(len(sentence) for document in documents
+               for sentence in document)
+
+
+def main(args):
+    repeat = int(args["--repeat"])
+    filepath = args["--corpus"]
+    results = {}
+    reference = None
+    for name, compact in (("lists", False), ("compact", True)):
+        seconds, documents = best_of(repeat, load, filepath, args["--lang-a"],
+                                     args["--lang-b"], compact)
+        iterate_seconds, words = best_of(repeat, iterate, documents)
+        results[name] = {
+            "load_seconds": seconds,
+            "iterate_seconds": iterate_seconds,
+            "bytes": deep_size(documents),
+            "sentences": sum(len(document) for document in documents),
+            "words": words,
+        }
+        if reference is None:
+            reference = documents
+        elif [list(x) for x in documents] != [list(x) for x in reference]:
+            sys.stderr.write("The compact documents differ from the lists\n")
+            sys.exit(1)
+    results["compact"]["bytes_ratio"] = \
+        results["compact"]["bytes"] / float(results["lists"]["bytes"])
+
+    print_results(results, sys.stdout)
+    if args["--output"]:
+        save_results(args["--output"], "memory", results)
+    if args["--compare"]:
+        compare(load_results(args["--compare"]), results, sys.stdout)
+
+
+if __name__ == "__main__":
+    main(docopt(__doc__))
@@ -0,0 +1,76 @@
+#!/usr/bin/env python
+# coding: utf-8
+"""
+Benchmarks the startup time of the command line scripts and of importing
+the yalign modules, each one in a new python process.
+
+Usage:
+    bench_startup.py [options]
+
+Options:
+  -r --repeat=<repeat>    Repetitions of each measure, the best is kept [default: 5]
+  -o --output=<file>      Save the results as json to <file>
+  -c --compare=<file>     Compare the results with the ones saved in <file>
+"""
+
+import os
+import sys
+import subprocess
+
+from docopt import docopt
+
+from common import best_of, save_results, load_results, print_results, \
+    compare
+
+SCRIPTS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                            os.pardir, "scripts")
+MODULES = [
+    "yalign",
+    "yalign.input_conversion",
+    "yalign.yalignmodel",
+    "yalign.evaluation",
+    "yalign.writers",
+]
+HEAVY_MODULES = ["nltk", "sklearn", "bs4", "html5lib", "lxml", "numpy"]
+REPORT_MODULES = ("import sys; print ' '.join(m for m in {!r} "
+                  "if m in sys.modules)").format(HEAVY_MODULES)
+
+
+def run(command):
+    with open(os.devnull, "w") as devnull:
+        if subprocess.call(command, stdout=devnull) != 0:
+            raise RuntimeError("{} failed".format(" ".join(command)))
+
+
+def loaded_modules(module):
+    command = [sys.executable, "-c",
+               "import {}; {}".format(module, REPORT_MODULES)]
+    return subprocess.check_output(command).strip()
+
+
+def main(args):
+    repeat = int(args["--repeat"])
+    results = {}
+    for name in sorted(os.listdir(SCRIPTS_PATH)):
+        command = [sys.executable, os.path.join(SCRIPTS_PATH, name), "--help"]
+        seconds, _ = best_of(repeat, run, command)
+        results["script {}".format(name)] = {"help_seconds": seconds}
+    for module in MODULES:
+        command = [sys.executable, "-c", "import {}".format(module)]
+        seconds, _ = best_of(repeat, run, command)
+        results["import {}".format(module)] = {
+            "import_seconds": seconds,
+            "heavy_modules_loaded": loaded_modules(module),
+        }
+    seconds, _ = best_of(repeat, run, [sys.executable, "-c", "pass"])
+    results["python"] = {"startup_seconds": seconds}
+
+    print_results(results, sys.stdout)
+    if args["--output"]:
+        save_results(args["--output"], "startup", results)
+    if args["--compare"]:
+        compare(load_results(args["--compare"]), results, sys.stdout)
+
+
+if __name__ == "__main__":
+    main(docopt(__doc__))
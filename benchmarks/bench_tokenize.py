@@ -0,0 +1,79 @@
+#!/usr/bin/env python
+# coding: utf-8
+"""
+Benchmarks the tokenizers of every language on a synthetic text.
+
+Measures the tokens per second of the compiled tokenizers used by yalign
+and of NLTK's `RegexpTokenizer` with the same rules as a plain regular
+expression alternation. Both must return the same tokens.
+
+Usage:
+    bench_tokenize.py [options]
+
+Options:
+  -w --words=<words>      Words of the text [default: 100000]
+  -r --repeat=<repeat>    Repetitions of each measure, the best is kept [default: 3]
+  --seed=<seed>           Random seed [default: 0]
+  -o --output=<file>      Save the results as json to <file>
+  -c --compare=<file>     Compare the results with the ones saved in <file>
+"""
+
+import sys
+
+from docopt import docopt
+from nltk.tokenize import RegexpTokenizer
+
+from yalign.tokenizers import FLAGS, languages, rules_to_regex, get_tokenizer
+
+from common import best_of, save_results, load_results, \
+    print_results, compare
+from synthetic import synthetic_text
+
+
+def nltk_tokenizer(language):
+    regex = rules_to_regex(languages[language], trie=False)
+    return RegexpTokenizer(regex, flags=FLAGS)
+
+
+ENGINES = {
+    "compiled": get_tokenizer,
+    "nltk": nltk_tokenizer,
+}
+
+
+def main(args):
+    words = int(args["--words"])
+    repeat = int(args["--repeat"])
+    text = synthetic_text(words, seed=int(args["--seed"]))
+
+    results = {}
+    mismatches = []
+    for language in sorted(languages):
+        reference = None
+        for name, engine in sorted(ENGINES.items()):
+            tokenizer = engine(language)
+            seconds, tokens = best_of(repeat, tokenizer.tokenize, text)
+            results["tokenize {} {}".format(name, language)] = {
+                "tokenize_seconds": seconds,
+                "tokens": len(tokens),
+                "tokens_per_second": len(tokens) / seconds if seconds else 0.0,
+            }
+            if reference is None:
+                reference = tokens
+            elif tokens != reference:
+                mismatches.append((name, language))
+
+    print_results(results, sys.stdout)
+    if args["--output"]:
+        save_results(args["--output"], "tokenize", results)
+    if args["--compare"]:
+        compare(load_results(args["--compare"]), results, sys.stdout)
+    if mismatches:
+        for name, language in mismatches:
+            sys.stderr.write("Engine {} gives different tokens for "
+                             "{}\n".format(name, language))
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main(docopt(__doc__))
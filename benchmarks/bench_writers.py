@@ -0,0 +1,153 @@
+#!/usr/bin/env python
+# coding: utf-8
+"""
+Benchmarks writing translation units to a tmx file with the tmx writer,
+plain and gzip compressed, and with the previous writer, that built every
+unit with lxml and filled it in with string replacements.
+
+The output is discarded (only its size is measured) unless --keep is given.
+
+Usage:
+    bench_writers.py [options]
+
+Options:
+  -n --units=<units>      Number of translation units [default: 10000000]
+  --legacy-units=<units>  Number of units for the previous writer, which is much slower [default: 1000000]
+  --seed=<seed>           Random seed [default: 0]
+  --keep=<folder>         Write the outputs to files in <folder>
+  -o --output=<file>      Save the results as json to <file>
+  -c --compare=<file>     Compare the results with the ones saved in <file>
+"""
+
+import os
+import sys
+import gzip
+import random
+from string import letters
+
+from docopt import docopt
+
+from yalign.writers import TMXWriter, COMPRESS_LEVEL
+
+from common import timed, save_results, load_results, print_results, \
+    compare
+from synthetic import synthetic_parallel_documents
+
+DISTINCT_PAIRS = 1000
+
+
+class LegacyTMXWriter(TMXWriter):
+    """ The tmx writer as it was before it used templates. """
+    def begin(self):
+        from lxml.builder import ElementMaker
+        from lxml import etree
+        self.maker = ElementMaker()
+        self.token = "".join(random.sample(letters * 3, 50))
+        self.token_a = "".join(random.sample(letters * 3, 50))
+        self.token_b = "".join(random.sample(letters * 3, 50))
+        header = self.maker.header(srclang=self.language_a,
+                                   segtype="sentence",
+                                   creationtool="MTrans",
+                                   datatype="PlainText")
+        self.stream.write("<?xml version=\"1.0\" ?>\n")
+        self.stream.write("<!DOCTYPE tmx SYSTEM \"tmx14.dtd\">\n")
+        self.stream.write("<tmx version=\"1.4\">\n")
+        self.stream.write(etree.tostring(header, encoding="utf-8"))
+        self.stream.write("\n<body>\n")
+
+    def write(self, doc_index, sentence_a, sentence_b, cost=None):
+        from lxml import etree
+        maker = self.maker
+        src_tuv = maker.tuv({self.token: self.language_a},
+                            maker.seg(self.token_a))
+        tgt_tuv = maker.tuv({self.token: self.language_b},
+                            maker.seg(self.token_b))
+        tu = maker.tu(src_tuv, tgt_tuv)
+        tu_text = etree.tostring(tu, encoding="utf-8",
+                                 pretty_print=True)
+        tu_text = tu_text.replace(self.token, "xml:lang")
+        if sentence_a and sentence_b:
+            tu_text = tu_text.replace(self.token_a, sentence_a.to_text())
+            tu_text = tu_text.replace(self.token_b, sentence_b.to_text())
+        self.stream.write(tu_text)
+        self.count += 1
+
+    def end(self):
+        self.stream.write("</body>\n</tmx>")
+        self.stream.flush()
+
+
+class CountingStream(object):
+    """ A file like object that only counts the bytes written. """
+    def __init__(self):
+        self.size = 0
+
+    def write(self, data):
+        self.size += len(data)
+
+    def flush(self):
+        pass
+
+    def close(self):
+        pass
+
+
+def records(pairs, n):
+    for i in xrange(n):
+        a, b = pairs[i % len(pairs)]
+        yield i // 20, a, b, 0.0
+
+
+def write(writer_class, pairs, n, filepath, compress):
+    if filepath is None:
+        output = CountingStream()
+    else:
+        output = open(filepath, "wb")
+    stream = output
+    if compress:
+        stream = gzip.GzipFile(fileobj=output, mode="wb",
+                               compresslevel=COMPRESS_LEVEL)
+    with writer_class(stream, "en", "es") as writer:
+        writer.write_records(records(pairs, n))
+    stream.close()
+    if filepath is not None:
+        output.close()
+        return os.path.getsize(filepath)
+    return output.size
+
+
+def main(args):
+    n = int(args["--units"])
+    legacy_n = int(args["--legacy-units"])
+    seed = int(args["--seed"])
+    A, B = synthetic_parallel_documents(DISTINCT_PAIRS, seed=seed)
+    pairs = zip(A, B)
+    cases = [
+        ("tmx", TMXWriter, n, False),
+        ("tmx gzip", TMXWriter, n, True),
+        ("legacy tmx", LegacyTMXWriter, legacy_n, False),
+    ]
+    results = {}
+    for name, writer_class, units, compress in cases:
+        filepath = None
+        if args["--keep"]:
+            filepath = os.path.join(args["--keep"], name.replace(" ", "-") +
+                                    (".tmx.gz" if compress else ".tmx"))
+        seconds, size = timed(write, writer_class, pairs, units, filepath,
+                              compress)
+        results[name] = {
+            "units": units,
+            "seconds": seconds,
+            "units_per_second": units / seconds if seconds else 0.0,
+            "output_bytes": size,
+        }
+
+    print_results(results, sys.stdout)
+    if args["--output"]:
+        save_results(args["--output"], "writers", results)
+    if args["--compare"]:
+        compare(load_results(args["--compare"]), results, sys.stdout)
+
+
+if __name__ == "__main__":
+    main(docopt(__doc__))
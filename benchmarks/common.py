@@ -0,0 +1,137 @@
+# -*- coding: utf-8 -*-
+"""
+Helpers shared by the benchmarks: timing, memory measurement and storage and
+comparison of results.
+"""
+
+import gc
+import json
+import time
+import platform
+import resource
+import multiprocessing
+
+try:
+    import tracemalloc
+except ImportError:
+    tracemalloc = None
+
+
+def timed(f, *args, **kwargs):
+    """ Returns `(seconds, result)` of calling `f(*args, **kwargs)`. """
+    gc.collect()
+    start = time.time()
+    result = f(*args, **kwargs)
+    return time.time() - start, result
+
+
+def best_of(repeat, f, *args, **kwargs):
+    """ Returns `(best_seconds, result)` of `repeat` calls to `f`. """
+    best = None
+    for _ in xrange(repeat):
+        seconds, result = timed(f, *args, **kwargs)
+        if best is None or seconds < best:
+            best = seconds
+    return best, result
+
+
+def peak_memory(f, *args, **kwargs):
+    """
+    Returns `(peak_bytes, result)` of calling `f(*args, **kwargs)`.
+    Uses tracemalloc when available. Otherwise `f` runs in a new forked
+    process, that starts with the memory of this one as its peak, and the
+    peak is the increase of its maximum resident set size. The result must
+    be picklable.
+    """
+    gc.collect()
+    if tracemalloc is not None:
+        tracemalloc.start()
+        try:
+            result = f(*args, **kwargs)
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+        return peak, result
+    results = multiprocessing.Queue()
+    process = multiprocessing.Process(target=_peak_memory_child,
+                                      args=(results, f, args, kwargs))
+    process.start()
+    ok, value = results.get()
+    process.join()
+    if not ok:
+        raise value
+    return value
+
+
+def _peak_memory_child(results, f, args, kwargs):
+    try:
+        before = _max_rss()
+        result = f(*args, **kwargs)
+        results.put((True, (_max_rss() - before, result)))
+    except Exception as error:
+        results.put((False, error))
+
+
+def _max_rss():
+    # ru_maxrss is in kilobytes on linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def environment():
+    return {
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "time": time.strftime("%Y-%m-%d %H:%M:%S"),
+        "memory": "tracemalloc" if tracemalloc is not None else
+            "maxrss of a new process",
+    }
+
+
+def save_results(filepath, name, results):
+    """
+    Saves `results` (a dict of flat `{measure: value}` dicts) as json.
+    """
+    data = {"benchmark": name, "environment": environment(),
+            "results": results}
+    with open(filepath, "w") as output:
+        json.dump(data, output, indent=4, sort_keys=True)
+
+
+def load_results(filepath):
+    with open(filepath) as inputfile:
+        return json.load(inputfile)["results"]
+
+
+def print_results(results, stream):
+    for case in sorted(results):
+        stream.write("{}\n".format(case))
+        for measure, value in sorted(results[case].iteritems()):
+            stream.write("    {:32}{}\n".format(measure, _format(value)))
+
+
+def compare(old, new, stream):
+    """
+    Writes the ratio new / old of every numeric measure present in both
+    `old` and `new` results.
+    """
+    for case in sorted(new):
+        if case not in old:
+            continue
+        stream.write("{}\n".format(case))
+        for measure, value in sorted(new[case].iteritems()):
+            previous = old[case].get(measure)
+            if not _is_number(value) or not _is_number(previous):
+                continue
+            ratio = value / float(previous) if previous else float("nan")
+            stream.write("    {:32}{:>14}{:>14}{:>10.2f}x\n".format(
+                         measure, _format(previous), _format(value), ratio))
+
+
+def _is_number(x):
+    return isinstance(x, (int, long, float)) and not isinstance(x, bool)
+
+
+def _format(value):
+    if isinstance(value, float):
+        return "{:.6g}".format(value)
+    return str(value)
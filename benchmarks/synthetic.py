@@ -0,0 +1,116 @@
+# -*- coding: utf-8 -*-
+"""
+Generators of synthetic dictionaries and documents of controlled size for
+the benchmarks.
+
+Words of language A are `w<n>` and their translations in language B are
+`t<n>`. Everything is generated from a fixed seed so that runs are
+comparable.
+"""
+
+import csv
+import random
+
+from yalign.datatypes import Sentence
+from yalign.train_data_generation import training_scrambling_from_documents
+
+VOCABULARY_SIZE = 5000
+MIN_SENTENCE_LENGTH = 5
+MAX_SENTENCE_LENGTH = 25
+TEXT_EXTRAS = [u"don't", u"I'd've", u"John's", u"12:30", u"10/23/1984",
+               u"tom@example.com", u"http://example.com/a?b=1", u":-)",
+               u"XD", u"R&B", u"well-known", u"(", u")", u"\"", u"...",
+               u"¿", u"¡"]
+
+
+def _word(rng, vocabulary_size):
+    # Zipf like distribution of words
+    return int(rng.paretovariate(1.1)) % vocabulary_size
+
+
+def synthetic_dictionary(filepath, vocabulary_size=VOCABULARY_SIZE, seed=0):
+    """
+    Writes a word scores csv file with one to three translations for every
+    word of the vocabulary. Returns the number of entries written.
+    """
+    rng = random.Random(seed)
+    writer = csv.writer(open(filepath, "w"))
+    n = 0
+    for i in xrange(vocabulary_size):
+        writer.writerow(["w%d" % i, "t%d" % i, 0.5 + rng.random() / 2])
+        n += 1
+        for _ in xrange(rng.randint(0, 2)):
+            j = rng.randint(0, vocabulary_size - 1)
+            writer.writerow(["w%d" % i, "t%d" % j, rng.random() / 2])
+            n += 1
+    return n
+
+
+def synthetic_parallel_documents(n, vocabulary_size=VOCABULARY_SIZE, seed=0,
+                                 word_noise=0.2):
+    """
+    Returns two documents of `n` sentences that are translations of each
+    other. `word_noise` is the probability of a word not being translated
+    literally.
+    """
+    rng = random.Random(seed)
+    document_a = []
+    document_b = []
+    for _ in xrange(n):
+        length = rng.randint(MIN_SENTENCE_LENGTH, MAX_SENTENCE_LENGTH)
+        words = [_word(rng, vocabulary_size) for _ in xrange(length)]
+        translation = []
+        for word in words:
+            if rng.random() < word_noise:
+                if rng.random() < 0.5:
+                    continue
+                word = _word(rng, vocabulary_size)
+            translation.append(word)
+        if not translation:
+            translation = words[:1]
+        document_a.append(Sentence(u"w%d" % x for x in words))
+        document_b.append(Sentence(u"t%d" % x for x in translation))
+    return document_a, document_b
+
+
+def synthetic_comparable_documents(n, span=10, noise=0.2,
+                                   vocabulary_size=VOCABULARY_SIZE, seed=0):
+    """
+    Returns `(document_a, document_b, alignments)` where the documents have
+    `n` sentences scrambled in sections of up to `span` sentences, and a
+    fraction `noise` of the sentences of document B are not translations of
+    document A (so they are not in `alignments`).
+    """
+    A, B = synthetic_parallel_documents(n, vocabulary_size, seed)
+    _, unrelated = synthetic_parallel_documents(n, vocabulary_size, seed + 1)
+    rng = random.Random(seed)
+    replaced = set(rng.sample(xrange(n), int(n * noise)))
+    B = [unrelated[i] if i in replaced else x for i, x in enumerate(B)]
+    unrelated = set(id(B[i]) for i in replaced)
+    A, B, alignments = training_scrambling_from_documents(A, B, span,
+                                                          seed=seed)
+    alignments = [(i, j) for i, j in alignments
+                  if j is None or id(B[j]) not in unrelated]
+    return A, B, alignments
+
+
+def synthetic_text(n, vocabulary_size=VOCABULARY_SIZE, seed=0, extras=0.1):
+    """
+    Returns a unicode text of about `n` words, in sentences, where a
+    fraction `extras` of the words are things the tokenizers have special
+    rules for (contractions, dates, urls, smileys, ...).
+    """
+    rng = random.Random(seed)
+    sentences = []
+    words = 0
+    while words < n:
+        length = rng.randint(MIN_SENTENCE_LENGTH, MAX_SENTENCE_LENGTH)
+        sentence = []
+        for _ in xrange(length):
+            if rng.random() < extras:
+                sentence.append(rng.choice(TEXT_EXTRAS))
+            else:
+                sentence.append(u"w%d" % _word(rng, vocabulary_size))
+        sentences.append(u" ".join(sentence) + rng.choice(u".?!,;"))
+        words += length
+    return u" ".join(sentences)
@@ -0,0 +1,142 @@
+# -*- coding: utf-8 -*-
+
+import os
+import shutil
+import tempfile
+import unittest
+
+import nltk
+
+from yalign import input_conversion
+from yalign.cache import DocumentCache, cache_key
+from yalign.datatypes import Sentence
+from yalign.input_conversion import text_to_document, tmx_file_to_documents, \
+    set_document_cache, document_cache
+
+base_path = os.path.dirname(os.path.abspath(__file__))
+data_path = os.path.join(base_path, "data")
+
+
+class FailingSplitter(object):
+    def tokenize(self, text):
+        raise AssertionError("The cached document wasn't used")
+
+
+class TestDocumentCache(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.cache = DocumentCache(self.tmpdir)
+        self.documents = [
+            [Sentence([u"Hola", u",", u"señor"], text=u"Hola, señor"),
+             Sentence([u"¿", u"qué", u"tal", u"?"])],
+            [],
+            [Sentence([]), Sentence([u"a", u"", u"b"])],
+        ]
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def test_round_trip(self):
+        key = cache_key(u"text", u"señor")
+        self.cache.put(key, self.documents)
+        documents = self.cache.get(key)
+        self.assertEqual(self.documents, documents)
+        self.assertEqual(u"Hola, señor", documents[0][0].text)
+        self.assertIsNone(documents[0][1].text)
+        self.assertTrue(all(isinstance(x, Sentence) for x in documents[0]))
+        self.assertEqual((1, 0), (self.cache.hits, self.cache.misses))
+
+    def test_miss(self):
+        self.assertIsNone(self.cache.get(cache_key("missing")))
+        self.assertEqual((0, 1), (self.cache.hits, self.cache.misses))
+
+    def test_corrupt_entry(self):
+        key = cache_key("corrupt")
+        self.cache.put(key, self.documents)
+        with open(self.cache._path(key), "wb") as output:
+            output.write("garbage")
+        self.assertIsNone(self.cache.get(key))
+        self.cache.put(key, self.documents)
+        self.assertEqual(self.documents, self.cache.get(key))
+
+    def test_key(self):
+        self.assertEqual(cache_key(u"ñ", "a"), cache_key(u"ñ", "a"))
+        self.assertNotEqual(cache_key("ab", "c"), cache_key("a", "bc"))
+
+
+class TestTransparentCache(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        set_document_cache(self.tmpdir)
+        self.splitters = dict(input_conversion._sentence_splitters)
+        self.sources = dict(input_conversion._sentence_splitter_sources)
+
+    def tearDown(self):
+        set_document_cache(None)
+        shutil.rmtree(self.tmpdir)
+        input_conversion._sentence_splitters.clear()
+        input_conversion._sentence_splitters.update(self.splitters)
+        input_conversion._sentence_splitter_sources.clear()
+        input_conversion._sentence_splitter_sources.update(self.sources)
+
+    def test_text_to_document(self):
+        text = u"Hello world. This is a test.\n\nAnother one."
+        document = text_to_document(text, "en")
+        self.assertEqual(0, document_cache().hits)
+        input_conversion._sentence_splitters["en"] = FailingSplitter()
+        self.assertEqual(document, text_to_document(text.encode("utf-8"),
+                                                    "en"))
+        self.assertEqual(1, document_cache().hits)
+
+    def test_splitter_is_part_of_the_key(self):
+        text = u"Hello world. This is a test."
+        text_to_document(text, "en")
+        input_conversion._sentence_splitters["en"] = FailingSplitter()
+        input_conversion._sentence_splitter_sources["en"] = "other"
+        self.assertRaises(AssertionError, text_to_document, text, "en")
+
+    def test_nltk_version_is_part_of_the_key(self):
+        input_conversion._sentence_splitter_sources.pop("en", None)
+        key = input_conversion._preprocessing_key("text", u"a", ["en"], True)
+        self.assertTrue(input_conversion._sentence_splitter_sources["en"]
+                        .startswith("nltk " + nltk.__version__))
+        input_conversion._sentence_splitter_sources["en"] = "nltk 0.0"
+        self.assertNotEqual(key, input_conversion._preprocessing_key(
+                            "text", u"a", ["en"], True))
+
+    def test_unwritable_cache(self):
+        # A cache directory under a file can't be created
+        filepath = os.path.join(self.tmpdir, "file")
+        open(filepath, "w").close()
+        set_document_cache(os.path.join(filepath, "cache"))
+        text = u"Hello world. This is a test."
+        self.assertEqual(2, len(text_to_document(text, "en")))
+        filepath = os.path.join(data_path, "corpus-en-es.tmx")
+        self.assertTrue(tmx_file_to_documents(filepath, "en", "es")[0])
+
+    def test_tmx_file_to_documents(self):
+        filepath = os.path.join(data_path, "corpus-en-es.tmx")
+        set_document_cache(None)
+        expected = tmx_file_to_documents(filepath, "en", "es")
+        set_document_cache(self.tmpdir)
+        self.assertEqual(expected, tmx_file_to_documents(filepath, "en", "es"))
+        self.assertEqual(expected, tmx_file_to_documents(filepath, "en", "es"))
+        self.assertEqual(1, document_cache().hits)
+        compact = tmx_file_to_documents(filepath, "en", "es", compact=True)
+        self.assertEqual(list(expected), list(compact))
+        self.assertEqual(2, document_cache().hits)
+        swapped = tmx_file_to_documents(filepath, "es", "en")
+        self.assertEqual(expected, swapped[::-1])
+        self.assertEqual(2, document_cache().hits)
+
+    def test_environment(self):
+        os.environ[input_conversion.CACHE_ENVIRONMENT_VARIABLE] = self.tmpdir
+        try:
+            input_conversion._document_cache_configured = False
+            self.assertEqual(self.tmpdir, document_cache().directory)
+        finally:
+            del os.environ[input_conversion.CACHE_ENVIRONMENT_VARIABLE]
+
+
+if __name__ == "__main__":
+    unittest.main()
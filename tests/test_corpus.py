@@ -0,0 +1,139 @@
+# -*- coding: utf-8 -*-
+
+import os
+import time
+import random
+import shutil
+import tempfile
+import unittest
+
+from yalign import corpus
+from yalign.corpus import corpus_index, ParallelCorpusIndex, TMXIndex
+from yalign.parallel import make_pool
+from yalign.input_conversion import parallel_corpus_to_documents, \
+    tmx_file_to_documents
+
+base_path = os.path.dirname(os.path.abspath(__file__))
+data_path = os.path.join(base_path, "data")
+
+
+def _index_length(filepath):
+    return len(ParallelCorpusIndex(filepath))
+
+
+class TestParallelCorpusIndex(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.filepath = os.path.join(self.tmpdir, "corpus.txt")
+        shutil.copy(os.path.join(data_path, "parallel-en-es.txt"),
+                    self.filepath)
+        self.A, self.B = parallel_corpus_to_documents(self.filepath)
+        self.index = corpus_index(self.filepath)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def test_length(self):
+        self.assertIsInstance(self.index, ParallelCorpusIndex)
+        self.assertEqual(len(self.A), len(self.index))
+
+    def test_documents(self):
+        self.assertEqual((self.A, self.B), self.index.documents(0, 250))
+        self.assertEqual((self.A[17:42], self.B[17:42]),
+                         self.index.documents(17, 25))
+        self.assertEqual(([], []), self.index.documents(250, 0))
+        self.assertRaises(IndexError, self.index.documents, 240, 11)
+
+    def test_index_is_reused(self):
+        self.assertTrue(os.path.exists(self.filepath + ".index"))
+        mtime = os.path.getmtime(self.filepath + ".index")
+        index = ParallelCorpusIndex(self.filepath)
+        self.assertEqual(mtime, os.path.getmtime(self.filepath + ".index"))
+        self.assertEqual((self.A[3:5], self.B[3:5]), index.documents(3, 2))
+
+    def test_index_is_rebuilt(self):
+        with open(self.filepath, "w") as output:
+            output.write("a b\nc d\ne\nf\n")
+        os.utime(self.filepath, (time.time() + 10, time.time() + 10))
+        index = ParallelCorpusIndex(self.filepath)
+        self.assertEqual(2, len(index))
+        self.assertEqual([[u"e"]], index.documents(1, 1)[0])
+
+    def test_concurrent_builds(self):
+        index_path = self.filepath + ".index"
+        os.remove(index_path)
+        pool = make_pool(4, processes=True)
+        try:
+            lengths = pool.map(_index_length, [self.filepath] * 4)
+        finally:
+            pool.terminate()
+            pool.join()
+        self.assertEqual([len(self.A)] * 4, lengths)
+        self.assertEqual(["corpus.txt", "corpus.txt.index"],
+                         sorted(os.listdir(self.tmpdir)))
+        self.assertEqual(len(self.A), len(ParallelCorpusIndex(self.filepath)))
+
+    def test_indexes_implement_the_abstract_methods(self):
+        class Incomplete(corpus.CorpusIndex):
+            def _offsets(self):
+                return iter([0])
+        self.assertRaises(TypeError, Incomplete, self.filepath)
+
+    def test_unwritable_index(self):
+        index_path = os.path.join(self.tmpdir, "missing", "corpus.index")
+        index = ParallelCorpusIndex(self.filepath, index_path)
+        self.assertFalse(os.path.exists(index_path))
+        self.assertEqual((self.A[:3], self.B[:3]), index.documents(0, 3))
+
+    def test_random_documents(self):
+        rng = random.Random(1)
+        documents = self.index.random_documents(5, 30, rng)
+        starts = set()
+        for _ in xrange(50):
+            A, B = documents.next()
+            self.assertTrue(5 <= len(A) <= 30)
+            self.assertEqual(len(A), len(B))
+            start = self.A.index(A[0])
+            self.assertEqual(self.B[start:start + len(B)], B)
+            starts.add(start)
+        self.assertGreater(len(starts), 10)
+        self.assertGreater(max(starts), 100)
+
+    def test_corpus_too_small(self):
+        documents = self.index.random_documents(251, 300)
+        self.assertRaises(ValueError, documents.next)
+
+
+class TestTMXIndex(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.filepath = os.path.join(self.tmpdir, "corpus.tmx")
+        shutil.copy(os.path.join(data_path, "corpus-en-es.tmx"),
+                    self.filepath)
+        self.A, self.B = tmx_file_to_documents(self.filepath, "en", "es")
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def test_documents(self):
+        index = corpus_index(self.filepath, "en", "es")
+        self.assertIsInstance(index, TMXIndex)
+        self.assertEqual(20, len(index))
+        self.assertEqual((self.A, self.B), index.documents(0, 20))
+        self.assertEqual((self.A[5:9], self.B[5:9]), index.documents(5, 4))
+        swapped = corpus_index(self.filepath, "es", "en")
+        self.assertEqual((self.B[19:], self.A[19:]), swapped.documents(19, 1))
+
+    def test_small_reads(self):
+        read_size = corpus.READ_SIZE
+        corpus.READ_SIZE = 7
+        try:
+            index = TMXIndex(self.filepath, "en", "es")
+        finally:
+            corpus.READ_SIZE = read_size
+        self.assertEqual(20, len(index))
+        self.assertEqual((self.A[10:], self.B[10:]), index.documents(10, 10))
+
+
+if __name__ == "__main__":
+    unittest.main()
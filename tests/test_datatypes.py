@@ -0,0 +1,82 @@
+# -*- coding: utf-8 -*-
+
+import pickle
+import unittest
+
+from yalign.datatypes import Sentence, Document, Vocabulary
+
+
+class TestVocabulary(unittest.TestCase):
+    def test_ids(self):
+        vocabulary = Vocabulary([u"a", u"b", u"a"])
+        self.assertEqual(2, len(vocabulary))
+        self.assertEqual(1, vocabulary.id(u"b"))
+        self.assertEqual(2, vocabulary.id(u"c"))
+        self.assertEqual(u"c", vocabulary[2])
+        self.assertIn(u"c", vocabulary)
+        self.assertNotIn(u"d", vocabulary)
+
+
+class TestDocument(unittest.TestCase):
+    def setUp(self):
+        self.sentences = [
+            Sentence([u"Hola", u",", u"señor", u"."], text=u"Hola, señor."),
+            Sentence([]),
+            Sentence([u"¿", u"Qué", u"tal", u"?"], text=u"¿Qué tal?"),
+            Sentence([u"señor"]),
+        ]
+        self.document = Document(self.sentences)
+
+    def test_sentences(self):
+        self.assertEqual(4, len(self.document))
+        self.assertEqual(self.sentences, list(self.document))
+        for expected, sentence in zip(self.sentences, self.document):
+            self.assertIsInstance(sentence, Sentence)
+            self.assertEqual(expected.text, sentence.text)
+            self.assertEqual(expected.to_text(), sentence.to_text())
+
+    def test_equality(self):
+        self.assertEqual(self.sentences, self.document)
+        self.assertEqual(self.document, self.sentences)
+        self.assertEqual(Document(self.sentences), self.document)
+        self.assertNotEqual(self.sentences[:3], self.document)
+        self.assertNotEqual(self.document, None)
+
+    def test_indexing(self):
+        self.assertEqual(self.sentences[-1], self.document[-1])
+        self.assertEqual(self.sentences[1:3], self.document[1:3])
+        self.assertEqual(self.sentences[::-1], self.document[::-1])
+        self.assertRaises(IndexError, lambda: self.document[4])
+        self.assertRaises(IndexError, lambda: self.document[-5])
+
+    def test_interned_words(self):
+        self.assertEqual(8, len(self.document.vocabulary))
+        self.assertIs(self.document[0][2], self.document[3][0])
+        ids = self.document.sentence_ids(3)
+        self.assertEqual([self.document.vocabulary.id(u"señor")], list(ids))
+
+    def test_spans(self):
+        text = u"Hola, señor. ¿Qué tal?"
+        document = Document(text=text)
+        document.append(self.sentences[0], (0, 12))
+        document.append(self.sentences[2], (13, 22))
+        document.append(Sentence([u"x"], text=u"x"))
+        self.assertEqual(u"Hola, señor.", document[0].text)
+        self.assertEqual(u"¿Qué tal?", document[1].text)
+        self.assertEqual(u"x", document[2].text)
+        self.assertEqual(text + u"x", document.text)
+
+    def test_shared_vocabulary(self):
+        other = Document([Sentence([u"señor", u"Pepe"])],
+                         vocabulary=self.document.vocabulary)
+        self.assertEqual(9, len(self.document.vocabulary))
+        self.assertIs(self.document[3][0], other[0][0])
+
+    def test_pickle(self):
+        document = pickle.loads(pickle.dumps(self.document, -1))
+        self.assertEqual(self.sentences, document)
+        self.assertEqual(u"¿Qué tal?", document[2].text)
+
+
+if __name__ == "__main__":
+    unittest.main()
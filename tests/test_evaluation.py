@@ -2,10 +2,13 @@
 
 import os
 import random
+import shutil
 import tempfile
 import unittest
 import subprocess
 
+import numpy
+
 from yalign import yalignmodel
 from yalign.evaluation import *
 from yalign.yalignmodel import YalignModel
@@ -45,6 +48,12 @@ class TestFScore(unittest.TestCase):
         self.assertAlmostEqual(1, F_score([1, 2], [1, 2])[0], delta=delta)
         self.assertAlmostEquals(0.5, F_score([1, 2], [1])[0], delta=delta)
 
+    def test_tuples(self):
+        xs = [(0, 0), (1, 2), (2, 1)]
+        ys = [(0, 0), (1, 1), (2, 1), (3, 3)]
+        self.assertAlmostEqual(2 / 3., precision(xs, ys))
+        self.assertAlmostEqual(.5, recall(xs, ys))
+
     def test_beta_value(self):
         # Should get a perfect score:
         self.assertEquals(1, F_score([1], [1], beta=1)[0])
@@ -55,6 +64,47 @@ class TestFScore(unittest.TestCase):
         self.assertTrue(a < b)
 
 
+class TestVectorizedScores(unittest.TestCase):
+    def setUp(self):
+        random.seed(hash("Vectors, Victor"))
+        self.real = []
+        self.predicted = []
+        for _ in xrange(30):
+            n = random.randint(0, 20)
+            real = [(i, i) for i in xrange(n)]
+            predicted = [(i, random.choice([i, i + 1]), random.random())
+                         for i in xrange(random.randint(0, 20))]
+            self.real.append(real)
+            self.predicted.append(predicted)
+
+    def test_same_as_F_score(self):
+        xss = [[(a, b) for a, b, _ in xs] for xs in self.predicted]
+        scores = F_scores(xss, self.real)
+        self.assertEqual((30, 3), scores.shape)
+        for xs, ys, score in zip(xss, self.real, scores):
+            for x, y in zip(F_score(xs, ys), score):
+                self.assertAlmostEqual(x, y)
+
+    def test_thresholds(self):
+        thresholds = [0, 0.25, 0.5, 1]
+        counts = threshold_counts(self.predicted, self.real, thresholds)
+        self.assertEqual((30, 4, 3), counts.shape)
+        scores = scores_from_counts(counts)
+        for i, (xs, ys) in enumerate(zip(self.predicted, self.real)):
+            for j, t in enumerate(thresholds):
+                expected = F_score([(a, b) for a, b, c in xs if c <= t], ys)
+                for x, y in zip(expected, scores[i, j]):
+                    self.assertAlmostEqual(x, y)
+
+    def test_micro_average(self):
+        counts = [alignment_counts([1, 2], [1]), alignment_counts([3], [3, 4])]
+        self.assertEqual([(1, 2, 1), (1, 1, 2)], counts)
+        F, p, r = scores_from_counts(numpy.sum(counts, 0), beta=1)
+        self.assertAlmostEqual(2 / 3., p)
+        self.assertAlmostEqual(2 / 3., r)
+        self.assertAlmostEqual(2 / 3., F)
+
+
 class BaseTestPercentage(object):
     cmdline = None
 
@@ -146,6 +196,79 @@ class TestClassifierPrecision(unittest.TestCase):
                                      self.model)
         self.assertTrue(0.0 <= value <= 100.0)
 
+    def test_parallel_folds(self):
+        serial = classifier_precision(self.document_a, self.document_b,
+                                      self.model, workers=1, seed=3)
+        parallel = classifier_precision(self.document_a, self.document_b,
+                                        self.model, workers=2, seed=3)
+        self.assertEqual(serial, parallel)
+        sampled = classifier_precision(self.document_a, self.document_b,
+                                       self.model, k=5, workers=1, seed=3,
+                                       max_samples=40)
+        self.assertTrue(0.0 <= sampled <= 100.0)
+
+
+class TestCrossValidation(unittest.TestCase):
+    def setUp(self):
+        self.targets = numpy.array([True] * 30 + [False] * 12)
+
+    def test_stratified_folds(self):
+        folds = stratified_folds(self.targets, 5, random.Random(1))
+        self.assertEqual(range(42), sorted(numpy.concatenate(folds)))
+        for fold in folds:
+            self.assertEqual(6, self.targets[fold].sum())
+            self.assertIn(len(fold), (8, 9))
+
+    def test_stratified_sample(self):
+        sample = stratified_sample(self.targets, 14, random.Random(1))
+        self.assertEqual(14, len(sample))
+        self.assertEqual(10, self.targets[sample].sum())
+        self.assertEqual(len(sample), len(set(sample)))
+
+    def test_cross_validation(self):
+        rng = numpy.random.RandomState(1)
+        vectors = numpy.concatenate([rng.normal(1, 0.1, (30, 2)),
+                                     rng.normal(-1, 0.1, (12, 2))])
+        for workers in (1, 2):
+            score = cross_validation(vectors, self.targets, 5, workers,
+                                     random.Random(1))
+            self.assertEqual(1.0, score)
+        self.assertRaises(ValueError, cross_validation, vectors,
+                          self.targets, 1)
+
+class TestEvaluate(unittest.TestCase):
+    def setUp(self):
+        word_scores = os.path.join(data_path, "test_word_scores_big.csv")
+        # A copy, evaluate writes an index next to the corpus
+        self.tmpdir = tempfile.mkdtemp()
+        self.parallel_corpus = os.path.join(self.tmpdir, "parallel-en-es.txt")
+        shutil.copy(os.path.join(data_path, "parallel-en-es.txt"),
+                    self.parallel_corpus)
+        A, B = parallel_corpus_to_documents(self.parallel_corpus)
+        training = training_alignments_from_documents(A[:30], B[:30],
+                                                      seed=1)
+        sentence_pair_score = SentencePairScore()
+        sentence_pair_score.train(training, WordPairScore(word_scores))
+        self.model = YalignModel(SequenceAligner(sentence_pair_score, 0.49))
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def test_stats(self):
+        stats = evaluate(self.parallel_corpus, self.model, 4, seed=7)
+        for key in ("max", "mean", "std", "micro"):
+            self.assertEqual((3,), stats[key].shape)
+        self.assertEqual((4,), stats["seconds"].shape)
+        self.assertTrue((stats["seconds"] >= 0).all())
+
+    def test_parallel_trials_are_reproducible(self):
+        serial = evaluate(self.parallel_corpus, self.model, 4, seed=7)
+        parallel = evaluate(self.parallel_corpus, self.model, 4, workers=2,
+                            seed=7)
+        for key in ("max", "mean", "std", "micro"):
+            self.assertTrue(numpy.allclose(serial[key], parallel[key]))
+
+
 class TestClassification(unittest.TestCase):
 
     def test_correlation_values(self):
@@ -0,0 +1,153 @@
+# -*- coding: utf-8 -*-
+
+import os
+import time
+import shutil
+import tempfile
+import threading
+import unittest
+from SocketServer import ThreadingMixIn
+from BaseHTTPServer import HTTPServer, BaseHTTPRequestHandler
+
+from yalign.fetcher import Fetcher, FetchError
+from yalign.utils import read_from_url
+
+DELAY = 0.3
+
+
+class Server(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+
+
+class Handler(BaseHTTPRequestHandler):
+    # Keep-alive
+    protocol_version = "HTTP/1.1"
+
+    def setup(self):
+        BaseHTTPRequestHandler.setup(self)
+        self.server.connections += 1
+
+    def do_GET(self):
+        self.server.requests += 1
+        if self.path.startswith("/page/"):
+            self.respond(200, "Page " + self.path[len("/page/"):])
+        elif self.path == "/slow":
+            time.sleep(DELAY)
+            self.respond(200, "Slow")
+        elif self.path == "/redirect":
+            self.respond(302, "", {"Location": "/page/moved"})
+        elif self.path == "/loop":
+            self.respond(301, "", {"Location": "/loop"})
+        elif self.path == "/big":
+            self.respond(200, "x" * 1000)
+        elif self.path == "/chunked":
+            self.send_response(200)
+            self.send_header("Transfer-Encoding", "chunked")
+            self.end_headers()
+            for _ in xrange(10):
+                self.wfile.write("64\r\n" + "y" * 100 + "\r\n")
+            self.wfile.write("0\r\n\r\n")
+        else:
+            self.respond(404, "Not found")
+
+    def respond(self, status, body, headers={}):
+        self.send_response(status)
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in headers.iteritems():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class TestFetcher(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.server = Server(("127.0.0.1", 0), Handler)
+        thread = threading.Thread(target=cls.server.serve_forever)
+        thread.daemon = True
+        thread.start()
+        cls.url = "http://127.0.0.1:{}".format(cls.server.server_address[1])
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+
+    def setUp(self):
+        self.server.connections = 0
+        self.server.requests = 0
+        self.fetcher = Fetcher(timeout=5, max_size=500)
+        self.tmpdir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        self.fetcher.close()
+        shutil.rmtree(self.tmpdir)
+
+    def test_fetch(self):
+        self.assertEqual("Page 1", self.fetcher.fetch(self.url + "/page/1"))
+        self.assertEqual("Page 2", read_from_url(self.url + "/page/2",
+                                                 self.fetcher))
+
+    def test_keep_alive(self):
+        for i in xrange(5):
+            self.fetcher.fetch(self.url + "/page/{}".format(i))
+        self.assertEqual(5, self.server.requests)
+        self.assertEqual(1, self.server.connections)
+
+    def test_redirects(self):
+        self.assertEqual("Page moved",
+                         self.fetcher.fetch(self.url + "/redirect"))
+        with self.assertRaises(FetchError):
+            self.fetcher.fetch(self.url + "/loop")
+
+    def test_errors(self):
+        with self.assertRaises(FetchError) as context:
+            self.fetcher.fetch(self.url + "/missing")
+        self.assertEqual(404, context.exception.status)
+        self.assertRaises(FetchError, self.fetcher.fetch, "ftp://example.com/")
+        self.assertRaises(FetchError, self.fetcher.fetch,
+                          "http://127.0.0.1:1/")
+
+    def test_max_size(self):
+        self.assertRaises(FetchError, self.fetcher.fetch, self.url + "/big")
+        self.assertRaises(FetchError, self.fetcher.fetch,
+                          self.url + "/chunked")
+        self.assertEqual("Page 1", self.fetcher.fetch(self.url + "/page/1"))
+
+    def test_timeout(self):
+        fetcher = Fetcher(timeout=DELAY / 3)
+        try:
+            self.assertRaises(FetchError, fetcher.fetch, self.url + "/slow")
+        finally:
+            fetcher.close()
+
+    def test_fetch_many(self):
+        urls = [self.url + "/slow"] * 4 + [self.url + "/missing"]
+        start = time.time()
+        with Fetcher(workers=4) as fetcher:
+            results = list(fetcher.fetch_many(urls))
+        self.assertLess(time.time() - start, DELAY * 3)
+        self.assertEqual(urls, [x[0] for x in results])
+        self.assertEqual(["Slow"] * 4 + [None], [x[1] for x in results])
+        self.assertIsInstance(results[-1][2], FetchError)
+        self.assertEqual(["Slow"], self.fetcher.fetch_all(urls[:1]))
+        self.assertRaises(FetchError, self.fetcher.fetch_all, urls[-1:])
+
+    def test_cache(self):
+        fetcher = Fetcher(cache_directory=self.tmpdir)
+        try:
+            self.assertEqual("Page 1", fetcher.fetch(self.url + "/page/1"))
+            self.assertEqual("Page 1", fetcher.fetch(self.url + "/page/1"))
+            self.assertRaises(FetchError, fetcher.fetch,
+                              self.url + "/missing")
+        finally:
+            fetcher.close()
+        self.assertEqual(2, self.server.requests)
+        self.assertEqual(1, len(os.listdir(self.tmpdir)))
+
+
+if __name__ == "__main__":
+    unittest.main()
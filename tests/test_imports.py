@@ -0,0 +1,46 @@
+# -*- coding: utf-8 -*-
+
+import os
+import sys
+import subprocess
+import unittest
+
+import yalign
+
+base_path = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def loaded_modules(code):
+    """ Runs `code` in a new interpreter and returns the modules loaded. """
+    env = dict(os.environ)
+    env["PYTHONPATH"] = os.pathsep.join([base_path,
+                                         env.get("PYTHONPATH", "")])
+    code += "\nimport sys\nprint ' '.join(sys.modules)"
+    output = subprocess.check_output([sys.executable, "-c", code], env=env)
+    return set(name.split(".")[0] for name in output.split())
+
+
+class TestLazyImports(unittest.TestCase):
+    heavy = set(["nltk", "sklearn", "bs4", "html5lib", "lxml"])
+
+    def test_package(self):
+        self.assertFalse(self.heavy & loaded_modules("import yalign"))
+
+    def test_modules(self):
+        modules = loaded_modules("import yalign.yalignmodel, "
+                                 "yalign.input_conversion, yalign.writers, "
+                                 "yalign.evaluation")
+        self.assertFalse(self.heavy & modules)
+
+    def test_exports(self):
+        from yalign import YalignModel, basic_model, html_to_document, \
+            text_to_document, srt_to_document
+        from yalign.yalignmodel import YalignModel as Model
+        self.assertIs(Model, YalignModel)
+        self.assertIs(yalign.YalignModel, YalignModel)
+        self.assertIn("text_to_document", dir(yalign))
+        self.assertRaises(AttributeError, getattr, yalign, "nothing")
+
+
+if __name__ == "__main__":
+    unittest.main()
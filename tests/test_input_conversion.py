@@ -3,14 +3,20 @@
 
 import os
 import codecs
+import shutil
+import pickle
 import tempfile
 import unittest
 from StringIO import StringIO
 
-from yalign.datatypes import Sentence
+from yalign.datatypes import Sentence, Document
 from yalign.input_conversion import tokenize, text_to_document, \
-    html_to_document, parallel_corpus_to_documents, tmx_file_to_documents, \
-    srt_to_document
+    html_to_document, html_to_text, html_paragraphs, texts_to_documents, \
+    parallel_corpus_to_documents, tmx_file_to_documents, srt_to_document, \
+    iter_tmx, iter_tmx_language_pairs, tmx_file_to_language_pair_documents, \
+    save_sentence_splitter, load_sentence_splitter, save_sentence_splitters, \
+    load_sentence_splitters
+from yalign import input_conversion
 
 
 base_path = os.path.dirname(os.path.abspath(__file__))
@@ -101,13 +107,13 @@ class TestTokenizationEs3(BaseTestTokenization, unittest.TestCase):
     expected = u"www.com.com ( seguro )"
 
 
-class TestTokenizationEs3(BaseTestTokenization, unittest.TestCase):
+class TestTokenizationPt1(BaseTestTokenization, unittest.TestCase):
     language = "pt"
     text = u"A expressão tornou-se bastante comum no internetês."
     expected = u"expressão tornou-se internetês"
 
 
-class TestTokenizationEs3(BaseTestTokenization, unittest.TestCase):
+class TestTokenizationPt2(BaseTestTokenization, unittest.TestCase):
     language = "pt"
     text = u"uma cantora e compositora norte-americana de R&B."
     expected = u"norte-americana R&B"
@@ -125,6 +131,14 @@ class BaseTestTextToDocument(object):
             for word in sentence:
                 self.assertIsInstance(word, unicode)
 
+    def test_texts_to_documents(self):
+        texts = [self.text, u"", self.text[:40]]
+        expected = [text_to_document(text, self.language) for text in texts]
+        for workers in [1, 2]:
+            documents = texts_to_documents(iter(texts), self.language,
+                                           workers, texts_per_task=2)
+            self.assertEqual(expected, list(documents))
+
 
 class TestTextToDocumentEn(BaseTestTextToDocument, unittest.TestCase):
     language = "en"
@@ -172,10 +186,65 @@ class TestTextToDocumentPt(BaseTestTextToDocument, unittest.TestCase):
             u"governamental.")
 
 
+class TestSentenceSplitters(unittest.TestCase):
+    def setUp(self):
+        from nltk.tokenize.punkt import PunktSentenceTokenizer
+        self.text = codecs.open(os.path.join(data_path, "canterville.txt"),
+                                encoding="utf-8").read()
+        self.splitter = PunktSentenceTokenizer(self.text)
+        self.tmpdir = tempfile.mkdtemp()
+        self.splitters = dict(input_conversion._sentence_splitters)
+        self.sources = dict(input_conversion._sentence_splitter_sources)
+        input_conversion._sentence_splitters.clear()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+        input_conversion._sentence_splitters.clear()
+        input_conversion._sentence_splitters.update(self.splitters)
+        input_conversion._sentence_splitter_sources.clear()
+        input_conversion._sentence_splitter_sources.update(self.sources)
+
+    def test_save_and_load(self):
+        filepath = os.path.join(self.tmpdir, "splitter.json.gz")
+        save_sentence_splitter(self.splitter, filepath)
+        splitter = load_sentence_splitter(filepath)
+        expected = self.splitter._params
+        params = splitter._params
+        self.assertEqual(expected.abbrev_types, params.abbrev_types)
+        self.assertEqual(expected.collocations, params.collocations)
+        self.assertEqual(expected.sent_starters, params.sent_starters)
+        self.assertEqual(expected.ortho_context, params.ortho_context)
+        self.assertEqual(self.splitter.tokenize(self.text),
+                         splitter.tokenize(self.text))
+
+    def test_directory(self):
+        input_conversion._sentence_splitters["en"] = self.splitter
+        self.assertEqual(["en"], save_sentence_splitters(self.tmpdir,
+                                                         ["en", "xx"]))
+        input_conversion._sentence_splitters.clear()
+        self.assertEqual(["en"], load_sentence_splitters(self.tmpdir))
+        document = text_to_document(self.text[:2000], "en")
+        self.assertEqual([tokenize(x, "en") for x in
+                          self.splitter.tokenize(self.text[:2000])],
+                         document)
+
+    def test_legacy_pickles(self):
+        punkt = os.path.join(self.tmpdir, "tokenizers", "punkt")
+        os.makedirs(punkt)
+        with open(os.path.join(punkt, "spanish.pickle"), "wb") as output:
+            pickle.dump(self.splitter, output)
+        self.assertEqual(["es"], load_sentence_splitters(self.tmpdir))
+        self.assertEqual(self.splitter.tokenize(self.text),
+                         input_conversion._sentence_splitters["es"]
+                         .tokenize(self.text))
+
+
 class TestHtmlToDocument(unittest.TestCase):
+    parser = "lxml"
+
     def test_generates_something(self):
         text = open(os.path.join(data_path, "index.html")).read()
-        document = html_to_document(text, "en")
+        document = html_to_document(text, "en", self.parser)
         self.assertGreater(len(document), 1)
         for sentence in document:
             self.assertIsInstance(sentence, Sentence)
@@ -184,36 +253,66 @@ class TestHtmlToDocument(unittest.TestCase):
 
     def test_extract(self):
         html = "<html><head></head><body><p>Hello Peter</p></body></html>"
-        d = [list(xs) for xs in html_to_document(html, "en")]
+        d = [list(xs) for xs in html_to_document(html, "en", self.parser)]
         self.assertEquals([u'Hello Peter'.split()], d)
         html = ("<html><head></head><body><p>Hello Peter. "
                 "Go for gold.</p></body></html>")
-        d = [list(xs) for xs in html_to_document(html, "en")]
+        d = [list(xs) for xs in html_to_document(html, "en", self.parser)]
         self.assertEquals([u'Hello Peter .'.split(), u'Go for gold .'.split()],
                            d)
 
     def test_newlines(self):
         html = ("<html><head></head>\n\n<body><p>\nHello Peter."
                 "\n\n\n Go for gold.\n</p>\n</body></html>")
-        d = [list(xs) for xs in html_to_document(html, "en")]
+        d = [list(xs) for xs in html_to_document(html, "en", self.parser)]
         self.assertEquals([u'Hello Peter .'.split(), u'Go for gold .'.split()],
                           d)
 
     def test_remove_whitespacing(self):
         html = ("<html><head></head><body><p>Wow\n\tWhat now?\t\t"
                 "</p></body></html>")
-        d = [list(xs) for xs in html_to_document(html, "en")]
+        d = [list(xs) for xs in html_to_document(html, "en", self.parser)]
         self.assertEquals([u'Wow What now ?'.split()], d)
 
     def test_sentence_splitting(self):
         html = ("<html><head></head><body><p>Wow!! "
                 "I did not know! Are you sure?</p></body></html>")
-        d = [list(xs) for xs in html_to_document(html, "en")]
+        d = [list(xs) for xs in html_to_document(html, "en", self.parser)]
         self.assertEquals([u'Wow !!'.split(),
                            u'I did not know !'.split(),
                            u'Are you sure ?'.split()], d)
 
 
+class TestHtmlToDocumentHtml5lib(TestHtmlToDocument):
+    parser = "html5lib"
+
+
+class TestHtmlParagraphs(unittest.TestCase):
+    def test_parsers_agree(self):
+        html = open(os.path.join(data_path, "index.html")).read()
+        paragraphs = list(html_paragraphs(html, "lxml"))
+        self.assertGreater(len(paragraphs), 1)
+        self.assertEqual(list(html_paragraphs(html, "html5lib")), paragraphs)
+        self.assertEqual(paragraphs, list(html_paragraphs(StringIO(html))))
+        self.assertEqual(u"\n".join(paragraphs), html_to_text(html))
+
+    def test_many_paragraphs(self):
+        html = u"<html><body>{}</body></html>".format(u"".join(
+            u"<div><p>Paragraph <b>{}</b> &amp; más</p>x</div>".format(i)
+            for i in xrange(2000)))
+        paragraphs = list(html_paragraphs(html))
+        self.assertEqual(2000, len(paragraphs))
+        self.assertEqual(u"Paragraph 1999 & más", paragraphs[-1])
+        self.assertEqual(list(html_paragraphs(html, "html5lib")), paragraphs)
+
+    def test_empty(self):
+        self.assertEqual([], list(html_paragraphs("")))
+        self.assertEqual([], list(html_paragraphs("<html></html>")))
+
+    def test_unknown_parser(self):
+        self.assertRaises(ValueError, html_paragraphs, "", "regexp")
+
+
 class TestParallelCorpusDocument(unittest.TestCase):
     def setUp(self):
         document_path = os.path.join(data_path, "parallel-en-es.txt")
@@ -236,6 +335,16 @@ class TestParallelCorpusDocument(unittest.TestCase):
 
         with self.assertRaises(ValueError):
             A, B = parallel_corpus_to_documents(tmpfile)
+        with self.assertRaises(ValueError):
+            A, B = parallel_corpus_to_documents(tmpfile, compact=True)
+
+    def test_compact(self):
+        document_path = os.path.join(data_path, "parallel-en-es.txt")
+        A, B = parallel_corpus_to_documents(document_path, compact=True)
+        self.assertIsInstance(A, Document)
+        self.assertIs(A.vocabulary, B.vocabulary)
+        self.assertEqual(self.document_a, A)
+        self.assertEqual(self.document_b, B)
 
 
 class TestTMXDocument(unittest.TestCase):
@@ -253,6 +362,15 @@ class TestTMXDocument(unittest.TestCase):
             self.assertTrue(isinstance(a, Sentence))
             self.assertTrue(isinstance(b, Sentence))
 
+    def test_compact(self):
+        document_path = os.path.join(data_path, "corpus-en-es.tmx")
+        A, B = tmx_file_to_documents(document_path, "en", "es", compact=True)
+        self.assertIsInstance(A, Document)
+        self.assertEqual(self.document_a, A)
+        self.assertEqual(self.document_b, B)
+        self.assertEqual([x.text for x in self.document_b],
+                         [x.text for x in B])
+
     def test_swap_languages(self):
         document_path = os.path.join(data_path, "corpus-en-es.tmx")
         swap_a, swap_b = tmx_file_to_documents(document_path, "es", "en")
@@ -262,8 +380,90 @@ class TestTMXDocument(unittest.TestCase):
         for x, y in zip(swap_b, self.document_a):
             self.assertEqual(x, y)
 
-
-class TestTMXDocument(unittest.TestCase):
+    def test_iter_tmx(self):
+        document_path = os.path.join(data_path, "corpus-en-es.tmx")
+        pairs = iter_tmx(document_path)
+        self.assertEqual((self.document_a[0], self.document_b[0]),
+                         pairs.next())
+        rest = list(pairs)
+        self.assertEqual(self.document_a[1:], [a for a, _ in rest])
+        self.assertEqual(self.document_b[1:], [b for _, b in rest])
+
+    def test_iter_tmx_segments(self):
+        _, tmpfile = tempfile.mkstemp()
+        with open(tmpfile, "w") as tmx:
+            tmx.write('<?xml version="1.0" encoding="UTF-8" ?>\n'
+                      '<tmx version="1.4"><header/><body>\n'
+                      '<tu><tuv xml:lang="en"><seg>Tom &amp; <b>Jerry</b>'
+                      '</seg></tuv><tuv xml:lang="es"><seg>Tom y\nJerry'
+                      '</seg></tuv></tu>\n'
+                      '<tu><tuv xml:lang="en"><seg>Alone</seg></tuv></tu>\n'
+                      '<tu><tuv xml:lang="es"><seg>Fin</seg></tuv>'
+                      '<tuv xml:lang="en"><seg>End</seg></tuv></tu>\n'
+                      '</body></tmx>')
+        pairs = [(list(a), list(b)) for a, b in iter_tmx(tmpfile)]
+        self.assertEqual([([u"Tom", u"&", u"Jerry"], [u"Tom", u"y", u"Jerry"]),
+                          ([u"End"], [u"Fin"])], pairs)
+        for a, b in iter_tmx(tmpfile):
+            self.assertEqual(u"Tom & Jerry", a.text)
+            self.assertEqual(u"Tom y Jerry", b.text)
+            break
+
+
+class TestTMXLanguagePairs(unittest.TestCase):
+    def setUp(self):
+        _, self.tmpfile = tempfile.mkstemp()
+        with open(self.tmpfile, "w") as tmx:
+            tmx.write('<?xml version="1.0" encoding="UTF-8" ?>\n'
+                      '<tmx version="1.4"><header/><body>\n'
+                      '<tu><tuv xml:lang="en"><seg>Good morning</seg></tuv>'
+                      '<tuv xml:lang="es"><seg>Buenos dias</seg></tuv>'
+                      '<tuv xml:lang="pt"><seg>Bom dia</seg></tuv></tu>\n'
+                      '<tu><tuv xml:lang="en"><seg>Thanks</seg></tuv>'
+                      '<tuv xml:lang="pt"><seg>Obrigado</seg></tuv></tu>\n'
+                      '</body></tmx>')
+
+    def tearDown(self):
+        os.remove(self.tmpfile)
+
+    def test_documents(self):
+        documents = tmx_file_to_language_pair_documents(
+            self.tmpfile, [("en", "es"), ("en", "pt"), ("es", "pt")])
+        self.assertEqual(3, len(documents))
+        A, B = documents["en", "pt"]
+        self.assertEqual([[u"Good", u"morning"], [u"Thanks"]],
+                         [list(x) for x in A])
+        self.assertEqual([[u"Bom", u"dia"], [u"Obrigado"]],
+                         [list(x) for x in B])
+        A, B = documents["es", "pt"]
+        self.assertEqual([[u"Buenos", u"dias"]], [list(x) for x in A])
+        self.assertEqual([[u"Bom", u"dia"]], [list(x) for x in B])
+
+    def test_same_as_single_pair(self):
+        documents = tmx_file_to_language_pair_documents(
+            self.tmpfile, [("en", "es"), ("pt", "en")])
+        self.assertEqual(tmx_file_to_documents(self.tmpfile, "en", "es"),
+                         documents["en", "es"])
+        self.assertEqual(tmx_file_to_documents(self.tmpfile, "pt", "en"),
+                         documents["pt", "en"])
+
+    def test_tokenized_once(self):
+        pairs = list(iter_tmx_language_pairs(self.tmpfile,
+                                             [("en", "es"), ("en", "pt")]))
+        self.assertEqual([("en", "es"), ("en", "pt"), ("en", "pt")],
+                         [pair for pair, _, _ in pairs])
+        self.assertIs(pairs[0][1], pairs[1][1])
+
+    def test_sinks(self):
+        received = []
+        sinks = {("pt", "es"): lambda a, b: received.append((a, b))}
+        result = tmx_file_to_language_pair_documents(self.tmpfile, None, sinks)
+        self.assertIsNone(result)
+        self.assertEqual([([u"Bom", u"dia"], [u"Buenos", u"dias"])],
+                         [(list(a), list(b)) for a, b in received])
+
+
+class TestSRTDocument(unittest.TestCase):
     def test_empty_string(self):
         d = list(srt_to_document(""))
         self.assertEqual(d, [])
@@ -0,0 +1,200 @@
+# -*- coding: utf-8 -*-
+
+import sys
+import time
+import threading
+import traceback
+import unittest
+from multiprocessing import TimeoutError
+
+from yalign.parallel import make_pool, submit, ordered_map, AsyncAligner, \
+    CancelledError, background
+
+
+class FakeModel(object):
+    def __init__(self, delay=0):
+        self.delay = delay
+        self.running = 0
+        self.max_running = 0
+        self.lock = threading.Lock()
+
+    def align_costs(self, document_a, document_b):
+        return [(i, i, 0.0) for i, _ in enumerate(zip(document_a, document_b))]
+
+    def align(self, document_a, document_b):
+        with self.lock:
+            self.running += 1
+            self.max_running = max(self.max_running, self.running)
+        time.sleep(self.delay)
+        with self.lock:
+            self.running -= 1
+        return zip(document_a, document_b)
+
+
+def fail():
+    raise ValueError("Nope")
+
+
+class TestSubmit(unittest.TestCase):
+    def setUp(self):
+        self.pool = make_pool(2)
+
+    def tearDown(self):
+        self.pool.terminate()
+
+    def test_result(self):
+        call = submit(self.pool, sum, ([1, 2, 3],))
+        self.assertEqual(6, call.get(1))
+        self.assertTrue(call.ready())
+        self.assertFalse(call.cancel())
+
+    def test_error(self):
+        call = submit(self.pool, fail)
+        self.assertRaises(ValueError, call.get, 1)
+
+    def test_timeout_cancels(self):
+        call = submit(self.pool, time.sleep, (0.2,))
+        self.assertRaises(TimeoutError, call.get, 0.01)
+        self.assertTrue(call.cancelled())
+        self.assertRaises(CancelledError, call.get)
+
+    def test_error_traceback(self):
+        call = submit(self.pool, fail)
+        try:
+            call.get(1)
+        except ValueError:
+            functions = [x[2] for x in traceback.extract_tb(sys.exc_info()[2])]
+        self.assertEqual("fail", functions[-1])
+
+    def test_remote_traceback(self):
+        pool = make_pool(1, processes=True)
+        try:
+            call = submit(pool, fail)
+            with self.assertRaises(ValueError) as context:
+                call.get(5)
+        finally:
+            pool.terminate()
+            pool.join()
+        self.assertIn("in fail", context.exception.remote_traceback)
+        message = str(context.exception)
+        self.assertTrue(message.startswith("Nope\n"))
+        self.assertIn("in fail", message)
+
+    def test_cancel_before_start(self):
+        pool = make_pool(1)
+        release = threading.Event()
+        try:
+            # The only worker is busy until released, so the call can't
+            # start before it's cancelled
+            submit(pool, release.wait, (5,))
+            calls = []
+            call = submit(pool, calls.append, (1,))
+            self.assertTrue(call.cancel())
+            self.assertRaises(CancelledError, call.get)
+        finally:
+            release.set()
+        pool.close()
+        pool.join()
+        self.assertEqual([], calls)
+
+
+class TestOrderedMap(unittest.TestCase):
+    def test_order_and_laziness(self):
+        pool = make_pool(3)
+        read = []
+
+        def args():
+            for i in xrange(10):
+                read.append(i)
+                yield (0.01 * (i % 3), i)
+
+        results = ordered_map(pool, lambda delay, i: time.sleep(delay) or i,
+                              args(), max_pending=2)
+        self.assertEqual(0, results.next())
+        self.assertLessEqual(len(read), 3)
+        self.assertEqual(range(1, 10), list(results))
+        pool.terminate()
+
+    def test_processes(self):
+        pool = make_pool(2, processes=True)
+        self.assertEqual([1, 5, 9], list(ordered_map(pool, sum,
+                                                     [([1],), ([2, 3],),
+                                                      ([4, 5],)])))
+        pool.terminate()
+
+    def test_method(self):
+        with AsyncAligner(FakeModel(), workers=2, processes=True,
+                          method="align_costs") as aligner:
+            call = aligner.submit([1, 2], [3, 4])
+            self.assertEqual([(0, 0, 0.0), (1, 1, 0.0)], call.get(5))
+
+    def test_invalid_max_pending(self):
+        pool = make_pool(1)
+        self.assertRaises(ValueError, list, ordered_map(pool, sum, [], 0))
+        pool.terminate()
+
+
+class TestAsyncAligner(unittest.TestCase):
+    def test_threads(self):
+        model = FakeModel()
+        with AsyncAligner(model, workers=2) as aligner:
+            call = aligner.submit([1, 2], [3, 4])
+            self.assertEqual([(1, 3), (2, 4)], call.get(1))
+
+    def test_processes(self):
+        with AsyncAligner(FakeModel(), workers=2, processes=True) as aligner:
+            call = aligner.submit([1, 2], [3, 4])
+            self.assertEqual([(1, 3), (2, 4)], call.get(5))
+
+    def test_map_keeps_order_and_limits_pending(self):
+        model = FakeModel(delay=0.01)
+        pairs = [([i], [-i]) for i in xrange(20)]
+        with AsyncAligner(model, workers=4, max_pending=2) as aligner:
+            results = list(aligner.map(iter(pairs), timeout=5))
+        self.assertEqual([[(i, -i)] for i in xrange(20)], results)
+        self.assertLessEqual(model.max_running, 2)
+
+    def test_method(self):
+        with AsyncAligner(FakeModel(), workers=2, processes=True,
+                          method="align_costs") as aligner:
+            call = aligner.submit([1, 2], [3, 4])
+            self.assertEqual([(0, 0, 0.0), (1, 1, 0.0)], call.get(5))
+
+    def test_invalid_max_pending(self):
+        self.assertRaises(ValueError, AsyncAligner, FakeModel(), 1, False, 0)
+
+
+def failing(n):
+    for i in xrange(n):
+        yield i
+    raise ValueError("Nope")
+
+
+class TestBackground(unittest.TestCase):
+    def test_items(self):
+        self.assertEqual(range(100), list(background(xrange(100), 3)))
+        self.assertEqual([], list(background([])))
+
+    def test_error(self):
+        items = background(failing(5), 2)
+        self.assertEqual(range(5), [next(items) for _ in xrange(5)])
+        self.assertRaises(ValueError, next, items)
+
+    def test_bounded(self):
+        produced = []
+
+        def producer():
+            for i in xrange(100):
+                produced.append(i)
+                yield i
+
+        items = background(producer(), 5)
+        next(items)
+        time.sleep(0.1)
+        # The queue, the item being put and the one taken
+        self.assertLessEqual(len(produced), 7)
+        items.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,79 @@
+# -*- coding: utf-8 -*-
+
+import os
+import gzip
+import shutil
+import tempfile
+import unittest
+
+from yalign.wordpairscore import WordPairScore
+from yalign.phrasetable import filter_phrasetable, filter_chunk, \
+    save_dictionary
+
+base_path = os.path.dirname(os.path.abspath(__file__))
+data_path = os.path.join(base_path, "data")
+phrasetable_path = os.path.join(data_path, "phrase-table.0-0.gz")
+
+LINES = [
+    "house ||| casa ||| 1 1 1 1 2.718 ||| ||| 1 1\n",
+    "red house ||| casa roja ||| 1 1 1 1 2.718 ||| ||| 1 1\n",
+    "house ||| casa roja ||| 1 1 1 1 2.718 ||| ||| 1 1\n",
+    "rare ||| raro ||| 1 1 1 1 2.718 ||| ||| 0 1\n",
+    "low ||| bajo ||| 0.0001 1 0.001 1 2.718 ||| ||| 3 3\n",
+    "Año ||| Year ||| 0.5 1 0.25 1 2.718 ||| 0-0 ||| 3 3 2\n",
+    "broken ||| line\n",
+]
+
+
+class TestFilterPhrasetable(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def test_filter_chunk(self):
+        self.assertEqual([(u"house", u"casa", 1.0),
+                          (u"año", u"year", 0.375)],
+                         filter_chunk("".join(LINES)))
+
+    def test_filter_phrasetable(self):
+        entries = list(filter_phrasetable(phrasetable_path, workers=1))
+        self.assertEqual((u"house", u"casa", 1.0), entries[0])
+        self.assertEqual(5, len(entries))
+
+    def test_chunks_and_workers(self):
+        # Several gzip members and lines split between chunks
+        filepath = os.path.join(self.tmpdir, "table.gz")
+        with open(filepath, "wb") as output:
+            for _ in xrange(3):
+                with open(phrasetable_path, "rb") as inputfile:
+                    output.write(inputfile.read())
+                member = gzip.GzipFile(fileobj=output, mode="wb")
+                member.write("".join(LINES[:-1]) * 7)
+                member.close()
+        expected = list(filter_phrasetable(filepath, workers=1,
+                                           chunk_size=1 << 20))
+        self.assertEqual(3 * (5 + 7 * 2), len(expected))
+        self.assertEqual(expected, list(filter_phrasetable(
+            filepath, workers=2, chunk_size=10)))
+
+    def test_plain_table(self):
+        filepath = os.path.join(self.tmpdir, "table")
+        with open(filepath, "w") as output:
+            output.writelines(LINES)
+        self.assertEqual(2, len(list(filter_phrasetable(filepath, 1))))
+
+    def test_save_dictionary(self):
+        expected = WordPairScore(os.path.join(data_path,
+                                              "test_word_scores.csv"))
+        entries = list(filter_phrasetable(phrasetable_path, workers=1))
+        for name in ["words.csv", "words.csv.gz", "words.pickle"]:
+            filepath = os.path.join(self.tmpdir, name)
+            self.assertEqual(5, save_dictionary(iter(entries), filepath))
+            self.assertEqual(expected.translations,
+                             WordPairScore(filepath).translations)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,124 @@
+# -*- coding: utf-8 -*-
+
+import os
+import codecs
+import shutil
+import tempfile
+import unittest
+from StringIO import StringIO
+
+from yalign.pipeline import align_text_pairs, Progress, read_manifest, \
+    align_manifest
+
+
+class IdentityModel(object):
+    """ Aligns the sentences in the same position. """
+    def align_costs(self, document_a, document_b):
+        if not document_a:
+            raise ValueError("Empty document")
+        n = min(len(document_a), len(document_b))
+        return [(i, i, 0.5) for i in xrange(n)]
+
+
+def text_pairs(n):
+    for i in xrange(n):
+        yield (u"Hello number {}. Second sentence.".format(i),
+               u"Hola número {}.".format(i))
+
+
+class TestAlignTextPairs(unittest.TestCase):
+    def test_records_in_order(self):
+        calls = []
+        records = list(align_text_pairs(IdentityModel(), text_pairs(30),
+                                        "en", "es", 2, 2, queue_size=2,
+                                        progress=calls.append))
+        self.assertEqual(range(30), [x[0] for x in records])
+        self.assertEqual([u"Hello", u"number", u"7", u"."], records[7][1])
+        self.assertEqual([u"Hola", u"número", u"7", u"."], records[7][2])
+        self.assertEqual(0.5, records[7][3])
+        self.assertEqual([1] * 30, calls)
+
+    def test_in_process_preprocessing(self):
+        records = list(align_text_pairs(IdentityModel(), text_pairs(3),
+                                        "en", "es", 1, 1))
+        self.assertEqual(3, len(records))
+
+    def test_errors(self):
+        pairs = list(text_pairs(5)) + [(u"", u"Nada.")]
+        records = align_text_pairs(IdentityModel(), iter(pairs), "en", "es",
+                                   1, 2)
+        self.assertRaises(ValueError, list, records)
+
+
+class TestProgress(unittest.TestCase):
+    def test_report(self):
+        stream = StringIO()
+        progress = Progress(stream, interval=1000)
+        progress(3)
+        progress(0)
+        self.assertEqual("", stream.getvalue())
+        progress.report()
+        self.assertTrue(stream.getvalue().startswith(
+            "2 document pairs, 3 alignments, "))
+        self.assertTrue(stream.getvalue().endswith(" docs/sec\n"))
+
+
+class TestManifest(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.files = []
+        for i, (text_a, text_b) in enumerate(text_pairs(3)):
+            pair = []
+            for name, text in (("a", text_a), ("b", text_b)):
+                path = os.path.join(self.tmpdir, "{}{}.txt".format(name, i))
+                with codecs.open(path, "w", encoding="utf-8") as output:
+                    output.write(text)
+                pair.append(path)
+            self.files.append(pair)
+        self.manifest = os.path.join(self.tmpdir, "manifest.tsv")
+        lines = [u"# document_a\tdocument_b",
+                 u"{}\t{}".format(*self.files[0]),
+                 u"",
+                 u"{}\t{}\tes\ten".format(*self.files[1]),
+                 u"{}\t{}".format(self.files[2][0], "missing.txt"),
+                 u"{}\t{}\ten\tes\tout.tmx".format(*self.files[2])]
+        with codecs.open(self.manifest, "w", encoding="utf-8") as output:
+            output.write(u"\n".join(lines))
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def test_read_manifest(self):
+        entries = read_manifest(self.manifest)
+        self.assertEqual(4, len(entries))
+        self.assertEqual(self.files[0], [entries[0].document_a,
+                                         entries[0].document_b])
+        self.assertEqual(("en", "es", None), (entries[0].lang_a,
+                                              entries[0].lang_b,
+                                              entries[0].output))
+        self.assertEqual(("es", "en"), (entries[1].lang_a, entries[1].lang_b))
+        self.assertEqual("out.tmx", entries[3].output)
+        with open(self.manifest, "a") as output:
+            output.write("\njust one column\n")
+        self.assertRaises(ValueError, read_manifest, self.manifest)
+
+    def test_align_manifest(self):
+        entries = read_manifest(self.manifest)
+        for workers in (1, 2):
+            results = list(align_manifest(IdentityModel(), entries, workers))
+            self.assertEqual([x.document_b for x in entries],
+                             [x[0].document_b for x in results])
+            entry, records, error, seconds = results[1]
+            self.assertIsNone(error)
+            self.assertEqual(1, len(records))
+            self.assertEqual([u"Hello", u"number", u"1", u"."], records[0][0])
+            self.assertEqual([u"Hola", u"número", u"1", u"."], records[0][1])
+            self.assertGreaterEqual(seconds, 0)
+            entry, records, error, seconds = results[2]
+            self.assertIsNone(records)
+            self.assertTrue(error.startswith("IOError"))
+            self.assertEqual(1, len(results[3][1]))
+
+
+if __name__ == "__main__":
+    unittest.main()
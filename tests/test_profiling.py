@@ -0,0 +1,77 @@
+# -*- coding: utf-8 -*-
+
+import os
+import pstats
+import tempfile
+import unittest
+from StringIO import StringIO
+
+from yalign import profiling
+
+
+@profiling.timed("double")
+def double(x):
+    return 2 * x
+
+
+class TestProfiling(unittest.TestCase):
+    def setUp(self):
+        profiling.reset()
+
+    def tearDown(self):
+        profiling.disable()
+        profiling.reset()
+
+    def test_disabled_by_default(self):
+        self.assertFalse(profiling.is_enabled())
+        self.assertEqual(4, double(2))
+        profiling.count("things")
+        with profiling.collect() as stats:
+            double(1)
+        self.assertIsNone(stats)
+        self.assertEqual({}, profiling.stats())
+
+    def test_timed_and_counted(self):
+        profiling.enable()
+        double(1)
+        double(2)
+        with profiling.stage("block"):
+            profiling.count("things", 3)
+        stats = profiling.stats()
+        self.assertEqual(2, stats["double"][0])
+        self.assertEqual(1, stats["block"][0])
+        self.assertEqual([3, 0.0], stats["things"])
+
+    def test_collect_is_nested(self):
+        profiling.enable()
+        with profiling.collect() as outer:
+            double(1)
+            with profiling.collect() as inner:
+                double(2)
+        self.assertEqual(1, inner["double"][0])
+        self.assertEqual(2, outer["double"][0])
+        self.assertEqual(2, profiling.stats()["double"][0])
+
+    def test_summary(self):
+        stats = profiling.Stats()
+        stats.add("double", 0.5, 2)
+        lines = stats.summary().splitlines()
+        self.assertEqual(2, len(lines))
+        self.assertTrue(lines[1].startswith("double"))
+
+    def test_run(self):
+        _, path = tempfile.mkstemp()
+        stream = StringIO()
+        result = profiling.run(double, 21, path, stream)
+        self.assertEqual(42, result)
+        self.assertFalse(profiling.is_enabled())
+        self.assertIn("double", stream.getvalue())
+        self.assertTrue(os.path.getsize(path) > 0)
+        pstats.Stats(path)
+
+    def test_run_without_profile(self):
+        self.assertEqual(42, profiling.run(double, 21))
+
+
+if __name__ == "__main__":
+    unittest.main()
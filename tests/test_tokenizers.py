@@ -0,0 +1,83 @@
+# -*- coding: utf-8 -*-
+
+import re
+import random
+import unittest
+
+from nltk.tokenize import RegexpTokenizer
+
+from yalign.tokenizers import FLAGS, Words, languages, get_tokenizer, \
+    default_tokenizer, rules_to_regex, trie_regex, english_contractions, \
+    smileys
+
+
+class TestTrieRegex(unittest.TestCase):
+    def assertSameMatches(self, words, texts):
+        trie = re.compile(trie_regex(words), FLAGS)
+        plain = re.compile(u"|".join(re.escape(w) for w in words), FLAGS)
+        for text in texts:
+            expected = plain.match(text)
+            match = trie.match(text)
+            if expected is None:
+                self.assertIsNone(match, text)
+            else:
+                self.assertEqual(expected.group(), match.group(), text)
+
+    def test_shorter_first(self):
+        self.assertSameMatches(["can't", "can't've"],
+                               ["can't've", "can't", "cant", "CAN'T'VE"])
+
+    def test_longer_first(self):
+        self.assertSameMatches(["can't've", "can't"],
+                               ["can't've", "can't", "can't'v", "ca"])
+
+    def test_mixed_order(self):
+        self.assertSameMatches(["abc", "a", "ab", "abcd"],
+                               ["abcd", "abc", "ab", "a", "abx", "b"])
+
+    def test_random_words(self):
+        rng = random.Random(0)
+        for _ in xrange(50):
+            words = [u"".join(rng.choice(u"abC'") for _ in
+                              xrange(rng.randint(1, 4)))
+                     for _ in xrange(rng.randint(1, 12))]
+            texts = [u"".join(rng.choice(u"abc'") for _ in xrange(5))
+                     for _ in xrange(30)]
+            self.assertSameMatches(words, texts + words)
+
+    def test_contractions_and_smileys(self):
+        texts = [u"y'all'd've", u"Y'ALL're", u"how'd'y", u"won't've",
+                 u"I'd've", u"o'clock", u":-)", u"XD", u"x-(", u"=}",
+                 u"8o|", u":o", u"ok"]
+        self.assertSameMatches(english_contractions, texts)
+        self.assertSameMatches(smileys, texts)
+
+
+class TestGetTokenizer(unittest.TestCase):
+    text = (u"It's 3:39 am, John's bar is cool :) XD? Visit "
+            u"http://google.com or mail juancito@pepito.com on 10/23/1984. "
+            u"A expressão tornou-se comum; R&B can't've y'all'd've ¡¿Qué?")
+
+    def test_cached(self):
+        self.assertIs(get_tokenizer("en"), get_tokenizer("en"))
+
+    def test_default(self):
+        self.assertIs(default_tokenizer, get_tokenizer("xx"))
+
+    def test_same_as_plain_alternation(self):
+        for language, rules in languages.iteritems():
+            plain = RegexpTokenizer(rules_to_regex(rules, trie=False),
+                                    flags=FLAGS)
+            tokens = get_tokenizer(language).tokenize(self.text)
+            self.assertEqual(plain.tokenize(self.text), tokens)
+            for token in tokens:
+                self.assertIsInstance(token, unicode)
+
+    def test_words_rule(self):
+        rules = [Words([u"ab", u"a"]), u"\\w+", u"\\S"]
+        self.assertEqual(u"(?:a(?:b)?)|\\w+|\\S", rules_to_regex(rules))
+        self.assertEqual(u"ab|a|\\w+|\\S", rules_to_regex(rules, trie=False))
+
+
+if __name__ == "__main__":
+    unittest.main()
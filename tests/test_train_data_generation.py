@@ -6,7 +6,8 @@ from StringIO import StringIO
 from mock import patch
 from yalign.datatypes import Sentence
 from yalign.train_data_generation import *
-from yalign.train_data_generation import _aligned_samples, _misaligned_samples, _reorder, _random_range
+from yalign.train_data_generation import _aligned_samples, _misaligned_samples, _reorder, _random_range, \
+    _extract_alignments, _inverse
 
 
 def swap_start_and_end(xs):
@@ -34,6 +35,28 @@ class TestTrainingAlignmentsFromDocuments(unittest.TestCase):
         self.assertEquals(3, len([x for x in samples if x.aligned]))
         self.assertEquals(3, len([x for x in samples if not x.aligned]))
 
+    def test_seed(self):
+        A, B = sentences(xrange(50)), sentences(xrange(50, 100))
+        samples = list(training_alignments_from_documents(A, B, seed=3))
+        self.assertEquals(samples, list(training_alignments_from_documents(A, B, seed=3)))
+        self.assertNotEquals(samples, list(training_alignments_from_documents(A, B, seed=4)))
+
+    def test_same_as_scrambling(self):
+        A, B = sentences(xrange(50)), sentences(xrange(50, 100))
+        random.seed(7)
+        samples = list(training_alignments_from_documents(A, B))
+        random.seed(7)
+        A, B, alignments = training_scrambling_from_documents(A, B)
+        expected = list(_aligned_samples(A, B, alignments))
+        expected += list(_misaligned_samples(A, B, alignments))
+        self.assertEquals(expected, samples)
+        self.assertEquals([x.aligned for x in expected], [x.aligned for x in samples])
+
+    def test_misaligned_are_not_aligned(self):
+        A, B = sentences(xrange(30)), sentences(xrange(30))
+        for sample in training_alignments_from_documents(A, B, seed=1):
+            self.assertEquals(sample.aligned, sample.a == sample.b)
+
     def test_documents_equal_length(self):
         try:
             list(training_alignments_from_documents([], sentences([u'A'])))
@@ -135,6 +158,28 @@ class TestRandomAlign(unittest.TestCase):
         self.assertEquals((A, sentences(['Z', 'Y']), [(None, 0), (0, 1)]), training_scrambling_from_documents(A, B))
 
 
+class TestExtractAlignments(unittest.TestCase):
+    def test_alignments(self):
+        xs = [(2, 'c'), (0, 'a'), (1, 'b')]
+        ys = [(1, 'y'), (3, 'w'), (0, 'x'), (2, 'z')]
+        self.assertEquals([(None, 1), (0, 3), (1, 2), (2, 0)],
+                          _extract_alignments(xs, ys))
+
+    def test_inverse(self):
+        self.assertEquals([], list(_inverse([])))
+        self.assertEquals([1, 2, 0], list(_inverse([2, 0, 1])))
+        self.assertEquals([1, 2, 0], _reorder([0, 1, 2], [2, 0, 1]))
+
+
+class TestScramblingSeed(unittest.TestCase):
+    def test_seed(self):
+        A, B = sentences(xrange(100)), sentences(xrange(90))
+        self.assertEquals(training_scrambling_from_documents(A, B, seed=5),
+                          training_scrambling_from_documents(A, B, seed=5))
+        self.assertNotEquals(training_scrambling_from_documents(A, B, seed=5),
+                             training_scrambling_from_documents(A, B, seed=6))
+
+
 class TestRandomRange(unittest.TestCase):
 
     def test_boundries(self):
@@ -0,0 +1,119 @@
+# -*- coding: utf-8 -*-
+
+import os
+import gzip
+import json
+import shutil
+import tempfile
+import unittest
+from StringIO import StringIO
+from lxml import etree
+
+from yalign.datatypes import Sentence
+from yalign.utils import write_tmx
+from yalign.writers import get_writer, TMXWriter, PlaintextWriter, \
+    JSONLinesWriter, AlignmentWriter, open_output
+
+XMLNS = "{http://www.w3.org/XML/1998/namespace}"
+
+
+def records():
+    yield 0, Sentence([u"House"], text=u"House"), \
+             Sentence([u"Casa"], text=u"Casa"), 0.1
+    yield 0, Sentence([u"Red", u"car"]), Sentence([u"Auto", u"rojo"]), 0.2
+    yield 3, Sentence([u"Año"]), Sentence([u"Year"]), 0.3
+
+
+class TestWriters(unittest.TestCase):
+    def write(self, writer_class):
+        stream = StringIO()
+        with writer_class(stream, "en", "es") as writer:
+            writer.write_records(records())
+        self.assertEqual(3, writer.count)
+        return stream.getvalue()
+
+    def test_plaintext(self):
+        output = self.write(PlaintextWriter)
+        self.assertEqual("House\nCasa\nRed car\nAuto rojo\nA\xc3\xb1o\nYear\n",
+                         output)
+
+    def test_jsonlines(self):
+        output = self.write(JSONLinesWriter)
+        lines = [json.loads(x) for x in output.splitlines()]
+        self.assertEqual(3, len(lines))
+        self.assertEqual({"document": 3, "a": u"Año", "b": u"Year",
+                          "cost": 0.3}, lines[2])
+
+    def test_tmx_is_one_valid_document(self):
+        output = self.write(TMXWriter)
+        tmx = etree.fromstring(output)
+        self.assertEqual(1, len(tmx.findall("header")))
+        tus = tmx.findall("body/tu")
+        self.assertEqual(3, len(tus))
+        langs = [tuv.attrib[XMLNS + "lang"] for tuv in tus[0].findall("tuv")]
+        self.assertEqual(["en", "es"], langs)
+        self.assertEqual(u"Año", tus[2].find("tuv/seg").text)
+
+    def test_tmx_escaping(self):
+        stream = StringIO()
+        with TMXWriter(stream, "en", "es") as writer:
+            writer.write(0, Sentence([u"a", u"<b>", u"&", u"c\x0b"]),
+                         Sentence([u"x"], text=u" R&D\n <x> "))
+        tmx = etree.fromstring(stream.getvalue())
+        segs = [x.text for x in tmx.findall("body/tu/tuv/seg")]
+        self.assertEqual([u"a <b> & c", u"R&D <x>"], segs)
+
+    def test_tmx_buffering(self):
+        stream = StringIO()
+        sizes = set()
+        with TMXWriter(stream, "en", "es", buffer_size=200) as writer:
+            for i in xrange(50):
+                writer.write(0, Sentence([unicode(i)]), Sentence([u"x"]))
+                sizes.add(len(stream.getvalue()))
+        # Written in blocks of a few units
+        self.assertTrue(1 < len(sizes) < 50)
+        tmx = etree.fromstring(stream.getvalue())
+        segs = [x.text for x in tmx.findall("body/tu/tuv[1]/seg")]
+        self.assertEqual([unicode(i) for i in xrange(50)], segs)
+
+    def test_tmx_without_languages(self):
+        stream = StringIO()
+        with TMXWriter(stream) as writer:
+            writer.write(0, Sentence([u"a"]), Sentence([u"b"]))
+        tmx = etree.fromstring(stream.getvalue())
+        self.assertEqual(2, len(tmx.findall("body/tu/tuv")))
+
+    def test_open_output(self):
+        tmpdir = tempfile.mkdtemp()
+        try:
+            filepath = os.path.join(tmpdir, "output.tmx.gz")
+            output = open_output(filepath)
+            with TMXWriter(output, "en", "es") as writer:
+                writer.write_records(records())
+            output.close()
+            tmx = etree.fromstring(gzip.open(filepath).read())
+            self.assertEqual(3, len(tmx.findall("body/tu")))
+        finally:
+            shutil.rmtree(tmpdir)
+
+    def test_write_tmx(self):
+        stream = StringIO()
+        pairs = [(a, b) for _, a, b, _ in records()]
+        write_tmx(stream, pairs, "en", "es")
+        tmx = etree.fromstring(stream.getvalue())
+        self.assertEqual(3, len(tmx.findall("body/tu")))
+
+    def test_get_writer(self):
+        self.assertIsInstance(get_writer("TMX", StringIO()), TMXWriter)
+        self.assertIsInstance(get_writer("jsonlines", StringIO()),
+                              JSONLinesWriter)
+        self.assertRaises(ValueError, get_writer, "xls", StringIO())
+
+    def test_writers_implement_write(self):
+        class Incomplete(AlignmentWriter):
+            pass
+        self.assertRaises(TypeError, Incomplete, StringIO())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -4,8 +4,11 @@ import os
 import random
 import tempfile
 import unittest
+import cPickle as pickle
 
+from yalign import profiling, input_conversion
 from yalign.datatypes import Sentence
+from yalign.parallel import close_default_pool
 from yalign.evaluation import F_score
 from yalign.wordpairscore import WordPairScore
 from yalign.sequencealigner import SequenceAligner
@@ -14,7 +17,8 @@ from yalign.input_conversion import parallel_corpus_to_documents
 from yalign.train_data_generation import training_scrambling_from_documents, \
     training_alignments_from_documents
 from yalign.yalignmodel import YalignModel, random_sampling_maximizer, \
-    best_threshold, apply_threshold
+    best_threshold, apply_threshold, grid_refinement_maximizer, \
+    golden_section_maximizer, CountingFunction, threshold_curve
 
 
 class TestYalignModel(unittest.TestCase):
@@ -49,6 +53,24 @@ class TestYalignModel(unittest.TestCase):
         self.assertTrue(os.path.exists(model_path))
         self.assertTrue(os.path.exists(metadata_path))
 
+    def test_save_and_load_sentence_splitters(self):
+        from nltk.tokenize.punkt import PunktSentenceTokenizer
+        splitter = PunktSentenceTokenizer(u"Mr. Smith went home. He slept.")
+        splitters = dict(input_conversion._sentence_splitters)
+        try:
+            input_conversion._sentence_splitters["es"] = splitter
+            tmp_folder = tempfile.mkdtemp()
+            self.model.metadata.lang_a = "es"
+            self.model.save(tmp_folder)
+            self.assertTrue(os.path.exists(os.path.join(tmp_folder,
+                                                        "punkt-es.json.gz")))
+            input_conversion._sentence_splitters.clear()
+            YalignModel.load(tmp_folder)
+            self.assertIn("es", input_conversion._sentence_splitters)
+        finally:
+            input_conversion._sentence_splitters.clear()
+            input_conversion._sentence_splitters.update(splitters)
+
     def test_save_load_and_align(self):
         doc1 = [Sentence([u"House"]),
                 Sentence([u"asoidfhuioasgh"])]
@@ -75,10 +97,65 @@ class TestYalignModel(unittest.TestCase):
         result = [(list(x), list(y)) for x, y in result]
         self.assertIn((list(doc1[0]), list(doc2[0])), result)
 
+    def test_align_async(self):
+        doc1 = [Sentence([u"House"]),
+                Sentence([u"asoidfhuioasgh"])]
+        doc2 = [Sentence([u"Casa"])]
+        call = self.model.align_async(doc1, doc2)
+        self.assertEqual(self.model.align(doc1, doc2), call.get(10))
+        # The model holds no threads or locks
+        pickle.dumps(self.model)
+        close_default_pool()
+        call = self.model.align_async(doc1, doc2)
+        self.assertEqual(self.model.align(doc1, doc2), call.get(10))
+
+    def test_last_stats(self):
+        doc1 = [Sentence([u"House"]),
+                Sentence([u"asoidfhuioasgh"])]
+        doc2 = [Sentence([u"Casa"])]
+        self.model.align(doc1, doc2)
+        self.assertIsNone(self.model.last_stats)
+        profiling.enable()
+        try:
+            self.model.align(doc1, doc2)
+        finally:
+            profiling.disable()
+            profiling.reset()
+        stats = self.model.last_stats
+        for stage in ["sequence_alignment", "svm_score", "thresholding",
+                      "astar_expansions"]:
+            self.assertGreater(stats[stage][0], 0)
+
+    def test_iter_align(self):
+        doc1 = [Sentence([u"House"]),
+                Sentence([u"asoidfhuioasgh"])]
+        doc2 = [Sentence([u"Casa"])]
+        pairs = [(doc1, doc2), ([], doc2), (doc1, doc2)]
+        records = list(self.model.iter_align(iter(pairs)))
+        expected = self.model.align(doc1, doc2)
+        self.assertEqual(expected, [(a, b) for i, a, b, _ in records
+                                    if i == 0])
+        self.assertEqual(expected, [(a, b) for i, a, b, _ in records
+                                    if i == 2])
+        self.assertEqual([], [x for x in records if x[0] == 1])
+        for _, _, _, cost in records:
+            self.assertLessEqual(cost, self.model.threshold)
+
     def test_optimize_gap_penalty_and_threshold_finishes(self):
         self.model.optimize_gap_penalty_and_threshold(self.A, self.B,
                                                       self.correct_alignments)
 
+    def test_optimize_gap_penalty_and_threshold_strategies(self):
+        for optimizer in ["random", "grid", "golden"]:
+            self.model.optimize_gap_penalty_and_threshold(
+                self.A, self.B, self.correct_alignments, optimizer)
+            self.assertTrue(0 <= self.model.document_pair_aligner.penalty <= 0.2)
+
+    def test_optimize_gap_penalty_and_threshold_unknown_strategy(self):
+        with self.assertRaises(ValueError):
+            self.model.optimize_gap_penalty_and_threshold(
+                self.A, self.B, self.correct_alignments, "simplex")
+
     def test_optimize_gap_penalty_and_threshold_is_best(self):
         def evaluate(penalty, threshold):
             self.model.document_pair_aligner.penalty = penalty
@@ -115,6 +192,32 @@ class TestOptimizers(unittest.TestCase):
         score_100, _ = random_sampling_maximizer(F, 5, 10, n=100)
         self.assertGreater(score_100, score_20)
 
+    def test_grid_refinement_maximizer_maximizes(self):
+        def F(x):
+            return -(x - 0.3) ** 2
+        score, x = grid_refinement_maximizer(F, 0, 1, points=5, levels=4)
+        self.assertAlmostEqual(x, 0.3, delta=0.02)
+        self.assertEqual(score, F(x))
+
+    def test_grid_refinement_maximizer_reuses_evaluations(self):
+        F = CountingFunction(lambda x: -abs(x - 0.5))
+        grid_refinement_maximizer(F, 0, 1, points=5, levels=3)
+        self.assertEqual(F.evaluations, 9)
+
+    def test_grid_refinement_maximizer_uses_known_values(self):
+        F = CountingFunction(lambda x: -abs(x - 0.5))
+        F(0.25 + 1e-9)
+        grid_refinement_maximizer(F, 0, 1, points=5, levels=3)
+        self.assertEqual(F.evaluations, 9)
+
+    def test_golden_section_maximizer_maximizes(self):
+        def F(x):
+            return -(x - 0.3) ** 2
+        F = CountingFunction(F)
+        score, x = golden_section_maximizer(F, 0, 1, n=12)
+        self.assertAlmostEqual(x, 0.3, delta=0.01)
+        self.assertEqual(F.evaluations, 12)
+
     def test_best_threshold1(self):
         best_threshold([], [(0, 0, 0), (1, 1, 1)])
 
@@ -135,6 +238,31 @@ class TestOptimizers(unittest.TestCase):
             score = F_score(apply_threshold(guess, threshold), real)[0]
             self.assertLessEqual(score, best)
 
+    def test_best_threshold_same_as_exhaustive_search(self):
+        random.seed(hash("Sweep it under the rug"))
+        for _ in xrange(20):
+            real = [(i, i) for i in xrange(30)]
+            guess = [(i, random.choice([i, i + 1]), random.choice([0.1, 0.5,
+                      random.random()])) for i in xrange(30)]
+            expected = -1, None
+            for _, _, threshold in guess:
+                xs = apply_threshold(guess, threshold)
+                score = F_score(xs, real)[0]
+                if score > expected[0]:
+                    expected = score, threshold
+            self.assertEqual(expected, best_threshold(real, guess))
+
+    def test_best_threshold_curve(self):
+        real = [(0, 0), (1, 1)]
+        guess = [(0, 0, 0.3), (1, 2, 0.1), (1, 1, 0.3), (2, 2, 0.8)]
+        score, threshold, curve = best_threshold(real, guess, curve=True)
+        self.assertEqual([0.1, 0.3, 0.8], [x[0] for x in curve])
+        self.assertEqual((score, threshold), best_threshold(real, guess))
+        self.assertEqual(curve, threshold_curve(real, guess))
+        for t, F, p, r in curve:
+            self.assertEqual((F, p, r),
+                             F_score(apply_threshold(guess, t), real))
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -66,6 +66,39 @@ Examples of how to use the yalign API:
 
 """
 
-from yalignmodel import YalignModel, basic_model
-from input_conversion import html_to_document, text_to_document, srt_to_document
+import sys
+from types import ModuleType
+
+# The names exported by the package are imported the first time they are
+# used, so that importing a submodule (as the scripts do) doesn't load every
+# dependency of yalign.
+_exports = {
+    "YalignModel": "yalign.yalignmodel",
+    "basic_model": "yalign.yalignmodel",
+    "html_to_document": "yalign.input_conversion",
+    "text_to_document": "yalign.input_conversion",
+    "srt_to_document": "yalign.input_conversion",
+}
+
+
+class _LazyPackage(ModuleType):
+    def __getattr__(self, name):
+        if name not in _exports:
+            raise AttributeError("'module' object has no attribute "
+                                 "'{}'".format(name))
+        module = __import__(_exports[name], fromlist=[name])
+        value = getattr(module, name)
+        setattr(self, name, value)
+        return value
+
+    def __dir__(self):
+        return sorted(set(self.__dict__) | set(_exports))
+
+
+_package = _LazyPackage(__name__)
+_package.__dict__.update(globals())
+# Keeps this module alive, otherwise its globals are cleared when it's
+# replaced in sys.modules
+_package._module = sys.modules[__name__]
+sys.modules[__name__] = _package
 
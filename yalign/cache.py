@@ -0,0 +1,141 @@
+# -*- coding: utf-8 -*-
+"""
+Module with an on-disk cache of preprocessed (sentence split and tokenized)
+documents.
+
+Entries are addressed by a hash of everything that determines the result of
+the preprocessing (see `cache_key`) and hold one or more documents stored as
+flat arrays: all the tokens in one buffer with their end offsets, and the
+number of tokens of every sentence.
+"""
+
+import os
+import zipfile
+import hashlib
+import tempfile
+
+import numpy
+
+from yalign.datatypes import Sentence
+
+CACHE_VERSION = "1"
+OFFSET_DTYPE = "<i8"
+
+
+def cache_key(*parts):
+    """
+    Returns the hex digest of `parts`, a sequence of unicode or byte
+    strings.
+    """
+    digest = hashlib.sha1(CACHE_VERSION)
+    for part in parts:
+        if isinstance(part, unicode):
+            part = part.encode("utf-8")
+        digest.update(str(len(part)))
+        digest.update(":")
+        digest.update(part)
+    return digest.hexdigest()
+
+
+class DocumentCache(object):
+    """
+    Cache of lists of documents in `directory`, one file per entry.
+    Writes are atomic so several processes can share the same cache.
+    """
+    def __init__(self, directory):
+        self.directory = directory
+        self.hits = 0
+        self.misses = 0
+
+    def _path(self, key):
+        return os.path.join(self.directory, key[:2], key + ".npz")
+
+    def get(self, key):
+        """ Returns the documents stored for `key` or `None`. """
+        try:
+            with open(self._path(key), "rb") as inputfile:
+                arrays = numpy.load(inputfile)
+                documents = _unpack(arrays)
+        except (IOError, OSError, ValueError, KeyError, zipfile.BadZipfile):
+            # Missing or unreadable entry
+            self.misses += 1
+            return None
+        self.hits += 1
+        return documents
+
+    def put(self, key, documents):
+        """ Stores `documents`, a list of lists of Sentences, for `key`. """
+        path = self._path(key)
+        folder = os.path.dirname(path)
+        if not os.path.isdir(folder):
+            try:
+                os.makedirs(folder)
+            except OSError:
+                # Created by another process meanwhile
+                if not os.path.isdir(folder):
+                    raise
+        descriptor, partial = tempfile.mkstemp(dir=folder)
+        try:
+            with os.fdopen(descriptor, "wb") as output:
+                numpy.savez(output, **_pack(documents))
+            os.rename(partial, path)
+        except:
+            os.remove(partial)
+            raise
+
+
+def _pack(documents):
+    tokens = []
+    texts = []
+    sentence_ends = []
+    document_ends = []
+    for document in documents:
+        for sentence in document:
+            tokens.extend(sentence)
+            texts.append(sentence.text or u"")
+            sentence_ends.append(len(tokens))
+        document_ends.append(len(sentence_ends))
+    return {
+        "tokens": _buffer(tokens),
+        "token_ends": _ends(tokens),
+        "texts": _buffer(texts),
+        "text_ends": _ends(texts),
+        "sentence_ends": numpy.array(sentence_ends, OFFSET_DTYPE),
+        "document_ends": numpy.array(document_ends, OFFSET_DTYPE),
+    }
+
+
+def _unpack(arrays):
+    tokens = _strings(arrays["tokens"], arrays["token_ends"])
+    texts = _strings(arrays["texts"], arrays["text_ends"])
+    sentences = []
+    start = 0
+    for text, end in zip(texts, arrays["sentence_ends"].tolist()):
+        sentences.append(Sentence(tokens[start:end], text=text or None))
+        start = end
+    documents = []
+    start = 0
+    for end in arrays["document_ends"].tolist():
+        documents.append(sentences[start:end])
+        start = end
+    return documents
+
+
+def _buffer(strings):
+    data = u"".join(strings).encode("utf-8")
+    return numpy.frombuffer(data, numpy.uint8) if data else \
+        numpy.zeros(0, numpy.uint8)
+
+
+def _ends(strings):
+    return numpy.cumsum([len(x) for x in strings], dtype=OFFSET_DTYPE)
+
+
+def _strings(buffer_, ends):
+    data = buffer_.tostring().decode("utf-8")
+    result = []
+    start = 0
+    for end in ends.tolist():
+        result.append(data[start:end])
+        start = end
+    return result
@@ -0,0 +1,224 @@
+# -*- coding: utf-8 -*-
+"""
+Module for random access to large corpora.
+
+A corpus index stores the byte offsets of the sentences of a parallel corpus
+(or of the translation units of a tmx file) in a file next to the corpus.
+The index is built once, memory mapped afterwards, and lets documents of any
+size be read from any position of the corpus with a single seek.
+"""
+
+import os
+import re
+import abc
+import random
+import tempfile
+from itertools import islice
+
+import numpy
+
+from yalign.input_conversion import tokenize, _document, _segment_text, \
+    _language_from_node
+
+MIN_LINES = 20
+MAX_LINES = 20
+INDEX_SUFFIX = ".index"
+INDEX_DTYPE = "<u8"
+READ_SIZE = 1 << 20
+WRITE_SIZE = 1 << 16
+TU_START_REGEXP = re.compile(r"<tu[\s>]")
+TU_END = "</tu>"
+
+
+class CorpusIndex(object):
+    """
+    Base class of the corpus indexes.
+    Subclasses implement `_offsets`, that yields the offsets stored in the
+    index, `__len__` and `_read_documents`.
+    """
+    __metaclass__ = abc.ABCMeta
+
+    def __init__(self, filepath, index_path=None):
+        self.filepath = filepath
+        if index_path is None:
+            index_path = filepath + INDEX_SUFFIX
+        self.index_path = index_path
+        self.offsets = self._load_or_build()
+
+    def _load_or_build(self):
+        if not self._is_fresh():
+            try:
+                self._build()
+            except (IOError, OSError):
+                # Read only location, keep the index in memory
+                return numpy.fromiter(self._offsets(), INDEX_DTYPE)
+        if os.path.getsize(self.index_path) == 0:
+            return numpy.zeros(0, INDEX_DTYPE)
+        return numpy.memmap(self.index_path, INDEX_DTYPE, mode="r")
+
+    def _build(self):
+        # A temporary file of its own, so processes building the same index
+        # at the same time don't write into each other's
+        folder = os.path.dirname(os.path.abspath(self.index_path))
+        descriptor, partial = tempfile.mkstemp(dir=folder)
+        try:
+            with os.fdopen(descriptor, "wb") as output:
+                offsets = self._offsets()
+                chunk = _chunk(offsets)
+                while len(chunk):
+                    chunk.tofile(output)
+                    chunk = _chunk(offsets)
+            # mkstemp files are only readable by their owner
+            os.chmod(partial, 0644)
+            os.rename(partial, self.index_path)
+        except:
+            os.remove(partial)
+            raise
+
+    def _is_fresh(self):
+        try:
+            index_mtime = os.path.getmtime(self.index_path)
+        except OSError:
+            return False
+        return index_mtime >= os.path.getmtime(self.filepath)
+
+    @abc.abstractmethod
+    def __len__(self):
+        """ Number of sentence pairs in the corpus. """
+
+    def documents(self, start, n):
+        """
+        Returns the two documents made of the `n` sentence pairs starting at
+        pair number `start`.
+        """
+        if start < 0 or n < 0 or start + n > len(self):
+            raise IndexError("Pairs {} to {} out of range".format(start,
+                                                                 start + n))
+        return self._read_documents(start, n)
+
+    @abc.abstractmethod
+    def _offsets(self):
+        """ Yields the byte offsets stored in the index. """
+
+    @abc.abstractmethod
+    def _read_documents(self, start, n):
+        """ Same as `documents`, with `start` and `n` already checked. """
+
+    def random_documents(self, m=MIN_LINES, n=MAX_LINES, rng=random):
+        """
+        Endless generator of documents of between `m` and `n` sentence pairs
+        taken from random positions of the whole corpus.
+        `rng` is the source of randomness, by default the `random` module.
+        """
+        if len(self) < m:
+            raise ValueError("The corpus has less than {} pairs".format(m))
+        n = min(n, len(self))
+        while True:
+            size = rng.randint(m, n)
+            start = rng.randint(0, len(self) - size)
+            yield self.documents(start, size)
+
+    def _read(self, begin, end):
+        with open(self.filepath, "rb") as inputfile:
+            inputfile.seek(begin)
+            return inputfile.read(end - begin)
+
+
+class ParallelCorpusIndex(CorpusIndex):
+    """
+    Index of a parallel corpus file, with one tokenized sentence per line
+    and the lines alternating between language A and B (see
+    `yalign.input_conversion.parallel_corpus_to_documents`).
+    """
+    def _offsets(self):
+        position = 0
+        with open(self.filepath, "rb") as inputfile:
+            for line in inputfile:
+                yield position
+                position += len(line)
+        yield position
+
+    def __len__(self):
+        return max(len(self.offsets) - 1, 0) // 2
+
+    def _read_documents(self, start, n):
+        begin = self.offsets[2 * start]
+        end = self.offsets[2 * (start + n)]
+        lines = self._read(begin, end).decode("utf-8").split(u"\n")
+        lines = lines[:2 * n]
+        return _document(lines[0::2]), _document(lines[1::2])
+
+
+class TMXIndex(CorpusIndex):
+    """
+    Index of the translation units of a tmx file.
+    The file must be utf-8 encoded, as the tmx standard recommends.
+    Units that lack a segment in `lang_a` or `lang_b` are skipped, so a
+    document might have less sentence pairs than requested.
+    """
+    def __init__(self, filepath, lang_a, lang_b, index_path=None):
+        self.lang_a = lang_a
+        self.lang_b = lang_b
+        super(TMXIndex, self).__init__(filepath, index_path)
+
+    def _offsets(self):
+        position = 0
+        tail = ""
+        with open(self.filepath, "rb") as inputfile:
+            for data in iter(lambda: inputfile.read(READ_SIZE), ""):
+                # A tag split between two reads is found thanks to the tail,
+                # and no tag found before can start in it
+                chunk = tail + data
+                base = position - len(tail)
+                for match in TU_START_REGEXP.finditer(chunk):
+                    yield base + match.start()
+                tail = chunk[-3:]
+                position += len(data)
+        yield self._body_end()
+
+    def _body_end(self):
+        with open(self.filepath, "rb") as inputfile:
+            inputfile.seek(0, os.SEEK_END)
+            size = inputfile.tell()
+            inputfile.seek(max(size - READ_SIZE, 0))
+            data = inputfile.read()
+        index = data.rfind(TU_END)
+        if index == -1:
+            return size
+        return size - len(data) + index + len(TU_END)
+
+    def __len__(self):
+        return max(len(self.offsets) - 1, 0)
+
+    def _read_documents(self, start, n):
+        from lxml import etree
+        data = self._read(self.offsets[start], self.offsets[start + n])
+        end = data.rfind(TU_END)
+        data = data[:end + len(TU_END)] if end != -1 else data
+        parser = etree.XMLParser(encoding="utf-8", recover=True)
+        body = etree.fromstring("<body>" + data + "</body>", parser)
+        document_a = []
+        document_b = []
+        for tu in body.iterfind("tu"):
+            segments = dict((_language_from_node(tuv),
+                             _segment_text(tuv.find("seg")))
+                            for tuv in tu.iterfind("tuv"))
+            if self.lang_a in segments and self.lang_b in segments:
+                document_a.append(tokenize(segments[self.lang_a], self.lang_a))
+                document_b.append(tokenize(segments[self.lang_b], self.lang_b))
+        return document_a, document_b
+
+
+def corpus_index(filepath, lang_a=None, lang_b=None, index_path=None):
+    """
+    Returns the index of the corpus in `filepath`, a `TMXIndex` if it's a
+    tmx file and a `ParallelCorpusIndex` otherwise. The index is built the
+    first time, or if the corpus changed since.
+    """
+    if filepath.endswith(".tmx"):
+        return TMXIndex(filepath, lang_a, lang_b, index_path)
+    return ParallelCorpusIndex(filepath, index_path)
+
+
+def _chunk(offsets):
+    return numpy.fromiter(islice(offsets, WRITE_SIZE), INDEX_DTYPE)
@@ -4,6 +4,8 @@
 Module of some basic data types.
 """
 
+from array import array
+
 
 def _is_tokenized(word):
     """
@@ -38,6 +40,138 @@ class Sentence(list):
         return text.encode('utf-8')
 
 
+class Vocabulary(object):
+    """
+    Interned words, each one identified by its position in `words`.
+    """
+    def __init__(self, words=()):
+        self.words = []
+        self.ids = {}
+        for word in words:
+            self.id(word)
+
+    def id(self, word):
+        """ Returns the id of `word`, adding it if it's new. """
+        try:
+            return self.ids[word]
+        except KeyError:
+            i = self.ids[word] = len(self.words)
+            self.words.append(word)
+            return i
+
+    def __getitem__(self, i):
+        return self.words[i]
+
+    def __len__(self):
+        return len(self.words)
+
+    def __contains__(self, word):
+        return word in self.ids
+
+
+class Document(object):
+    """
+    A read only sequence of Sentences stored compactly: the ids of all the
+    words (see `Vocabulary`) in one flat array, the offset where every
+    sentence ends in it, and the span of the text of every sentence in
+    `text`.
+
+    Indexing and iterating return new `Sentence`s made of the interned
+    words of the vocabulary, so code that expects lists of Sentences keeps
+    working, but modifying them doesn't change the document.
+    Documents of both languages of a corpus can share a vocabulary.
+    """
+    def __init__(self, sentences=(), text=None, vocabulary=None):
+        if vocabulary is None:
+            vocabulary = Vocabulary()
+        self.vocabulary = vocabulary
+        self.word_ids = array("i")
+        self.sentence_ends = array("l")
+        # Start and end of the text of every sentence, -1 if it has none
+        self.spans = array("l")
+        self.has_text = text is not None
+        self._text = array("u", text or u"")
+        self.extend(sentences)
+
+    @property
+    def text(self):
+        """
+        The text the document was created with followed by the text of the
+        sentences appended without a span.
+        """
+        return self._text.tounicode() if self.has_text else None
+
+    def append(self, sentence, span=None):
+        """
+        Adds `sentence`, a list of words. Its text is `text[start:end]` if
+        `span` is given as `(start, end)`, otherwise `sentence.text` (if it
+        has one) is added at the end of `text`.
+        """
+        id_ = self.vocabulary.id
+        self.word_ids.extend([id_(word) for word in sentence])
+        self.sentence_ends.append(len(self.word_ids))
+        if span is None:
+            text = getattr(sentence, "text", None)
+            if text is None:
+                span = (-1, -1)
+            else:
+                span = (len(self._text), len(self._text) + len(text))
+                self._text.fromunicode(text)
+                self.has_text = True
+        self.spans.extend(span)
+
+    def extend(self, sentences):
+        for sentence in sentences:
+            self.append(sentence)
+
+    def sentence_ids(self, index):
+        """ Returns the array of word ids of sentence number `index`. """
+        index = self._check_index(index)
+        start = self.sentence_ends[index - 1] if index else 0
+        return self.word_ids[start:self.sentence_ends[index]]
+
+    def _check_index(self, index):
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("Document index out of range")
+        return index
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in xrange(*index.indices(len(self)))]
+        index = self._check_index(index)
+        words = self.vocabulary.words
+        sentence = Sentence([words[i] for i in self.sentence_ids(index)])
+        start = self.spans[2 * index]
+        if start != -1:
+            end = self.spans[2 * index + 1]
+            sentence.text = self._text[start:end].tounicode()
+        return sentence
+
+    def __iter__(self):
+        for i in xrange(len(self)):
+            yield self[i]
+
+    def __len__(self):
+        return len(self.sentence_ends)
+
+    def __eq__(self, other):
+        if not isinstance(other, (Document, list, tuple)):
+            return NotImplemented
+        return len(self) == len(other) and \
+            all(a == b for a, b in zip(self, other))
+
+    def __ne__(self, other):
+        result = self.__eq__(other)
+        return result if result is NotImplemented else not result
+
+    __hash__ = None
+
+    def __repr__(self):
+        return "<Document of {} sentences>".format(len(self))
+
+
 class SentencePair(list):
     """
     An association of two sentences with one attribute
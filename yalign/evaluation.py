@@ -4,41 +4,83 @@
 Module for the evaluation of sequence alignment accuracy.
 """
 
+import sys
+import time
+import random
+from multiprocessing import cpu_count
+
 import numpy
-from simpleai.machine_learning import kfold
 
-from yalign.svm import SVMClassifier
-from yalign.input_conversion import generate_documents
+from yalign.corpus import corpus_index
+from yalign.parallel import make_pool, ordered_map, set_worker_model, \
+    worker_model
 from yalign.train_data_generation import training_scrambling_from_documents
 from yalign.train_data_generation import training_alignments_from_documents
 from collections import defaultdict
+from itertools import islice
+
+FOLDS = 10
+# The feature matrix of the cross validation, in the workers
+_fold_data = None
 
 
-def evaluate(parallel_corpus, model, N=100):
+def evaluate(parallel_corpus, model, N=100, workers=1, seed=None):
     """
     Returns statistics for N document alignment trials.
-    The documents are generated from the parallel corpus.
+    The documents are taken from random positions of the parallel corpus
+    (see `yalign.corpus.CorpusIndex.random_documents`).
 
-    - `parallel_corpus`: A file object
+    - `parallel_corpus`: The path to a parallel corpus or tmx file
     - `model`: A YalignModel
     - `N`: Number of trials
+    - `workers`: Number of processes running the trials, each one with its
+      own copy of the model (one per cpu if `None`)
+    - `seed`: If given, the trials are the same on every call whatever the
+      number of workers, otherwise the `random` module is used.
+
+    The `max`, `mean` and `std` statistics are taken over the per trial
+    (F, precision, recall) scores, `mean` being the macro-average.
+    `micro` holds the micro-averaged scores, computed from the alignments of
+    all the trials pooled together.
+    `seconds` is an array with the time each trial took to align.
     """
+    rng = random if seed is None else random.Random(seed)
+    index = corpus_index(parallel_corpus, model.metadata.get("lang_a"),
+                         model.metadata.get("lang_b"))
+    # The documents and the seed of the scrambling of every trial are
+    # chosen here, so the result doesn't depend on how trials are run.
+    trials = ((docs, rng.randint(0, sys.maxint))
+              for docs in islice(index.random_documents(rng=rng), N))
+    if workers == 1:
+        set_worker_model(model)
+        results = [_trial(docs, trial_seed) for docs, trial_seed in trials]
+    else:
+        pool = make_pool(workers, True, set_worker_model, (model,))
+        try:
+            results = list(ordered_map(pool, _trial, trials))
+        finally:
+            pool.terminate()
+            pool.join()
+    stats = _stats([counts for counts, _ in results])
+    stats["seconds"] = numpy.array([seconds for _, seconds in results])
+    return stats
+
 
-    results = []
-    for idx, docs in enumerate(generate_documents(parallel_corpus)):
-        A, B, alignments = training_scrambling_from_documents(*docs)
-        predicted_alignments = model.align_indexes(A, B)
-        scores = F_score(predicted_alignments, alignments)
-        results.append(scores)
-        if idx >= N - 1:
-            break
-    return _stats(results)
+def _trial(docs, seed):
+    A, B, alignments = training_scrambling_from_documents(*docs, seed=seed)
+    start = time.time()
+    predicted_alignments = worker_model().align_indexes(A, B)
+    seconds = time.time() - start
+    return alignment_counts(predicted_alignments, alignments), seconds
 
 
-def _stats(xs):
+def _stats(counts, beta=0.01):
+    counts = numpy.array(counts, dtype=float).reshape(-1, 3)
+    xs = scores_from_counts(counts, beta)
     return dict(max=numpy.amax(xs, 0),
                 mean=numpy.mean(xs, 0),
-                std=numpy.std(xs, 0))
+                std=numpy.std(xs, 0),
+                micro=scores_from_counts(counts.sum(0), beta))
 
 
 def F_score(xs, ys, beta=0.01):
@@ -50,21 +92,98 @@ def F_score(xs, ys, beta=0.01):
     """
     p = precision(xs, ys)
     r = recall(xs, ys)
+    return F_from_precision_and_recall(p, r, beta), p, r
+
+
+def F_from_precision_and_recall(p, r, beta=0.01):
+    """
+    Returns the F score for precision `p` and recall `r`.
+    See `F_score`.
+    """
     if (p + r) == 0:
-        return 0, 0, 0
+        return 0
     b_2 = beta ** 2
-    F = (1 + b_2) * (p * r) / (b_2 * p + r)
-    return F, p, r
+    return (1 + b_2) * (p * r) / (b_2 * p + r)
 
 
 def precision(xs, ys):
     """Precision of list `xs` to list `ys`."""
-    return len([x for x in xs if x in ys]) / float(len(xs)) if xs else 0.
+    return _hits(xs, ys) / float(len(xs)) if xs else 0.
 
 
 def recall(xs, ys):
     """Recall of list `xs` to list `ys`."""
-    return len([x for x in xs if x in ys]) / float(len(ys)) if ys else 0.
+    return _hits(xs, ys) / float(len(ys)) if ys else 0.
+
+
+def _hits(xs, ys):
+    ys = set(ys)
+    return sum(1 for x in xs if x in ys)
+
+
+def alignment_counts(xs, ys):
+    """
+    Returns `(hits, len(xs), len(ys))` where `hits` is the number of items
+    of `xs` that are in `ys`.
+    These counts are all that is needed to compute the precision, recall and
+    F score of `xs` against `ys` (see `scores_from_counts`).
+    """
+    return _hits(xs, ys), len(xs), len(ys)
+
+
+def scores_from_counts(counts, beta=0.01):
+    """
+    Vectorized version of `F_score`.
+    `counts` is an array like whose last axis holds the
+    `(hits, predicted, real)` values given by `alignment_counts` (or their
+    sums, to get micro-averaged scores).
+    Returns an array of the same shape whose last axis holds
+    `(F, precision, recall)`.
+    """
+    counts = numpy.asarray(counts, dtype=float)
+    hits = counts[..., 0]
+    predicted = counts[..., 1]
+    real = counts[..., 2]
+    with numpy.errstate(divide="ignore", invalid="ignore"):
+        p = numpy.where(predicted > 0, hits / predicted, 0.)
+        r = numpy.where(real > 0, hits / real, 0.)
+        b_2 = beta ** 2
+        F = numpy.where(p + r > 0, (1 + b_2) * (p * r) / (b_2 * p + r), 0.)
+    return numpy.concatenate([F[..., None], p[..., None], r[..., None]], -1)
+
+
+def F_scores(xss, yss, beta=0.01):
+    """
+    Returns an array with the `(F, precision, recall)` of each of the
+    predicted alignments in `xss` against the corresponding real alignments
+    in `yss`.
+    """
+    counts = [alignment_counts(xs, ys) for xs, ys in zip(xss, yss)]
+    return scores_from_counts(numpy.array(counts).reshape(-1, 3), beta)
+
+
+def threshold_counts(xss, yss, thresholds):
+    """
+    Returns an array of shape `(len(xss), len(thresholds), 3)` with the
+    `alignment_counts` of every document for every threshold.
+
+    `xss` is a list of predicted alignments with costs (`(i, j, cost)`
+    tuples) and `yss` the corresponding real alignments.
+    A predicted alignment is kept for a threshold if its cost is lower or
+    equal than it, as in `yalignmodel.apply_threshold`.
+    """
+    thresholds = numpy.asarray(thresholds, dtype=float)
+    result = numpy.zeros((len(xss), len(thresholds), 3))
+    for n, (xs, ys) in enumerate(zip(xss, yss)):
+        real = set(ys)
+        xs = sorted((c, (a, b) in real) for a, b, c in xs)
+        costs = numpy.array([c for c, _ in xs], dtype=float)
+        hits = numpy.cumsum([0] + [hit for _, hit in xs])
+        kept = numpy.searchsorted(costs, thresholds, side="right")
+        result[n, :, 0] = hits[kept]
+        result[n, :, 1] = kept
+        result[n, :, 2] = len(ys)
+    return result
 
 
 def alignment_percentage(document_a, document_b, model):
@@ -85,20 +204,127 @@ def alignment_percentage(document_a, document_b, model):
     return round(ratio * 100, 2)
 
 
-def classifier_precision(document_a, document_b, model):
+def classifier_precision(document_a, document_b, model, k=FOLDS,
+                         workers=None, seed=None, max_samples=None):
     """
-    Runs a ten-fold validation on the classifier and returns
+    Runs a `k`-fold validation on the classifier and returns
     a value between 0 and 100. Higher is better.
+
+    The folds are trained by `workers` processes (see `cross_validation`).
+    If `max_samples` is given at most that many training samples are used,
+    keeping the proportion of aligned and misaligned pairs.
+    If `seed` is given the result is the same on every call.
     """
     if len(document_a) == 0 and len(document_b) == 0:
         return 0.0
 
-    training = training_alignments_from_documents(document_a, document_b)
+    rng = random if seed is None else random.Random(seed)
+    training = list(training_alignments_from_documents(document_a,
+                                                       document_b, seed=seed))
     problem = model.sentence_pair_score.problem
-    score = kfold(training, problem, SVMClassifier)
+    targets = numpy.array([problem.target(x) for x in training])
+    if max_samples is not None and len(training) > max_samples:
+        sample = stratified_sample(targets, max_samples, rng)
+        training = [training[i] for i in sample]
+        targets = targets[sample]
+    vectors = feature_matrix(training, problem)
+    score = cross_validation(vectors, targets, k, workers, rng)
     return round(score * 100, 2)
 
 
+def feature_matrix(dataset, problem):
+    """
+    Returns an array with the attributes of `problem` (a classification
+    problem like `yalign.sentencepairscore.SentencePairScoreProblem`) for
+    each item of `dataset`, one row per item, as `SVMClassifier` sees them.
+    """
+    attributes = problem.attributes
+    vectors = numpy.zeros((len(dataset), len(attributes)))
+    for i, data in enumerate(dataset):
+        vectors[i] = [attr(data) for attr in attributes]
+    return vectors
+
+
+def cross_validation(vectors, targets, k=FOLDS, workers=None, rng=random):
+    """
+    Does a stratified `k`-fold validation (see `stratified_folds`) of an
+    SVM classifier like `yalign.svm.SVMClassifier` on the rows of `vectors` (see
+    `feature_matrix`) and their `targets`.
+    Returns the ratio of the rows that were classified correctly.
+
+    The folds are trained and tested by `workers` processes (one per cpu
+    by default), or in this process if `workers` is 1.
+    """
+    if k <= 1:
+        raise ValueError("k argument must be at least 2")
+    if len(targets) == 0:
+        raise ValueError("Cannot validate on empty set")
+    folds = [(test,) for test in stratified_folds(targets, k, rng)]
+    if workers == 1:
+        hits = [_fold_hits(vectors, targets, test) for test, in folds]
+    else:
+        # There's no use for more workers than folds
+        workers = min(workers or cpu_count(), k)
+        pool = make_pool(workers, True, _set_fold_data, (vectors, targets))
+        try:
+            hits = list(ordered_map(pool, _fold_hits_in_worker, folds))
+        finally:
+            pool.terminate()
+            pool.join()
+    return sum(hits) / float(len(targets))
+
+
+def stratified_folds(targets, k, rng=random):
+    """
+    Returns `k` disjoint arrays of indexes of `targets` that together cover
+    all of them, with about the same number of items of every class each.
+    """
+    folds = [[] for _ in xrange(k)]
+    offset = 0
+    for value in sorted(set(targets.tolist())):
+        indexes = numpy.flatnonzero(targets == value).tolist()
+        rng.shuffle(indexes)
+        for n, i in enumerate(indexes, offset):
+            folds[n % k].append(i)
+        # The next class starts filling the smallest folds
+        offset += len(indexes)
+    return [numpy.array(sorted(fold), dtype=int) for fold in folds]
+
+
+def stratified_sample(targets, size, rng=random):
+    """
+    Returns the sorted indexes of a random sample of `size` of the items of
+    `targets`, with the same proportion of every class.
+    """
+    sample = []
+    for value in sorted(set(targets.tolist())):
+        indexes = numpy.flatnonzero(targets == value).tolist()
+        n = int(round(len(indexes) * size / float(len(targets))))
+        sample.extend(rng.sample(indexes, n))
+    return numpy.array(sorted(sample), dtype=int)
+
+
+def _fold_hits(vectors, targets, test):
+    from sklearn.svm import SVC
+    if len(test) == 0:
+        return 0
+    train = numpy.ones(len(targets), dtype=bool)
+    train[test] = False
+    svm = SVC()
+    svm.fit(vectors[train], targets[train])
+    return int((svm.predict(vectors[test]) == targets[test]).sum())
+
+
+def _set_fold_data(vectors, targets):
+    global _fold_data
+    _fold_data = vectors, targets
+
+
+def _fold_hits_in_worker(test):
+    vectors, targets = _fold_data
+    return _fold_hits(vectors, targets, test)
+
+
 def correlation(classifier, dataset=None):
     """
     Calculates the correlation of the attributes of a classifier.
@@ -0,0 +1,261 @@
+# -*- coding: utf-8 -*-
+"""
+Module to download the documents to align.
+
+A `Fetcher` keeps the connections to every host open between requests and
+downloads many urls concurrently in a pool of threads, following redirects
+and enforcing timeouts and a maximum response size. Responses can also be
+kept in an on-disk cache.
+"""
+
+import os
+import socket
+import hashlib
+import httplib
+import tempfile
+import threading
+from urlparse import urlsplit, urljoin
+
+from yalign.parallel import make_pool, ordered_map
+
+TIMEOUT = 30
+MAX_SIZE = 50 * 1024 * 1024
+MAX_REDIRECTS = 5
+CONNECTIONS_PER_HOST = 4
+WORKERS = 8
+READ_SIZE = 1 << 16
+USER_AGENT = "yalign"
+REDIRECT_STATUSES = (301, 302, 303, 307, 308)
+
+_default_fetcher = None
+_default_fetcher_lock = threading.Lock()
+
+
+class FetchError(Exception):
+    """
+    Raised when a url can't be fetched. `status` is the http status of the
+    response, if there was one.
+    """
+    def __init__(self, url, message, status=None):
+        super(FetchError, self).__init__("{}: {}".format(url, message))
+        self.url = url
+        self.status = status
+
+
+def default_fetcher():
+    """
+    Returns a `Fetcher` shared by the calls that are not given one.
+    """
+    global _default_fetcher
+    with _default_fetcher_lock:
+        if _default_fetcher is None:
+            _default_fetcher = Fetcher()
+    return _default_fetcher
+
+
+class Fetcher(object):
+    """
+    Downloads urls, reusing the connections to each host.
+
+    At most `connections_per_host` idle connections are kept for every
+    host. Requests fail with `FetchError` after `timeout` seconds without
+    data, if they are redirected more than `max_redirects` times or if the
+    response is bigger than `max_size` bytes.
+    If `cache_directory` is given the responses are stored there and never
+    fetched again.
+
+        with Fetcher(workers=4) as fetcher:
+            for url, content, error in fetcher.fetch_many(urls):
+                ...
+    """
+    def __init__(self, timeout=TIMEOUT, max_size=MAX_SIZE,
+                 max_redirects=MAX_REDIRECTS,
+                 connections_per_host=CONNECTIONS_PER_HOST,
+                 cache_directory=None, workers=WORKERS):
+        self.timeout = timeout
+        self.max_size = max_size
+        self.max_redirects = max_redirects
+        self.connections_per_host = connections_per_host
+        self.cache_directory = cache_directory
+        self.workers = workers
+        self._idle = {}
+        self._lock = threading.Lock()
+        self._pool = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def close(self):
+        """ Closes the open connections and stops the threads. """
+        with self._lock:
+            idle = self._idle
+            self._idle = {}
+            pool = self._pool
+            self._pool = None
+        for connections in idle.itervalues():
+            for connection in connections:
+                connection.close()
+        if pool is not None:
+            pool.terminate()
+            pool.join()
+
+    def fetch(self, url):
+        """ Returns the content of `url`. """
+        content = self._cached(url)
+        if content is not None:
+            return content
+        location = url
+        for _ in xrange(self.max_redirects + 1):
+            status, headers, content = self._get(location)
+            if status in REDIRECT_STATUSES and "location" in headers:
+                location = urljoin(location, headers["location"])
+                continue
+            if status != 200:
+                raise FetchError(location, "status {}".format(status), status)
+            self._store(url, content)
+            return content
+        raise FetchError(url, "too many redirects")
+
+    def fetch_many(self, urls):
+        """
+        Fetches `urls` concurrently and yields `(url, content, error)` in the
+        same order, where `error` is `None` or the `FetchError` that
+        prevented getting the content.
+        """
+        with self._lock:
+            if self._pool is None:
+                self._pool = make_pool(self.workers)
+            pool = self._pool
+        return ordered_map(pool, self._fetch_result,
+                           ((url,) for url in urls))
+
+    def fetch_all(self, urls):
+        """
+        Returns the contents of `urls`, fetched concurrently.
+        Raises the `FetchError` of the first url that fails.
+        """
+        contents = []
+        for _, content, error in self.fetch_many(urls):
+            if error is not None:
+                raise error
+            contents.append(content)
+        return contents
+
+    def _fetch_result(self, url):
+        try:
+            return url, self.fetch(url), None
+        except FetchError as error:
+            return url, None, error
+
+    def _get(self, url):
+        parts = urlsplit(url)
+        if parts.scheme not in ("http", "https") or not parts.hostname:
+            raise FetchError(url, "unsupported url")
+        key = (parts.scheme, parts.hostname, parts.port)
+        path = parts.path or "/"
+        if parts.query:
+            path += "?" + parts.query
+        headers = {"User-Agent": USER_AGENT}
+        connection, reused = self._connection(key)
+        try:
+            try:
+                connection.request("GET", path, headers=headers)
+                response = connection.getresponse()
+            except (httplib.BadStatusLine, socket.error):
+                if not reused:
+                    raise
+                # The server closed the idle connection, try a new one
+                connection.close()
+                connection, _ = self._connection(key, reuse=False)
+                connection.request("GET", path, headers=headers)
+                response = connection.getresponse()
+            content = self._read(url, response)
+        except (httplib.HTTPException, socket.error) as error:
+            connection.close()
+            raise FetchError(url, error)
+        except:
+            connection.close()
+            raise
+        if response.will_close:
+            connection.close()
+        else:
+            self._release(key, connection)
+        return response.status, dict(response.getheaders()), content
+
+    def _read(self, url, response):
+        length = response.getheader("content-length")
+        if length and length.isdigit() and int(length) > self.max_size:
+            raise FetchError(url, "response bigger than {} bytes".format(
+                             self.max_size), response.status)
+        chunks = []
+        size = 0
+        while True:
+            chunk = response.read(READ_SIZE)
+            if not chunk:
+                break
+            size += len(chunk)
+            if size > self.max_size:
+                raise FetchError(url, "response bigger than {} bytes".format(
+                                 self.max_size), response.status)
+            chunks.append(chunk)
+        return "".join(chunks)
+
+    def _connection(self, key, reuse=True):
+        if reuse:
+            with self._lock:
+                idle = self._idle.get(key)
+                if idle:
+                    return idle.pop(), True
+        scheme, host, port = key
+        if scheme == "https":
+            connection_class = httplib.HTTPSConnection
+        else:
+            connection_class = httplib.HTTPConnection
+        return connection_class(host, port, timeout=self.timeout), False
+
+    def _release(self, key, connection):
+        with self._lock:
+            idle = self._idle.setdefault(key, [])
+            if len(idle) < self.connections_per_host:
+                idle.append(connection)
+                return
+        connection.close()
+
+    def _cache_path(self, url):
+        if isinstance(url, unicode):
+            url = url.encode("utf-8")
+        digest = hashlib.sha1(url).hexdigest()
+        return os.path.join(self.cache_directory, digest[:2], digest)
+
+    def _cached(self, url):
+        if self.cache_directory is None:
+            return None
+        try:
+            with open(self._cache_path(url), "rb") as inputfile:
+                return inputfile.read()
+        except IOError:
+            return None
+
+    def _store(self, url, content):
+        if self.cache_directory is None:
+            return
+        path = self._cache_path(url)
+        folder = os.path.dirname(path)
+        if not os.path.isdir(folder):
+            try:
+                os.makedirs(folder)
+            except OSError:
+                # Created by another thread or process meanwhile
+                if not os.path.isdir(folder):
+                    raise
+        descriptor, partial = tempfile.mkstemp(dir=folder)
+        try:
+            with os.fdopen(descriptor, "wb") as output:
+                output.write(content)
+            os.rename(partial, path)
+        except:
+            os.remove(partial)
+            raise
@@ -3,19 +3,26 @@
 A module of helper functions for dealing with various inputs.
 """
 
+import os
 import re
 import csv
+import gzip
+import json
 import codecs
+import hashlib
 import random
-from itertools import islice
-from lxml import etree
-from lxml.etree import XMLSyntaxError
-from bs4 import BeautifulSoup, UnicodeDammit
-from nltk.data import load as nltkload
+try:
+    import cPickle as pickle
+except ImportError:
+    import pickle
+from io import BytesIO
+from itertools import islice, izip, repeat
 
 from yalign.tokenizers import get_tokenizer
-from yalign.datatypes import Sentence, SentencePair
+from yalign.datatypes import Sentence, SentencePair, Document, Vocabulary
 from yalign.utils import Memoized
+from yalign.parallel import submit, default_pool, make_pool, ordered_map
+from yalign.profiling import timed, stage
 from xml.sax.saxutils import unescape
 
 SRT_REGEX = "\d+\n[\d:,]+?\s*-->\s*[\d:,]+?\n(.+?)(:?\n\n|$)"
@@ -26,8 +33,13 @@ SRT_POST_IGNORE = set(["-"])
 
 MIN_LINES = 20
 MAX_LINES = 20
+TEXTS_PER_TASK = 8
+HTML_PARSERS = ("lxml", "html5lib")
+DEFAULT_HTML_PARSER = "lxml"
+CACHE_ENVIRONMENT_VARIABLE = "YALIGN_CACHE"
+SENTENCE_SPLITTER_FILENAME = "punkt-{}.json.gz"
+SENTENCE_SPLITTER_REGEXP = re.compile(r"^punkt-(\w+)\.json\.gz$")
 XMLNS = "{http://www.w3.org/XML/1998/namespace}"
-STRIP_TAGS_REGEXP = re.compile("(>)(.*)(<)", re.DOTALL)
 CODES_TO_LANGUAGE = {
     "cs": "czech",
     "da": "danish",
@@ -47,10 +59,172 @@ CODES_TO_LANGUAGE = {
     "tr": "turkish",
 }
 
+
+def _load_sentence_splitter(language):
+    from nltk.data import load as nltkload
+    return nltkload("tokenizers/punkt/%s.pickle" % CODES_TO_LANGUAGE[language])
+
+
 _tokenizers = Memoized(lambda lang: get_tokenizer(lang))
-_sentence_splitters = Memoized(lambda lang: nltkload("tokenizers/punkt/%s.pickle" % CODES_TO_LANGUAGE[lang]))
+_sentence_splitters = Memoized(_load_sentence_splitter)
+# What identifies the sentence splitter of every language in the cache keys
+_sentence_splitter_sources = {}
+_document_cache = None
+_document_cache_configured = False
+
+
+def save_sentence_splitter(splitter, filepath):
+    """
+    Stores the parameters of the Punkt sentence `splitter` as gzipped json,
+    which is smaller and faster to load than nltk's pickles.
+    """
+    params = splitter._params
+    data = {
+        "abbrev_types": sorted(params.abbrev_types),
+        "collocations": sorted(params.collocations),
+        "sent_starters": sorted(params.sent_starters),
+        "ortho_context": params.ortho_context,
+    }
+    with gzip.open(filepath, "wb") as output:
+        json.dump(data, output, separators=(",", ":"), sort_keys=True)
+
+
+def load_sentence_splitter(filepath):
+    """ Loads a sentence splitter stored by `save_sentence_splitter`. """
+    from nltk.tokenize.punkt import PunktParameters, PunktSentenceTokenizer
+    with gzip.open(filepath, "rb") as inputfile:
+        data = json.load(inputfile)
+    params = PunktParameters()
+    params.abbrev_types = set(data["abbrev_types"])
+    params.collocations = set(tuple(x) for x in data["collocations"])
+    params.sent_starters = set(data["sent_starters"])
+    params.ortho_context.update(data["ortho_context"])
+    return PunktSentenceTokenizer(params)
+
+
+def save_sentence_splitters(directory, languages):
+    """
+    Stores in `directory` the sentence splitters that `text_to_document`
+    uses for `languages`. Languages without a splitter are skipped.
+    Returns the languages stored.
+    """
+    saved = []
+    for language in languages:
+        try:
+            splitter = _sentence_splitters[language]
+        except (KeyError, LookupError):
+            continue
+        filename = SENTENCE_SPLITTER_FILENAME.format(language)
+        save_sentence_splitter(splitter, os.path.join(directory, filename))
+        saved.append(language)
+    return saved
+
+
+def load_sentence_splitters(directory):
+    """
+    Makes `text_to_document` use the sentence splitters stored in
+    `directory` by `save_sentence_splitters`, or the nltk pickles in its
+    `tokenizers/punkt` folder, instead of the ones of nltk's data path.
+    Splitters are loaded once per process, so loading them before forking
+    (for instance before `texts_to_documents` creates its pool) shares them
+    with all the workers.
+    Returns the languages loaded.
+    """
+    loaded = []
+    for filename in sorted(os.listdir(directory)):
+        match = SENTENCE_SPLITTER_REGEXP.match(filename)
+        if match:
+            language = match.group(1)
+            filepath = os.path.join(directory, filename)
+            _sentence_splitters[language] = load_sentence_splitter(filepath)
+            _sentence_splitter_sources[language] = _file_hash(filepath)
+            loaded.append(language)
+    for language, name in CODES_TO_LANGUAGE.iteritems():
+        filepath = os.path.join(directory, "tokenizers", "punkt",
+                                name + ".pickle")
+        if language not in loaded and os.path.exists(filepath):
+            with open(filepath, "rb") as inputfile:
+                _sentence_splitters[language] = pickle.load(inputfile)
+            _sentence_splitter_sources[language] = _file_hash(filepath)
+            loaded.append(language)
+    return loaded
+
+
+def set_document_cache(directory):
+    """
+    Makes `text_to_document` (and so `texts_to_documents`) and
+    `tmx_file_to_documents` store the documents they build in an on-disk
+    cache in `directory`, and return them from there when called again with
+    the same text, languages, tokenizers and sentence splitters.
+    `None` disables the cache. By default the directory in the
+    `YALIGN_CACHE` environment variable is used, if it's set.
+    """
+    global _document_cache, _document_cache_configured
+    if directory is None:
+        _document_cache = None
+    else:
+        from yalign.cache import DocumentCache
+        _document_cache = DocumentCache(directory)
+    _document_cache_configured = True
+
+
+def document_cache():
+    """ Returns the `yalign.cache.DocumentCache` in use, or `None`. """
+    if not _document_cache_configured:
+        set_document_cache(os.environ.get(CACHE_ENVIRONMENT_VARIABLE) or None)
+    return _document_cache
+
 
+def _preprocessing_key(kind, data, languages, split=False):
+    from yalign.cache import cache_key
+    parts = [kind, data]
+    for language in languages:
+        tokenizer = _tokenizers[language] if language else None
+        parts.append(language or "")
+        parts.append(getattr(tokenizer, "pattern", ""))
+        if split:
+            parts.append(_sentence_splitter_source(language))
+    return cache_key(*parts)
 
+
+def _sentence_splitter_source(language):
+    """
+    Returns what identifies the sentence splitter of `language`: the hash
+    of the file it was loaded from, or for nltk's the version of nltk and
+    the hash of its punkt pickle.
+    """
+    if language not in _sentence_splitter_sources:
+        import nltk
+        source = "nltk " + nltk.__version__
+        try:
+            pointer = nltk.data.find("tokenizers/punkt/%s.pickle" %
+                                     CODES_TO_LANGUAGE[language])
+            source += " " + _file_hash(pointer.path)
+        except (LookupError, KeyError, AttributeError, IOError):
+            # Not a plain file, the splitter will fail to load anyway
+            pass
+        _sentence_splitter_sources[language] = source
+    return _sentence_splitter_sources[language]
+
+
+def _cache_put(cache, key, documents):
+    try:
+        cache.put(key, documents)
+    except (IOError, OSError):
+        # The cache is only an optimization, a read-only or full disk
+        # mustn't stop the conversion
+        pass
+
+
+def _file_hash(filepath):
+    digest = hashlib.sha1()
+    with open(filepath, "rb") as inputfile:
+        for data in iter(lambda: inputfile.read(1 << 20), ""):
+            digest.update(data)
+    return digest.hexdigest()
+
+
+@timed("tokenize")
 def tokenize(text, language="en"):
     """
     Returns a Sentence with Words (ie, a list of unicode objects)
@@ -60,19 +234,164 @@ def tokenize(text, language="en"):
     return Sentence(_tokenizers[language].tokenize(text), text=text)
 
 
+@timed("text_to_document")
 def text_to_document(text, language="en"):
-    """ Returns string text as list of Sentences """
-    splitter = _sentence_splitters[language]
+    """
+    Returns string text as list of Sentences.
+    See `set_document_cache` to reuse the results of previous runs.
+    """
     utext = unicode(text, 'utf-8') if isinstance(text, str) else text
-    sentences = splitter.tokenize(utext)
-    return [tokenize(text, language) for text in sentences]
+    cache = document_cache()
+    if cache is not None:
+        key = _preprocessing_key("text", utext, [language], split=True)
+        documents = cache.get(key)
+        if documents is not None:
+            return documents[0]
+    splitter = _sentence_splitters[language]
+    with stage("sentence_splitting"):
+        sentences = splitter.tokenize(utext)
+    document = [tokenize(text, language) for text in sentences]
+    if cache is not None:
+        _cache_put(cache, key, [document])
+    return document
+
+
+def html_to_text(html, parser=DEFAULT_HTML_PARSER):
+    """
+    Returns the text of the paragraphs of html, one per line.
+    See `html_paragraphs` for the parsers available.
+    """
+    return '\n'.join(html_paragraphs(html, parser))
 
 
-def html_to_document(html, language="en"):
+def html_to_document(html, language="en", parser=DEFAULT_HTML_PARSER):
     """ Returns html text as list of Sentences """
+    return text_to_document(html_to_text(html, parser), language)
+
+
+def html_paragraphs(html, parser=DEFAULT_HTML_PARSER):
+    """
+    Yields the text of every `<p>` element of `html`, a string or a file
+    object.
+    With the "lxml" parser the html is parsed incrementally and the elements
+    already read are discarded, so the memory used doesn't grow with the
+    size of the document. The "html5lib" parser builds the whole document
+    with BeautifulSoup, as older versions of yalign did, and handles broken
+    html exactly like a browser does.
+    """
+    if parser == "lxml":
+        return _lxml_paragraphs(html)
+    if parser == "html5lib":
+        return _html5lib_paragraphs(html)
+    raise ValueError("Unknown html parser {!r}, use one of {}".format(
+                     parser, ", ".join(HTML_PARSERS)))
+
+
+def _html5lib_paragraphs(html):
+    from bs4 import BeautifulSoup
     soup = BeautifulSoup(html, "html5lib")
-    text = '\n'.join([tag.get_text() for tag in soup.body.find_all('p')])
-    return text_to_document(text, language)
+    for tag in soup.body.find_all('p'):
+        yield tag.get_text()
+
+
+def _lxml_paragraphs(html):
+    from lxml.etree import iterparse, XMLSyntaxError
+    encoding = None
+    if isinstance(html, unicode):
+        html = html.encode("utf-8")
+        encoding = "utf-8"
+    if isinstance(html, str):
+        html = BytesIO(html)
+    depth = 0
+    started = False
+    try:
+        for event, node in iterparse(html, events=("start", "end"),
+                                     html=True, encoding=encoding):
+            started = True
+            if node.tag == "p":
+                if event == "start":
+                    depth += 1
+                    continue
+                depth -= 1
+                if depth == 0:
+                    yield u"".join(node.itertext())
+            if event == "end" and depth == 0:
+                node.clear()
+                while node.getprevious() is not None:
+                    del node.getparent()[0]
+    except XMLSyntaxError:
+        # Documents without elements have no paragraphs
+        if started:
+            raise
+
+
+def texts_to_documents(texts, language="en", workers=None, pool=None,
+                       texts_per_task=TEXTS_PER_TASK):
+    """
+    Yields the `text_to_document` of every text of `texts` in the same
+    order, doing the sentence splitting and tokenization in a pool of
+    `workers` processes (one per cpu by default).
+    `language` is either the language of all the texts or an iterable with
+    the language of each text.
+    Texts are sent to the workers in groups of `texts_per_task` and read
+    lazily, so `texts` can be an endless stream.
+    Each worker keeps its own tokenizers and sentence splitters, which are
+    loaded the first time a language is used.
+    If `workers` is 1 the texts are converted in this process, if `pool` is
+    given it's used instead of creating a new one.
+    """
+    if isinstance(language, basestring):
+        language = repeat(language)
+    tasks = _chunks(izip(texts, language), texts_per_task)
+    if pool is None and workers == 1:
+        results = (_texts_to_documents(task) for task in tasks)
+        own_pool = None
+    else:
+        own_pool = make_pool(workers, processes=True) if pool is None else None
+        results = ordered_map(pool or own_pool, _texts_to_documents,
+                              ((task,) for task in tasks))
+    try:
+        for documents in results:
+            for document in documents:
+                yield document
+    finally:
+        if own_pool is not None:
+            own_pool.terminate()
+            own_pool.join()
+
+
+def _texts_to_documents(texts):
+    return [text_to_document(text, language) for text, language in texts]
+
+
+def _chunks(iterable, n):
+    iterable = iter(iterable)
+    chunk = list(islice(iterable, n))
+    while chunk:
+        yield chunk
+        chunk = list(islice(iterable, n))
+
+
+def text_to_document_async(text, language="en", pool=None):
+    """
+    Non blocking `text_to_document`, returns a `yalign.parallel.AsyncCall`.
+    The work is done in `pool` (a thread or process pool, see
+    `yalign.parallel.make_pool`) or in a shared pool of threads.
+    """
+    if pool is None:
+        pool = default_pool()
+    return submit(pool, text_to_document, (text, language))
+
+
+def html_to_document_async(html, language="en", pool=None,
+                           parser=DEFAULT_HTML_PARSER):
+    """
+    Non blocking `html_to_document`, returns a `yalign.parallel.AsyncCall`.
+    See `text_to_document_async`.
+    """
+    if pool is None:
+        pool = default_pool()
+    return submit(pool, html_to_document, (html, language, parser))
 
 
 def generate_documents(filepath, m=MIN_LINES, n=MAX_LINES):
@@ -90,10 +409,11 @@ def generate_documents(filepath, m=MIN_LINES, n=MAX_LINES):
         A, B = _next_documents(parallel_corpus, N)
 
 
-def parallel_corpus_to_documents(filepath):
+def parallel_corpus_to_documents(filepath, compact=False):
     """
     Transforms a parallel corpus file format into two
-    documents.
+    documents, that are `Document`s sharing a vocabulary if `compact` is
+    true, and lists otherwise.
     The Parallel corpus has:
 
         * One sentences per line.
@@ -110,7 +430,21 @@ def parallel_corpus_to_documents(filepath):
 
     """
     handler = codecs.open(filepath, encoding="utf-8")
-    return _next_documents(handler)
+    if not compact:
+        return _next_documents(handler)
+    documents = _new_documents(compact)
+    for i, line in enumerate(handler):
+        sentence = Sentence(line.split())
+        sentence.check_is_tokenized()
+        documents[i % 2].append(sentence)
+    return documents
+
+
+def _new_documents(compact):
+    if not compact:
+        return [], []
+    vocabulary = Vocabulary()
+    return Document(vocabulary=vocabulary), Document(vocabulary=vocabulary)
 
 
 def _next_documents(parallel_corpus, N=None):
@@ -166,16 +500,16 @@ def _language_from_node(node):
     return node.attrib.get(XMLNS + "lang")
 
 
-def _node_to_sentence(node):
-    text = etree.tostring(node, encoding='utf-8')
-    match = re.search(STRIP_TAGS_REGEXP, text)
-    text = match.group(2) if match else u""
-    text = text.replace("\n", " ")
-    return text.decode("utf-8")  # Fixme: pick up encoding from file
+def _segment_text(segment):
+    if segment is None:
+        return u""
+    text = u"".join(segment.itertext()).replace("\n", " ")
+    return unicode(text)
 
 
 def _iterparse(input_file, tag=None, events=("end",),
                encoding=None, remove_blank_text=False):
+    from lxml import etree
     parser = etree.iterparse(input_file, events=events,
                              tag=tag, encoding=encoding,
                              remove_blank_text=remove_blank_text)
@@ -186,41 +520,129 @@ def _iterparse(input_file, tag=None, events=("end",),
             del node.getparent()[0]
 
 
-def tmx_file_to_documents(filepath, lang_a=None, lang_b=None):
+def tmx_file_to_documents(filepath, lang_a=None, lang_b=None, compact=False):
     """
     Converts a tmx file into two lists of Sentences.
     The first for language lang_a and the second for language lang_b.
+    If `compact` is true they are `Document`s sharing a vocabulary instead
+    of lists, which take a fraction of the memory.
+    See `set_document_cache` to reuse the results of previous runs.
     """
-    inputfile = open(filepath)
+    cache = document_cache()
+    if cache is not None:
+        key = _preprocessing_key("tmx", _file_hash(filepath), [lang_a, lang_b])
+        documents = cache.get(key)
+        if documents is not None:
+            if compact:
+                document_a, document_b = _new_documents(compact)
+                document_a.extend(documents[0])
+                document_b.extend(documents[1])
+                return document_a, document_b
+            return tuple(documents)
+    document_a, document_b = _new_documents(compact)
+    for sentence_a, sentence_b in iter_tmx(filepath, lang_a, lang_b):
+        document_a.append(sentence_a)
+        document_b.append(sentence_b)
+    if cache is not None:
+        _cache_put(cache, key, [document_a, document_b])
+    return document_a, document_b
 
-    tu = _iterparse(inputfile, "tu").next()
-    languages = tuple(_language_from_node(tuv) for tuv in tu.findall("tuv"))
-    source, target = languages
-    lang_a = source if lang_a is None else lang_a
-    lang_b = target if lang_b is None else lang_b
-    inputfile.seek(0)
-    document_a = []
-    document_b = []
-    try:
-        for tu in _iterparse(inputfile, "tu"):
-            sentences = {}
-            for tuv in tu.findall("tuv"):
-                seg = tuv.find("seg")
-                lang = _language_from_node(tuv)
-                if lang in languages:
-                    sentences[lang] = tokenize(_node_to_sentence(seg), lang)
-            document_a.append(sentences[lang_a])
-            document_b.append(sentences[lang_b])
-    except XMLSyntaxError as error:
-    #bug in lxml (see https://bugs.launchpad.net/lxml/+bug/1185701)
-        if error.text is not None:
-            raise
 
-    return document_a, document_b
+def iter_tmx(filepath, lang_a=None, lang_b=None):
+    """
+    Yields a pair of tokenized Sentences `(sentence_a, sentence_b)` for each
+    translation unit of the tmx file, parsing the file only once and keeping
+    only the current unit in memory.
+    If `lang_a` or `lang_b` are `None` the languages of the first translation
+    unit are used. Units without a segment in any of the two languages are
+    skipped.
+    """
+    for unit in _iter_tmx_units(filepath):
+        if lang_a is None or lang_b is None:
+            languages = [lang for lang, _ in unit]
+            lang_a = languages[0] if lang_a is None else lang_a
+            lang_b = languages[1] if lang_b is None else lang_b
+        segments = dict(unit)
+        if lang_a not in segments or lang_b not in segments:
+            continue
+        yield (tokenize(segments[lang_a], lang_a),
+               tokenize(segments[lang_b], lang_b))
+
+
+def iter_tmx_language_pairs(filepath, language_pairs):
+    """
+    Yields `((lang_a, lang_b), sentence_a, sentence_b)` for each translation
+    unit of the tmx file and each of the `language_pairs` the unit has
+    segments for, parsing the file only once.
+    Each segment is tokenized only once and the resulting Sentence is shared
+    by all the language pairs that include its language.
+    """
+    language_pairs = list(language_pairs)
+    languages = set(lang for pair in language_pairs for lang in pair)
+    for unit in _iter_tmx_units(filepath):
+        sentences = {}
+        for lang, text in unit:
+            if lang in languages and lang not in sentences:
+                sentences[lang] = tokenize(text, lang)
+        for lang_a, lang_b in language_pairs:
+            if lang_a in sentences and lang_b in sentences:
+                yield (lang_a, lang_b), sentences[lang_a], sentences[lang_b]
+
+
+def tmx_file_to_language_pair_documents(filepath, language_pairs, sinks=None):
+    """
+    Extracts the documents of several language pairs from a multilingual
+    tmx file in a single pass.
+
+    If `sinks` is `None` returns a dict that maps each `(lang_a, lang_b)`
+    of `language_pairs` to its two lists of Sentences, as
+    `tmx_file_to_documents` would.
+    Otherwise `sinks` must map each language pair to a callable that is
+    called with `(sentence_a, sentence_b)` for every unit (for instance to
+    write the pairs to disk instead of keeping them in memory), its keys
+    are the pairs extracted (`language_pairs` is ignored) and nothing is
+    returned.
+    """
+    documents = None
+    if sinks is None:
+        documents = {}
+        sinks = {}
+        for pair in language_pairs:
+            documents[pair] = ([], [])
+            sinks[pair] = _appender(*documents[pair])
+    for pair, sentence_a, sentence_b in iter_tmx_language_pairs(filepath,
+                                                              sinks.keys()):
+        sinks[pair](sentence_a, sentence_b)
+    return documents
+
+
+def _appender(document_a, document_b):
+    def append(sentence_a, sentence_b):
+        document_a.append(sentence_a)
+        document_b.append(sentence_b)
+    return append
+
+
+def _iter_tmx_units(filepath):
+    """
+    Yields, for each translation unit, a list with the `(language, text)`
+    of its segments in document order.
+    """
+    from lxml.etree import XMLSyntaxError
+    with open(filepath) as inputfile:
+        try:
+            for tu in _iterparse(inputfile, "tu"):
+                yield [(_language_from_node(tuv), _segment_text(tuv.find("seg")))
+                       for tuv in tu.iterfind("tuv")]
+        except XMLSyntaxError as error:
+        #bug in lxml (see https://bugs.launchpad.net/lxml/+bug/1185701)
+            if error.text is not None:
+                raise
 
 
 def srt_to_document(text, lang="en"):
     """ Convert a string of srt into a list of Sentences. """
+    from bs4 import UnicodeDammit
     text = UnicodeDammit(text).markup
     d = []
     for m in SRT_REGEX.finditer(text):
@@ -0,0 +1,328 @@
+# -*- coding: utf-8 -*-
+"""
+Module with helpers to run yalign's CPU bound work (document preparation and
+alignment) in pools of threads or processes without blocking the caller.
+"""
+
+import sys
+import threading
+import traceback
+from Queue import Queue, Full, Empty
+from collections import deque
+from multiprocessing import Pool, TimeoutError, cpu_count
+from multiprocessing.pool import ThreadPool
+
+_CANCELLED = "cancelled"
+_END = "end"
+QUEUE_SIZE = 16
+_worker_model = None
+_default_pool = None
+_default_pool_lock = threading.Lock()
+
+
+class CancelledError(Exception):
+    """ Raised when getting the result of a cancelled call. """
+
+
+def make_pool(workers=None, processes=False, initializer=None, initargs=()):
+    """
+    Returns a pool of `workers` threads, or processes if `processes` is
+    `True`. By default there is one worker per cpu.
+    """
+    if workers is None:
+        workers = cpu_count()
+    pool_class = Pool if processes else ThreadPool
+    return pool_class(workers, initializer, initargs)
+
+
+def default_pool():
+    """
+    Returns a thread pool shared by the calls that are not given a pool.
+    """
+    global _default_pool
+    with _default_pool_lock:
+        if _default_pool is None:
+            _default_pool = make_pool()
+    return _default_pool
+
+
+def close_default_pool():
+    """
+    Waits for the calls running in the pool of `default_pool` and stops
+    its threads. A new pool is created if it's needed again.
+    """
+    global _default_pool
+    with _default_pool_lock:
+        pool = _default_pool
+        _default_pool = None
+    if pool is not None:
+        pool.close()
+        pool.join()
+
+
+def submit(pool, function, args=(), slot=None):
+    """
+    Runs `function(*args)` in `pool` and returns an `AsyncCall` to get its
+    result.
+    If `slot` is a semaphore it's released when the call finishes, the
+    caller is expected to have acquired it.
+    When `pool` is a pool of processes `function` must be picklable (ie, a
+    module level function).
+    """
+    call = AsyncCall(slot)
+    if isinstance(pool, ThreadPool):
+        cancelled = call._cancelled
+    else:
+        cancelled = None
+    call._result = pool.apply_async(_run, (function, args, cancelled),
+                                    callback=call._finished)
+    return call
+
+
+def _run(function, args, cancelled):
+    if cancelled is not None and cancelled.is_set():
+        return _CANCELLED, None
+    try:
+        return True, function(*args)
+    except Exception as error:
+        if cancelled is not None:
+            # A thread, the traceback can be raised again in the caller
+            return False, sys.exc_info()
+        # A process, tracebacks can't be pickled
+        _add_remote_traceback(error, traceback.format_exc())
+        return False, (type(error), error, None)
+
+
+def _add_remote_traceback(error, remote_traceback):
+    error.remote_traceback = remote_traceback
+    if len(error.args) == 1 and isinstance(error.args[0], basestring):
+        try:
+            error.args = (error.args[0] + "\n\nRemote traceback:\n" +
+                          remote_traceback,)
+        except UnicodeDecodeError:
+            # Non ascii bytes in a unicode message, it's only in the
+            # attribute
+            pass
+
+
+def ordered_map(pool, function, args_iterable, max_pending=None):
+    """
+    Yields `function(*args)` for every `args` tuple of `args_iterable`, in
+    the same order, running the calls in `pool`.
+    Unlike `Pool.imap` the input is read lazily: at most `max_pending`
+    calls (by default two per worker) are submitted ahead of the result
+    being yielded, so arbitrarily long inputs use bounded memory.
+    """
+    if max_pending is None:
+        max_pending = 2 * len(getattr(pool, "_pool", [None]))
+    if max_pending < 1:
+        raise ValueError("max_pending must be 1 or more")
+    pending = deque()
+    for args in args_iterable:
+        pending.append(submit(pool, function, args))
+        if len(pending) >= max_pending:
+            yield pending.popleft().get()
+    while pending:
+        yield pending.popleft().get()
+
+
+def background(iterable, max_size=QUEUE_SIZE):
+    """
+    Yields the items of `iterable`, that is consumed in a thread of its own
+    into a queue of at most `max_size` items, so producing the items
+    overlaps with using them and memory stays bounded.
+    Exceptions raised by `iterable` are raised to the caller. If the caller
+    stops early the thread stops at the next item.
+    """
+    items = Queue(max_size)
+    stop = threading.Event()
+
+    def produce():
+        try:
+            for item in iterable:
+                if not _put(items, (True, item), stop):
+                    return
+            _put(items, (_END, None), stop)
+        except BaseException:
+            _put(items, (False, sys.exc_info()), stop)
+
+    thread = threading.Thread(target=produce)
+    thread.daemon = True
+    thread.start()
+    try:
+        while True:
+            try:
+                # Waits with a timeout so KeyboardInterrupt gets through
+                ok, item = items.get(timeout=1)
+            except Empty:
+                continue
+            if ok is _END:
+                return
+            if not ok:
+                raise item[0], item[1], item[2]
+            yield item
+    finally:
+        stop.set()
+
+
+def _put(queue, item, stop):
+    while not stop.is_set():
+        try:
+            queue.put(item, timeout=0.1)
+            return True
+        except Full:
+            pass
+    return False
+
+
+class AsyncCall(object):
+    """
+    The pending result of a function submitted to a pool.
+    """
+    def __init__(self, slot=None):
+        self._slot = slot
+        self._cancelled = threading.Event()
+        self._result = None
+
+    def _finished(self, _):
+        if self._slot is not None:
+            self._slot.release()
+
+    def ready(self):
+        """ `True` if the call has finished. """
+        return self._result.ready()
+
+    def cancel(self):
+        """
+        Cancels the call. Calls that didn't start running in a thread pool
+        are skipped, any other call runs to completion but its result is
+        discarded.
+        Returns `False` if the call had already finished.
+        """
+        if self.ready() and not self.cancelled():
+            return False
+        self._cancelled.set()
+        return True
+
+    def cancelled(self):
+        return self._cancelled.is_set()
+
+    def get(self, timeout=None):
+        """
+        Returns the result of the call, waiting at most `timeout` seconds.
+        Raises `multiprocessing.TimeoutError` (and cancels the call) if the
+        timeout expires, `CancelledError` if the call was cancelled and
+        the exception raised by the function if it failed, with its
+        traceback. Exceptions raised in another process have the formatted
+        traceback of that process in their `remote_traceback` attribute
+        and, if they have a message, at the end of it.
+        """
+        if self.cancelled():
+            raise CancelledError()
+        try:
+            ok, value = self._result.get(timeout)
+        except TimeoutError:
+            self.cancel()
+            raise
+        if ok is _CANCELLED or self.cancelled():
+            raise CancelledError()
+        if not ok:
+            error_type, error, error_traceback = value
+            raise error_type, error, error_traceback
+        return value
+
+
+class AsyncAligner(object):
+    """
+    Aligns documents with a `YalignModel` in a pool of threads or processes.
+
+    At most `max_pending` alignments are running or waiting to run at any
+    time. `submit` blocks while that limit is reached, giving backpressure
+    to the producers of documents.
+
+        with AsyncAligner(model, workers=4, processes=True) as aligner:
+            call = aligner.submit(document_a, document_b)
+            pairs = call.get(timeout=30)
+
+    `method` is the name of the method of the model that is called, for
+    example "align_costs" to get the alignments as `(i, j, cost)`.
+    """
+    def __init__(self, model, workers=None, processes=False,
+                 max_pending=None, method="align"):
+        if workers is None:
+            workers = cpu_count()
+        if max_pending is None:
+            max_pending = 2 * workers
+        if max_pending < 1:
+            raise ValueError("max_pending must be 1 or more")
+        self.model = model
+        self.processes = processes
+        self.max_pending = max_pending
+        self.method = method
+        self._slots = threading.BoundedSemaphore(max_pending)
+        if processes:
+            self.pool = make_pool(workers, True, set_worker_model, (model,))
+        else:
+            self.pool = make_pool(workers)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def submit(self, document_a, document_b):
+        """
+        Starts aligning `document_a` and `document_b` and returns an
+        `AsyncCall` whose result is the same as `YalignModel.align` (or the
+        method given to the constructor).
+        """
+        self._slots.acquire()
+        try:
+            if self.processes:
+                return submit(self.pool, _align_in_worker,
+                              (self.method, document_a, document_b),
+                              self._slots)
+            return submit(self.pool, getattr(self.model, self.method),
+                          (document_a, document_b), self._slots)
+        except:
+            self._slots.release()
+            raise
+
+    def map(self, document_pairs, timeout=None):
+        """
+        Aligns every `(document_a, document_b)` pair from `document_pairs`
+        and yields the results in the same order.
+        Pairs are read from `document_pairs` as the alignments finish, so
+        only about `max_pending` of them are in memory at the same time.
+        `timeout` applies to each alignment.
+        """
+        pending = deque()
+        for document_a, document_b in document_pairs:
+            pending.append(self.submit(document_a, document_b))
+            if len(pending) >= self.max_pending:
+                yield pending.popleft().get(timeout)
+        while pending:
+            yield pending.popleft().get(timeout)
+
+    def close(self):
+        """ Waits for the running alignments and frees the workers. """
+        self.pool.close()
+        self.pool.join()
+
+
+def set_worker_model(model):
+    """
+    Process pool initializer that makes `model` available to the workers.
+    """
+    global _worker_model
+    _worker_model = model
+
+
+def worker_model():
+    """ Returns the model given to `set_worker_model`. """
+    return _worker_model
+
+
+def _align_in_worker(method, document_a, document_b):
+    return getattr(_worker_model, method)(document_a, document_b)
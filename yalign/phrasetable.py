@@ -0,0 +1,155 @@
+# -*- coding: utf-8 -*-
+"""
+Module to build word dictionaries (see `yalign.wordpairscore`) from the
+phrase tables of statistical machine translation systems.
+
+The table is read once, decompressed in big blocks, and the lines are
+filtered in chunks by a pool of processes. The 1-gram entries are found
+with a regular expression over the whole chunk, so the other entries
+(most of the table) never become python objects.
+"""
+
+import re
+import csv
+import gzip
+import zlib
+import cPickle as pickle
+
+from yalign.parallel import make_pool, ordered_map
+
+READ_SIZE = 1 << 20
+CHUNK_SIZE = 1 << 22
+MIN_COUNT = 1
+MIN_PROBABILITY = 0.001
+# A line with a single word in both languages, the rest of the fields are
+# the third group
+ONE_GRAM_REGEXP = re.compile(r"^(\S+)\s\|\|\|\s(\S+)\s\|\|\|([^\n]*)$",
+                             re.MULTILINE)
+
+
+def filter_phrasetable(filepath, workers=None, chunk_size=CHUNK_SIZE):
+    """
+    Yields `(word_a, word_b, probability)` for the entries of the phrase
+    table in `filepath` (possibly gzipped) that are useful as a word
+    dictionary (see `filter_chunk`), in the order of the table.
+    The work is done by `workers` processes, one per cpu by default, or in
+    this process if `workers` is 1.
+    """
+    chunks = _chunks(_read_blocks(filepath), chunk_size)
+    if workers == 1:
+        results = (filter_chunk(chunk) for chunk in chunks)
+        pool = None
+    else:
+        pool = make_pool(workers, processes=True)
+        results = ordered_map(pool, filter_chunk,
+                              ((chunk,) for chunk in chunks))
+    try:
+        for entries in results:
+            for entry in entries:
+                yield entry
+    finally:
+        if pool is not None:
+            pool.terminate()
+            pool.join()
+
+
+def filter_chunk(data):
+    """
+    Returns the `(word_a, word_b, probability)` entries of the phrase table
+    lines in `data` that:
+        * have a 1-gram on both sides
+        * have a count of at least `MIN_COUNT` on both sides
+        * have a probability of at least `MIN_PROBABILITY`, the mean of the
+          direct and inverse phrase translation probabilities
+    The words are lowercased unicode.
+    """
+    result = []
+    for match in ONE_GRAM_REGEXP.finditer(data):
+        fields = match.group(3).split("|||")
+        try:
+            counts = fields[2].split()
+            tgt_count = int(float(counts[0]))
+            src_count = int(float(counts[1]))
+            probs = fields[0].split()
+            inverse_prob = float(probs[0])
+            direct_prob = float(probs[2])
+        except (IndexError, ValueError):
+            # Not a phrase table entry
+            continue
+        if src_count < MIN_COUNT or tgt_count < MIN_COUNT:
+            continue
+        prob = 0.5 * inverse_prob + 0.5 * direct_prob
+        if prob < MIN_PROBABILITY:
+            continue
+        src = match.group(1).decode("utf-8").lower()
+        tgt = match.group(2).decode("utf-8").lower()
+        result.append((src, tgt, prob))
+    return result
+
+
+def save_dictionary(entries, filepath):
+    """
+    Saves the `(word_a, word_b, probability)` `entries` as a word
+    dictionary for `WordPairScore`: a csv file (gzipped if `filepath` ends
+    with ".gz"), or a pickled dict of dicts if it ends with ".pickle",
+    which loads much faster.
+    Returns the number of entries.
+    """
+    n = 0
+    if filepath.endswith(".pickle"):
+        translations = {}
+        for src, tgt, prob in entries:
+            translations.setdefault(src, {})[tgt] = prob
+            n += 1
+        with open(filepath, "wb") as output:
+            pickle.dump(translations, output, pickle.HIGHEST_PROTOCOL)
+        return n
+    if filepath.endswith(".gz"):
+        output = gzip.open(filepath, "wb")
+    else:
+        output = open(filepath, "wb")
+    with output:
+        writer = csv.writer(output)
+        for src, tgt, prob in entries:
+            writer.writerow([src.encode("utf-8"), tgt.encode("utf-8"), prob])
+            n += 1
+    return n
+
+
+def _read_blocks(filepath):
+    with open(filepath, "rb") as inputfile:
+        blocks = iter(lambda: inputfile.read(READ_SIZE), "")
+        if not filepath.endswith(".gz"):
+            for block in blocks:
+                yield block
+            return
+        # zlib on big blocks is much faster than reading lines from a
+        # GzipFile. A gzip file can have several members.
+        decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+        for block in blocks:
+            while block:
+                yield decompressor.decompress(block)
+                block = decompressor.unused_data
+                if block:
+                    yield decompressor.flush()
+                    decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+        yield decompressor.flush()
+
+
+def _chunks(blocks, chunk_size):
+    """ Joins `blocks` into chunks of about `chunk_size` whole lines. """
+    pending = []
+    size = 0
+    for block in blocks:
+        pending.append(block)
+        size += len(block)
+        if size >= chunk_size:
+            data = "".join(pending)
+            end = data.rfind("\n") + 1
+            if end:
+                yield data[:end]
+            pending = [data[end:]]
+            size = len(pending[0])
+    data = "".join(pending)
+    if data:
+        yield data
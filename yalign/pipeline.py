@@ -0,0 +1,221 @@
+# -*- coding: utf-8 -*-
+"""
+Module to align big comparable corpora using all the cpus.
+
+`align_text_pairs` runs a pipeline of stages connected by bounded queues,
+each one driven by its own thread: the texts are read, split and tokenized
+in a pool of processes, aligned in another pool of processes (each one with
+its own copy of the model) and the results are yielded in the input order.
+
+`align_manifest` aligns many pairs of files or urls, each one with its own
+languages, doing all the work of a pair in one worker of a pool of
+processes.
+"""
+
+import sys
+import time
+import codecs
+from collections import deque
+from itertools import chain, cycle, izip
+
+from yalign.parallel import make_pool, background, ordered_map, \
+    AsyncAligner, QUEUE_SIZE, set_worker_model, worker_model
+from yalign.input_conversion import texts_to_documents, text_to_document, \
+    html_to_text, DEFAULT_HTML_PARSER
+
+PROGRESS_INTERVAL = 10
+
+# The fetchers of `align_manifest`, by their options
+_fetchers = {}
+
+
+def align_text_pairs(model, text_pairs, lang_a, lang_b,
+                     preprocess_workers=None, align_workers=None,
+                     queue_size=QUEUE_SIZE, progress=None):
+    """
+    Aligns the `(text_a, text_b)` pairs of the iterable `text_pairs` with
+    `model` and yields `(doc_index, sentence_a, sentence_b, cost)` records
+    like `YalignModel.iter_align`.
+
+    The texts are converted to documents by `preprocess_workers` processes
+    and aligned by `align_workers` processes (one per cpu by default).
+    At most `queue_size` items wait between two stages, and a bounded
+    number of tasks are pending in each pool, so memory doesn't depend on
+    the size of the input.
+    `progress` is called with the number of alignments of every document
+    pair once it's aligned, see `Progress`.
+    """
+    # The pools are created before the threads, forking a process with
+    # other threads running could copy locks held by them.
+    if preprocess_workers == 1:
+        preprocess_pool = None
+    else:
+        preprocess_pool = make_pool(preprocess_workers, processes=True)
+    aligner = AsyncAligner(model, align_workers, processes=True,
+                           method="align_costs")
+    try:
+        texts = chain.from_iterable(background(text_pairs, queue_size))
+        documents = texts_to_documents(texts, cycle([lang_a, lang_b]),
+                                       preprocess_workers, preprocess_pool)
+        document_pairs = background(izip(documents, documents), queue_size)
+        results = background(_align(aligner, document_pairs), queue_size)
+        for doc_index, (document_a, document_b, alignments) in \
+                enumerate(results):
+            for a, b, cost in alignments:
+                yield doc_index, document_a[a], document_b[b], cost
+            if progress is not None:
+                progress(len(alignments))
+    finally:
+        aligner.pool.terminate()
+        aligner.pool.join()
+        if preprocess_pool is not None:
+            preprocess_pool.terminate()
+            preprocess_pool.join()
+
+
+def _align(aligner, document_pairs):
+    pending = deque()
+    for document_a, document_b in document_pairs:
+        call = aligner.submit(document_a, document_b)
+        pending.append((document_a, document_b, call))
+        if len(pending) >= aligner.max_pending:
+            document_a, document_b, call = pending.popleft()
+            yield document_a, document_b, call.get()
+    while pending:
+        document_a, document_b, call = pending.popleft()
+        yield document_a, document_b, call.get()
+
+
+class Progress(object):
+    """
+    Writes to `stream`, at most every `interval` seconds, the number of
+    document pairs and alignments done and the document pairs per second.
+    Use it as the `progress` of `align_text_pairs`.
+    """
+    def __init__(self, stream=sys.stderr, interval=PROGRESS_INTERVAL):
+        self.stream = stream
+        self.interval = interval
+        self.documents = 0
+        self.alignments = 0
+        self.start = self.last = time.time()
+
+    def __call__(self, alignments):
+        self.documents += 1
+        self.alignments += alignments
+        now = time.time()
+        if now - self.last >= self.interval:
+            self.last = now
+            self.report()
+
+    def report(self):
+        seconds = time.time() - self.start
+        rate = self.documents / seconds if seconds else 0.0
+        self.stream.write("{} document pairs, {} alignments, {:.1f} docs/sec"
+                          "\n".format(self.documents, self.alignments, rate))
+
+
+class ManifestEntry(object):
+    """
+    A pair of documents (file paths or urls) to align, their languages and
+    the file to write the alignments to (or `None`).
+    """
+    def __init__(self, document_a, document_b, lang_a, lang_b, output=None):
+        self.document_a = document_a
+        self.document_b = document_b
+        self.lang_a = lang_a
+        self.lang_b = lang_b
+        self.output = output
+
+
+def read_manifest(filepath, lang_a="en", lang_b="es"):
+    """
+    Returns the list of `ManifestEntry` of a manifest file, with one pair
+    of documents per line and tab separated columns:
+
+        document_a, document_b[, lang_a, lang_b[, output]]
+
+    `lang_a` and `lang_b` are the languages of the lines without them.
+    Empty lines and lines starting with # are skipped.
+    """
+    entries = []
+    with codecs.open(filepath, encoding="utf-8") as inputfile:
+        for number, line in enumerate(inputfile, 1):
+            line = line.rstrip(u"\r\n")
+            if not line.strip() or line.startswith(u"#"):
+                continue
+            fields = line.split(u"\t")
+            if len(fields) not in (2, 4, 5):
+                raise ValueError("Line {} of {} has {} columns, expected 2, 4 "
+                                 "or 5".format(number, filepath, len(fields)))
+            if len(fields) == 2:
+                fields += [lang_a, lang_b]
+            entries.append(ManifestEntry(*fields))
+    return entries
+
+
+def align_manifest(model, entries, workers=None,
+                   html_parser=DEFAULT_HTML_PARSER, fetcher_options=None):
+    """
+    Aligns the documents of every `ManifestEntry` of `entries` with `model`
+    and yields, in the same order, `(entry, records, error, seconds)`,
+    where `records` are the `(sentence_a, sentence_b, cost)` alignments of
+    the pair, or `None` if reading or aligning it failed with the message
+    `error`, and `seconds` is the time the pair took.
+
+    Each pair is done by one of `workers` processes (one per cpu by
+    default), or in this process if `workers` is 1. Urls are downloaded by
+    a `yalign.fetcher.Fetcher` per process, created with the keyword
+    arguments `fetcher_options`.
+    """
+    fetcher_options = tuple(sorted((fetcher_options or {}).items()))
+    if workers == 1:
+        set_worker_model(model)
+        for entry in entries:
+            yield _align_entry(entry, html_parser, fetcher_options)
+        return
+    pool = make_pool(workers, True, set_worker_model, (model,))
+    try:
+        tasks = ((entry, html_parser, fetcher_options) for entry in entries)
+        for result in ordered_map(pool, _align_entry, tasks):
+            yield result
+    finally:
+        pool.terminate()
+        pool.join()
+
+
+def _align_entry(entry, html_parser, fetcher_options):
+    start = time.time()
+    try:
+        fetcher = _fetcher(fetcher_options)
+        text_a = read_text(entry.document_a, html_parser, fetcher)
+        text_b = read_text(entry.document_b, html_parser, fetcher)
+        document_a = text_to_document(text_a, entry.lang_a)
+        document_b = text_to_document(text_b, entry.lang_b)
+        alignments = worker_model().align_costs(document_a, document_b)
+    except Exception as error:
+        message = "{}: {}".format(type(error).__name__, error)
+        return entry, None, message, time.time() - start
+    records = [(document_a[a], document_b[b], cost)
+               for a, b, cost in alignments]
+    return entry, records, None, time.time() - start
+
+
+def _fetcher(options):
+    from yalign.fetcher import Fetcher
+    if options not in _fetchers:
+        _fetchers[options] = Fetcher(**dict(options))
+    return _fetchers[options]
+
+
+def read_text(source, html_parser=DEFAULT_HTML_PARSER, fetcher=None):
+    """
+    Returns the text of `source`: a url (downloaded with `fetcher`, see
+    `yalign.utils.read_from_url`), an html file or a utf-8 text file.
+    """
+    from yalign.utils import read_from_url
+    if source.startswith("http"):
+        return html_to_text(read_from_url(source, fetcher), html_parser)
+    text = codecs.open(source, encoding="utf-8").read()
+    if source.endswith(".html"):
+        return html_to_text(text, html_parser)
+    return text
@@ -0,0 +1,162 @@
+# -*- coding: utf-8 -*-
+"""
+Module for lightweight instrumentation of the alignment pipeline.
+
+Profiling is off by default, in that case the instrumented functions only
+pay for checking a flag. Once enabled the time spent and the number of calls
+of each stage (tokenization, sentence splitting, word and sentence pair
+scoring, sequence alignment and thresholding) are accumulated and can be
+read with `stats()`, or per alignment with `YalignModel.last_stats`.
+
+Stages can be nested (for instance sentence pair scoring happens inside
+sequence alignment) and the time of each stage includes the time of the
+stages nested in it.
+"""
+
+import sys
+import threading
+from time import time
+from functools import wraps
+from contextlib import contextmanager
+
+_enabled = False
+_local = threading.local()
+
+
+class Stats(dict):
+    """
+    Maps stage names to `[calls, seconds]`.
+    Counters are stages that only have calls.
+    """
+    def add(self, stage, seconds, calls=1):
+        values = self.setdefault(stage, [0, 0.0])
+        values[0] += calls
+        values[1] += seconds
+
+    def count(self, name, n=1):
+        self.add(name, 0.0, n)
+
+    def merge(self, other):
+        for stage, (calls, seconds) in other.iteritems():
+            self.add(stage, seconds, calls)
+
+    def summary(self):
+        """ Returns the stats as a human readable table. """
+        lines = ["{:30}{:>12}{:>12}{:>14}".format("stage", "calls",
+                                                  "seconds", "usec/call")]
+        for stage, (calls, seconds) in sorted(self.iteritems()):
+            per_call = seconds / calls * 1e6 if calls else 0.0
+            lines.append("{:30}{:>12}{:>12.3f}{:>14.1f}".format(
+                         stage, calls, seconds, per_call))
+        return "\n".join(lines) + "\n"
+
+
+def enable():
+    """ Turns profiling on. """
+    global _enabled
+    _enabled = True
+
+
+def disable():
+    """ Turns profiling off. """
+    global _enabled
+    _enabled = False
+
+
+def is_enabled():
+    return _enabled
+
+
+def stats():
+    """
+    Returns the `Stats` of the current thread accumulated since profiling
+    was enabled (or since the last `reset`).
+    """
+    if not hasattr(_local, "stack"):
+        _local.stack = [Stats()]
+    return _local.stack[-1]
+
+
+def reset():
+    """ Clears the stats of the current thread. """
+    _local.stack = [Stats()]
+
+
+def timed(stage):
+    """
+    Decorator that accumulates the time spent in the decorated function
+    under the name `stage`.
+    """
+    def decorator(f):
+        @wraps(f)
+        def wrapper(*args, **kwargs):
+            if not _enabled:
+                return f(*args, **kwargs)
+            start = time()
+            try:
+                return f(*args, **kwargs)
+            finally:
+                stats().add(stage, time() - start)
+        return wrapper
+    return decorator
+
+
+@contextmanager
+def stage(name):
+    """ Context manager version of `timed`. """
+    if not _enabled:
+        yield
+        return
+    start = time()
+    try:
+        yield
+    finally:
+        stats().add(name, time() - start)
+
+
+def count(name, n=1):
+    """ Adds `n` to the counter `name` if profiling is enabled. """
+    if _enabled:
+        stats().count(name, n)
+
+
+@contextmanager
+def collect():
+    """
+    Collects in a new `Stats` object the stats of the code run inside the
+    context. The stats are also accumulated to the enclosing collector.
+    Yields `None` if profiling is disabled.
+    """
+    if not _enabled:
+        yield None
+        return
+    parent = stats()
+    current = Stats()
+    _local.stack.append(current)
+    try:
+        yield current
+    finally:
+        _local.stack.pop()
+        parent.merge(current)
+
+
+def run(main, args, profile_path=None, stream=None):
+    """
+    Runs `main(args)`. If `profile_path` is given the run is profiled: a
+    cProfile dump (readable with `pstats`) is saved to `profile_path` and a
+    per stage summary is written to `stream` (stderr by default).
+    """
+    if not profile_path:
+        return main(args)
+    import cProfile
+    if stream is None:
+        stream = sys.stderr
+    enable()
+    reset()
+    profiler = cProfile.Profile()
+    try:
+        return profiler.runcall(main, args)
+    finally:
+        disable()
+        profiler.dump_stats(profile_path)
+        stream.write(stats().summary())
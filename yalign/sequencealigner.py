@@ -4,6 +4,8 @@ Module for handling sequence alignment.
 """
 from simpleai.search import SearchProblem, astar
 
+from yalign import profiling
+
 
 class SequenceAligner(object):
     """
@@ -13,6 +15,7 @@ class SequenceAligner(object):
         self.score = score
         self.penalty = gap_penalty
 
+    @profiling.timed("sequence_alignment")
     def __call__(self, xs, ys, score=None, penalty=None):
         """
         Returns an alignment of sequences `xs` and `ys` such that it maximizes
@@ -32,6 +35,7 @@ class SequenceAligner(object):
             penalty = self.penalty
         problem = SequenceAlignmentSearchProblem(xs, ys, score, penalty)
         node = astar(problem, graph_search=True)
+        profiling.count("astar_expansions", problem.expansions)
         path = [action for action, node in node.path()[1:]]
         return path
 
@@ -52,6 +56,7 @@ class SequenceAlignmentSearchProblem(SearchProblem):
         self.N = len(xs)
         self.M = len(ys)
         self.goal = (self.N - 1, self.M - 1)
+        self.expansions = 0
 
     def actions(self, state):
         """
@@ -60,6 +65,7 @@ class SequenceAlignmentSearchProblem(SearchProblem):
         An action is a the next alignment to consider with a score for
         that alignment.
         """
+        self.expansions += 1
         i, j = state
         i += 1
         j += 1
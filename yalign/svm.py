@@ -6,9 +6,10 @@ Module for code dealing with the classifier.
 
 import numpy
 
-from sklearn import svm
 from simpleai.machine_learning import Classifier
 
+from yalign.profiling import timed
+
 
 class SVMClassifier(Classifier):
     """
@@ -29,7 +30,8 @@ class SVMClassifier(Classifier):
             answers.append(answer)
         if not vectors:
             raise ValueError("Cannot train on empty set")
-        self.svm = svm.SVC()
+        from sklearn.svm import SVC
+        self.svm = SVC()
         self._SVC_hack()
         self.svm.fit(vectors, answers)
 
@@ -42,6 +44,7 @@ class SVMClassifier(Classifier):
         vector = self._vectorize(sentence_pair)
         return self.svm.predict(vector)[0], 1
 
+    @timed("svm_score")
     def score(self, data):
         """
         The score is positive for an alignment.
@@ -50,6 +53,7 @@ class SVMClassifier(Classifier):
         vector = self._vectorize(data)
         return float(self.svm.decision_function(vector))
 
+    @timed("feature_extraction")
     def _vectorize(self, data):
         vector = [attr(data) for attr in self.attributes]
         vector = numpy.array(vector)
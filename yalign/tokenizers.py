@@ -3,13 +3,11 @@
 Module providing tokenizers for various languages.
 """
 
-from nltk.tokenize import RegexpTokenizer, WordPunctTokenizer  # FIXME: It's an overkill
 import re
 
 ###
 ### Common section
 ###
-default_tokenizer = WordPunctTokenizer()
 
 basic_macros = {
     "AN1": "[a-z0-9]",
@@ -20,55 +18,164 @@ macros = {
     "USERNAME": "{AN1}{AN2}*",
     "HOSTNAME": "{AN1}{AN2}*",
     "HOSTNAME2": r"{AN1}{AN2}*\.{AN2}*",
-    "HOSTNAME3": r"{AN1}{AN2}*(:[0-9]{{1,5}})?",
-    "HOSTNAME4": r"www\.{AN1}{AN2}*\.{AN2}*(:[0-9]{{1,5}})?",
-    "SCHEME": "mailto:|((http|https|ftp|ftps|ssh|git|news)://)",
+    "HOSTNAME3": r"{AN1}{AN2}*(?::[0-9]{{1,5}})?",
+    "HOSTNAME4": r"www\.{AN1}{AN2}*\.{AN2}*(?::[0-9]{{1,5}})?",
+    "SCHEME": "mailto:|(?:(?:http|https|ftp|ftps|ssh|git|news)://)",
 }
-macros = {k: "(" + v.format(**basic_macros) + ")"
+macros = {k: "(?:" + v.format(**basic_macros) + ")"
                                                 for k, v in macros.items()}
 macros.update(basic_macros)
 
+FLAGS = re.UNICODE | re.MULTILINE | re.DOTALL | re.I
+
+
+class Words(list):
+    """
+    A tokenizer rule that matches any of a list of literal words, trying
+    them in order like a regular expression alternation does.
+    """
+
+
 eyes = ":;8xX>="
 noses = [""] + list("-o")
-mouths = list("DP/") + ["}}", "{{", "\\[", "\\]", "\\(", "\\)", "\\|"]
-smileys = [x + y + z for x in eyes for y in noses for z in mouths]
+mouths = list("DP/}{[]()|")
+smileys = Words(x + y + z for x in eyes for y in noses for z in mouths)
 
 HEADER = [
-    "([01]?[0-9]|2[0-4]):[0-5]?[0-9](:[0-5]?[0-9])?",  # Time of day
+    "(?:[01]?[0-9]|2[0-4]):[0-5]?[0-9](?::[0-5]?[0-9])?",  # Time of day
     "''|``",                                           # Quotation
     "{USERNAME}@{HOSTNAME2}",                          # Typical email
-    "{SCHEME}({USERNAME}@)?{HOSTNAME3}(/{AN3}*)?",     # URI
+    "{SCHEME}(?:{USERNAME}@)?{HOSTNAME3}(?:/{AN3}*)?", # URI
     "{HOSTNAME4}",                                     # Typical URL
 ]
 
 FOOTER = [
     "\w+&\w+",                                         # And words
     "\w+",                                             # Normal words
-    "|".join(smileys),                                 # Smileys
+    smileys,                                           # Smileys
     "[()/\[\]\\.,;:\-\"'`~?]|\\.\\.\\.",               # Punctuation marks
     "\S+",                                             # Anything else
 ]
 languages = {}
+_compiled_tokenizers = {}
+
+
+class CompiledTokenizer(object):
+    """
+    Tokenizer that returns every match of a regular expression, the same
+    as NLTK's `RegexpTokenizer` does, but compiling the expression only
+    once and without the overhead of the generic tokenizer interface.
+    """
+    def __init__(self, pattern, flags=FLAGS):
+        self.pattern = pattern
+        self.regex = re.compile(pattern, flags)
+
+    def tokenize(self, text):
+        if self.regex.groups:
+            return [m.group() for m in self.regex.finditer(text)]
+        return self.regex.findall(text)
+
+
+# Same as NLTK's WordPunctTokenizer
+default_tokenizer = CompiledTokenizer(r"\w+|[^\w\s]+",
+                                      re.UNICODE | re.MULTILINE | re.DOTALL)
 
 
 def get_tokenizer(language):
     """
     Get a tokenizer for a two character language code.
+    Tokenizers are compiled once per process and shared.
+    """
+    if language not in languages:
+        return default_tokenizer
+    if language not in _compiled_tokenizers:
+        regex = rules_to_regex(languages[language])
+        _compiled_tokenizers[language] = CompiledTokenizer(regex)
+    return _compiled_tokenizers[language]
+
+
+def rules_to_regex(rules, trie=True):
+    """
+    Joins the tokenizer `rules` in a regular expression, the first rule
+    that matches gives the token.
+    `Words` rules are compiled into a trie (see `trie_regex`) unless `trie`
+    is `False`, in which case they are a plain alternation.
     """
-    tokenizer = default_tokenizer
-    if language in languages:
-        regex = languages[language]
-        regex = [x.format(**macros) for x in regex]
-        regex = u"|".join(regex)
-        tokenizer = RegexpTokenizer(regex, flags=re.UNICODE | re.MULTILINE | re.DOTALL | re.I)
-    return tokenizer
+    regex = []
+    for rule in rules:
+        if isinstance(rule, Words):
+            if trie:
+                regex.append(trie_regex(rule))
+            else:
+                regex.append(u"|".join(re.escape(word) for word in rule))
+        else:
+            regex.append(rule.format(**macros))
+    return u"|".join(regex)
+
+
+def trie_regex(words):
+    """
+    Returns a regular expression that, matched case insensitively, matches
+    the same as the alternation of the literal `words` (ie, the first word
+    of the list that matches), but that follows a trie of the characters of
+    the words instead of trying them one by one.
+    """
+    unique = []
+    seen = set()
+    for word in words:
+        word = word.lower()
+        if word not in seen:
+            seen.add(word)
+            unique.append((len(unique), word))
+    return "(?:" + _trie_regex(unique) + ")"
+
+
+def _trie_regex(words):
+    # words is a list of (position, suffix) in alternation order
+    end = None
+    children = []
+    groups = {}
+    for i, word in words:
+        if not word:
+            end = i
+        elif word[0] in groups:
+            groups[word[0]].append((i, word[1:]))
+        else:
+            groups[word[0]] = [(i, word[1:])]
+            children.append(word[0])
+    # Children start with different characters so at most one can match and
+    # the ones that end right there can be tried together as a class
+    branches = []
+    leaves = []
+    for c in children:
+        child = _trie_regex(groups[c])
+        if child:
+            branches.append(re.escape(c) + child)
+        else:
+            leaves.append(re.escape(c))
+    if len(leaves) > 1:
+        branches.append("[" + "".join(leaves) + "]")
+    else:
+        branches.extend(leaves)
+    if not branches:
+        return ""
+    body = "|".join(branches)
+    if end is None:
+        return body if len(branches) == 1 else "(?:" + body + ")"
+    rest = [i for i, word in words if word]
+    if end < min(rest):
+        # The shorter word comes first, it wins if it matches
+        return "(?:" + body + ")??"
+    if end > max(rest):
+        return "(?:" + body + ")?"
+    return "(?:" + "|".join(re.escape(word) for _, word in words) + ")"
 
 
 ###
 ### English
 ###
 
-english_contractions = [
+english_contractions = Words([
  "ain't",
  "aren't",
  "can't",
@@ -174,13 +281,13 @@ english_contractions = [
  "you'll",
  "you'll've",
  "you're",
- "you've"]
+ "you've"])
 
 languages["en"] = HEADER + [
     "[01]?[0-9][-/.][0123]?[0-9][-/.][0-9]{{2,4}}",    # Date mm/dd/yyyy
-    "|".join(english_contractions),                    # Common contractions
+    english_contractions,                              # Common contractions
     "'s",                                              # Possesive
-    "\w+([_-]\w+)+",                                   # Normal words+compounds
+    "\w+(?:[_-]\w+)+",                                 # Normal words+compounds
 ] + FOOTER
 
 
@@ -201,5 +308,5 @@ languages["es"] = HEADER + [
 languages["pt"] = HEADER + [
     "[0123]?[0-9][-/.][01]?[0-9][-/.][0-9]{{2,4}}",    # Date dd/mm/yyyy
     u"¡¿",                                             # Extra punctuation mark
-    "\w+(-\w+)+",                                      # Compound words
+    "\w+(?:-\w+)+",                                    # Compound words
 ] + FOOTER
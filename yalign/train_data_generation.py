@@ -4,43 +4,65 @@
 Module to generate training data.
 """
 import random
+from array import array
 from datatypes import SentencePair
 
 
-def training_alignments_from_documents(document_a, document_b):
+def training_alignments_from_documents(document_a, document_b, seed=None):
     """
     Returns an iterable of SentencePairs to be used for training.
     The inputs `document_a` and `document_b` are both lists of
     Sentences made from a parallel corpus.
+
+    The documents are scrambled as `training_scrambling_from_documents`
+    does, but without copying them: the pairs are generated one at a time
+    (first the aligned ones, then as many misaligned ones) in time and
+    memory proportional to the number of sentences.
+    If `seed` is given the same pairs are generated on every call,
+    otherwise the `random` module is used.
     """
     if not len(document_a) == len(document_b):
         raise ValueError("Documents must be the same size")
-    document_a, document_b, alignments = \
-                    training_scrambling_from_documents(document_a, document_b)
-    for sample in _aligned_samples(document_a, document_b, alignments):
+    rng = _random_source(seed)
+    order_a = _inverse(_random_range(len(document_a), rng=rng))
+    order_b = _inverse(_random_range(len(document_b), rng=rng))
+    A = _Reordered(document_a, order_a)
+    B = _Reordered(document_b, order_b)
+    alignments = _Alignments(order_a, order_b)
+    for sample in _aligned_samples(A, B, alignments):
         yield sample
-    for sample in _misaligned_samples(document_a, document_b, alignments):
+    for sample in _misaligned_samples(A, B, alignments, rng):
         yield sample
 
 
-def training_scrambling_from_documents(document_a, document_b):
+def training_scrambling_from_documents(document_a, document_b, span=10,
+                                       seed=None):
     """
     Returns a tuple `(scrambled_a, scrambled_b, correct_alignments)` where:
         * `scrambled_a` is a scrambled version of document_a.
         * `scrambled_b` is a scrambled version of document_b.
         * `correct_alignments` are all the correct sentence alignments that exist
            between `scrambled_a` and `scrambled_b`.
+    `span` is the maximum length of the sections that are shuffled (see
+    `_random_range`).
+    If `seed` is given the scrambling is the same on every call, otherwise
+    the `random` module is used.
     """
+    rng = _random_source(seed)
     xs = list(enumerate(document_a))
     ys = list(enumerate(document_b))
-    xs = _reorder(xs, _random_range(len(xs)))
-    ys = _reorder(ys, _random_range(len(ys)))
+    xs = _reorder(xs, _random_range(len(xs), span, rng))
+    ys = _reorder(ys, _random_range(len(ys), span, rng))
     alignments = _extract_alignments(xs, ys)
     A = [x[1] for x in xs]
     B = [y[1] for y in ys]
     return A, B, alignments
 
 
+def _random_source(seed):
+    return random if seed is None else random.Random(seed)
+
+
 def _extract_alignments(xs, ys):
     """
     Returns alignments for lists xs and ys.
@@ -48,38 +70,74 @@ def _extract_alignments(xs, ys):
     The items in the lists are tuples where each tuple consists of
     a key and value. The alignments are formed by matching the keys.
     If there is no matching key then the item is aligned with None.
+    The keys are the positions of the items in the original lists.
     """
-    x_dict = dict(xs)
-    y_dict = dict(ys)
-    alignments = []
-    n = max(len(xs), len(ys))
-    for idx in xrange(n):
-        x = x_dict.get(idx, None)
-        y = y_dict.get(idx, None)
-        i, j = None, None
-        if not x is None:
-            i = xs.index((idx, x))
-        if not y is None:
-            j = ys.index((idx, y))
-        if not (i, j) == (None, None):
-            alignments.append((i, j))
-    alignments.sort()
+    y_positions = [None] * max(len(xs), len(ys))
+    for j, (key, _) in enumerate(ys):
+        y_positions[key] = j
+    x_keys = set(key for key, _ in xs)
+    # Sorted: (None, j) pairs first, then the rest by i
+    alignments = [(None, j) for j, (key, _) in enumerate(ys)
+                  if key not in x_keys]
+    alignments.extend((i, y_positions[key]) for i, (key, _) in enumerate(xs))
     return alignments
 
 
+class _Reordered(object):
+    """
+    Read only view of `document` where item `i` is `document[order[i]]`.
+    """
+    def __init__(self, document, order):
+        self.document = document
+        self.order = order
+
+    def __getitem__(self, i):
+        return self.document[self.order[i]]
+
+    def __len__(self):
+        return len(self.order)
+
+
+class _Alignments(object):
+    """
+    The sorted alignments between two reorderings of documents of the same
+    length, computed when needed.
+    """
+    def __init__(self, order_a, order_b):
+        self.order_a = order_a
+        self.positions_b = _inverse(order_b)
+
+    def __iter__(self):
+        for i, key in enumerate(self.order_a):
+            yield i, self.positions_b[key]
+
+    def __len__(self):
+        return len(self.order_a)
+
+    def __contains__(self, alignment):
+        i, j = alignment
+        if i is None or not 0 <= i < len(self.order_a):
+            return False
+        return self.positions_b[self.order_a[i]] == j
+
+
 def _aligned_samples(A, B, alignments):
     for i, j in alignments:
         yield SentencePair(A[i], B[j], aligned=True)
 
 
-def _misaligned_samples(A, B, alignments):
-    misalignments = []
+def _misaligned_samples(A, B, alignments, rng=random):
+    if not isinstance(alignments, _Alignments):
+        alignments = set(alignments)
+    misalignments = set()
     if len(alignments) > 1:
         while len(misalignments) < len(alignments):
-            i = random.randint(0, len(A) - 1)
-            j = random.randint(0, len(B) - 1)
-            if not (i, j) in alignments and not (i, j) in misalignments:
-                misalignments.append((i, j))
+            i = rng.randint(0, len(A) - 1)
+            j = rng.randint(0, len(B) - 1)
+            # Pairs as one integer, takes less memory than tuples
+            pair = i * len(B) + j
+            if not (i, j) in alignments and not pair in misalignments:
+                misalignments.add(pair)
                 yield SentencePair(A[i], B[j], aligned=False)
 
 
@@ -93,7 +151,18 @@ def _reorder(xs, indexes):
     return ys
 
 
-def _random_range(N, span=10):
+def _inverse(indexes):
+    """
+    Returns the array of the positions of `0, 1, ...` in `indexes`, that is
+    the order of the items after `_reorder(xs, indexes)`.
+    """
+    result = array("l", [0]) * len(indexes)
+    for i, j in enumerate(indexes):
+        result[j] = i
+    return result
+
+
+def _random_range(N, span=10, rng=random):
     """
     Returns a list of N integers.
     The span determines the length of the sections
@@ -106,9 +175,9 @@ def _random_range(N, span=10):
     xs = []
     n = 0
     while n < N:
-        r = random.randint(1, span)
+        r = rng.randint(1, span)
         n = min(n + r, N)
         ys = range(len(xs), n)
-        random.shuffle(ys)
+        rng.shuffle(ys)
         xs += ys
     return xs
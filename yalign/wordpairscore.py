@@ -4,7 +4,9 @@ Module for scoring pairs of words.
 """
 import csv
 import gzip
+import cPickle as pickle
 from yalign.datatypes import ScoreFunction
+from yalign.profiling import timed
 
 
 class WordPairScore(ScoreFunction):
@@ -14,8 +16,9 @@ class WordPairScore(ScoreFunction):
     """
     def __init__(self, dictionary_file):
         """
-        Requires a csv file where each line contains:
+        Requires a csv file (possibly gzipped) where each line contains:
         {word_a},{word_b},{translation probability of a to b}
+        or a ".pickle" file saved by `yalign.phrasetable.save_dictionary`.
         """
         super(WordPairScore, self).__init__(0, 1)
         self.filepath = dictionary_file
@@ -29,6 +32,10 @@ class WordPairScore(ScoreFunction):
             return open(self.filepath, 'r')
 
     def _parse_words_file(self):
+        if self.filepath.endswith(".pickle"):
+            with open(self.filepath, "rb") as input_file:
+                self.translations = pickle.load(input_file)
+            return
         input_file = self._open_file()
         data = csv.reader(input_file)
         for elem in data:
@@ -39,6 +46,7 @@ class WordPairScore(ScoreFunction):
                 self.translations[word_a] = {}
             self.translations[word_a][word_b] = float(prob)
 
+    @timed("word_pair_score")
     def __call__(self, sentence_a, sentence_b):
         """
         Returns a list of scores for words in Sentence `sentence_a`
@@ -0,0 +1,200 @@
+# -*- coding: utf-8 -*-
+"""
+Module with writers for the output of the alignments.
+
+A writer outputs a whole run of alignments, possibly spanning many document
+pairs, as a single valid file.
+"""
+
+import re
+import abc
+import json
+import gzip
+from xml.sax.saxutils import quoteattr
+
+BUFFER_SIZE = 1 << 16
+# Much faster than the maximum, for a slightly bigger output
+COMPRESS_LEVEL = 6
+# Characters that can't appear in xml 1.0 documents, not even escaped
+_INVALID_XML_CHARACTERS = re.compile(u"[\x00-\x08\x0b\x0c\x0e-\x1f"
+                                     u"\ufffe\uffff]")
+
+
+class AlignmentWriter(object):
+    """
+    Base class for the alignment writers.
+    Use it as a context manager so that headers and footers are written
+    exactly once:
+
+        with TMXWriter(stream, "en", "es") as writer:
+            for doc_index, a, b, cost in model.iter_align(document_pairs):
+                writer.write(doc_index, a, b, cost)
+
+    Subclasses implement `write`.
+    """
+    __metaclass__ = abc.ABCMeta
+
+    def __init__(self, stream, language_a=None, language_b=None):
+        self.stream = stream
+        self.language_a = language_a
+        self.language_b = language_b
+        self.count = 0
+
+    def __enter__(self):
+        self.begin()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.end()
+
+    def begin(self):
+        """ Writes whatever is needed before the first alignment. """
+
+    def end(self):
+        """ Writes whatever is needed after the last alignment. """
+        self.stream.flush()
+
+    @abc.abstractmethod
+    def write(self, doc_index, sentence_a, sentence_b, cost=None):
+        """ Writes one aligned pair of `Sentence`s. """
+
+    def write_records(self, records):
+        """
+        Writes the `(doc_index, sentence_a, sentence_b, cost)` records
+        yielded by `YalignModel.iter_align`.
+        """
+        for doc_index, sentence_a, sentence_b, cost in records:
+            self.write(doc_index, sentence_a, sentence_b, cost)
+
+    def write_pairs(self, sentence_pairs, doc_index=0):
+        """ Writes the `(sentence_a, sentence_b)` pairs of one document. """
+        for sentence_a, sentence_b in sentence_pairs:
+            self.write(doc_index, sentence_a, sentence_b)
+
+
+class PlaintextWriter(AlignmentWriter):
+    """
+    Writes alternating sentences, one per line: first the sentence in
+    language A and then the sentence in language B.
+    """
+    def write(self, doc_index, sentence_a, sentence_b, cost=None):
+        self.stream.write(sentence_a.to_text())
+        self.stream.write('\n')
+        self.stream.write(sentence_b.to_text())
+        self.stream.write('\n')
+        self.count += 1
+
+
+class JSONLinesWriter(AlignmentWriter):
+    """
+    Writes one json object per line with the keys `document`, `a`, `b` and
+    `cost`.
+    """
+    def write(self, doc_index, sentence_a, sentence_b, cost=None):
+        record = {
+            "document": doc_index,
+            "a": sentence_a.to_text().decode("utf-8"),
+            "b": sentence_b.to_text().decode("utf-8"),
+            "cost": cost,
+        }
+        line = json.dumps(record, ensure_ascii=False, sort_keys=True)
+        self.stream.write(line.encode("utf-8"))
+        self.stream.write('\n')
+        self.count += 1
+
+
+class TMXWriter(AlignmentWriter):
+    """
+    Writes the alignments as the translation units of a tmx file.
+    The units are built from templates with the sentences escaped, and
+    written in blocks of at least `buffer_size` bytes.
+    """
+    def __init__(self, stream, language_a=None, language_b=None,
+                 buffer_size=BUFFER_SIZE):
+        super(TMXWriter, self).__init__(stream, language_a, language_b)
+        self.buffer_size = buffer_size
+        self._buffer = []
+        self._buffered = 0
+        self._tu_start = u"<tu>\n  <tuv{}>\n    <seg>".format(
+            _attribute("xml:lang", language_a))
+        self._tu_middle = u"</seg>\n  </tuv>\n  <tuv{}>\n    <seg>".format(
+            _attribute("xml:lang", language_b))
+        self._tu_end = u"</seg>\n  </tuv>\n</tu>\n"
+
+    def begin(self):
+        header = u"<header{} segtype=\"sentence\" creationtool=\"MTrans\" " \
+                 u"datatype=\"PlainText\"/>".format(
+                     _attribute("srclang", self.language_a))
+        self.stream.write("<?xml version=\"1.0\" ?>\n")
+        self.stream.write("<!DOCTYPE tmx SYSTEM \"tmx14.dtd\">\n")
+        self.stream.write("<tmx version=\"1.4\">\n")
+        self.stream.write(header.encode("utf-8"))
+        self.stream.write("\n<body>\n")
+
+    def write(self, doc_index, sentence_a, sentence_b, cost=None):
+        tu = u"".join((self._tu_start, _escape(_segment(sentence_a)),
+                       self._tu_middle, _escape(_segment(sentence_b)),
+                       self._tu_end)).encode("utf-8")
+        self._buffer.append(tu)
+        self._buffered += len(tu)
+        if self._buffered >= self.buffer_size:
+            self._flush()
+        self.count += 1
+
+    def _flush(self):
+        self.stream.write("".join(self._buffer))
+        self._buffer = []
+        self._buffered = 0
+
+    def end(self):
+        self._flush()
+        self.stream.write("</body>\n</tmx>")
+        super(TMXWriter, self).end()
+
+
+def _segment(sentence):
+    # The same text as `Sentence.to_text`, without encoding it
+    text = getattr(sentence, "text", None)
+    if text:
+        return text.replace(u"\n", u"").strip()
+    return u" ".join(sentence)
+
+
+def _escape(text):
+    text = text.replace(u"&", u"&amp;").replace(u"<", u"&lt;")
+    return _INVALID_XML_CHARACTERS.sub(u"", text.replace(u">", u"&gt;"))
+
+
+def _attribute(name, value):
+    if value is None:
+        return u""
+    return u" {}={}".format(name, quoteattr(value))
+
+
+WRITERS = {
+    "plaintext": PlaintextWriter,
+    "tmx": TMXWriter,
+    "jsonlines": JSONLinesWriter,
+}
+
+
+def get_writer(output_format, stream, language_a=None, language_b=None):
+    """
+    Returns a writer for `output_format` (one of the keys of `WRITERS`)
+    that writes into `stream`.
+    """
+    try:
+        writer_class = WRITERS[output_format.lower()]
+    except KeyError:
+        raise ValueError("Unknown output format: {!r}".format(output_format))
+    return writer_class(stream, language_a, language_b)
+
+
+def open_output(filepath):
+    """
+    Opens `filepath` to write the output of a writer, compressed with gzip
+    if it ends with ".gz".
+    """
+    if filepath.endswith(".gz"):
+        return gzip.open(filepath, "wb", COMPRESS_LEVEL)
+    return open(filepath, "wb")
@@ -3,27 +3,39 @@
 import os
 import json
 import random
+import logging
 try:
     import cPickle as pickle
 except ImportError:
     import pickle
 
-from yalign.evaluation import F_score
+from yalign.evaluation import F_from_precision_and_recall
+from yalign import profiling
+from yalign.parallel import submit, default_pool
 from yalign.wordpairscore import WordPairScore
 from yalign.sequencealigner import SequenceAligner
 from yalign.sentencepairscore import SentencePairScore
 from yalign.input_conversion import tmx_file_to_documents, \
-    parallel_corpus_to_documents
+    parallel_corpus_to_documents, save_sentence_splitters, \
+    load_sentence_splitters
 from yalign.train_data_generation import training_alignments_from_documents, \
                                          training_scrambling_from_documents
 
 
 OPTIMIZE_SAMPLE_SET_SIZE = 100
 RANDOM_SAMPLING_ITERATIONS = 20
+GRID_REFINEMENT_POINTS = 5
+GRID_REFINEMENT_LEVELS = 3
+GOLDEN_SECTION_ITERATIONS = 9
+DEFAULT_GAP_PENALTY_OPTIMIZER = "random"
+MIN_GAP_PENALTY = 0
+MAX_GAP_PENALTY = 0.2
+
+logger = logging.getLogger(__name__)
 
 
 def basic_model(corpus_filepath, word_scores_filepath,
-                lang_a=None, lang_b=None):
+                lang_a=None, lang_b=None, optimizer=None, compact=False):
     """
     Creates and trains a `YalignModel` with the basic configuration and
     default values.
@@ -41,14 +53,22 @@ def basic_model(corpus_filepath, word_scores_filepath,
     `lang_a` and `lang_b` are requiered for the tokenizer in the case of a tmx
     file. In the other cases is not necesary because it's assumed that the
     words are already tokenized.
+
+    `optimizer` is the name of the strategy used to search the gap penalty
+    (see `GAP_PENALTY_OPTIMIZERS`).
+
+    If `compact` is true the corpus is loaded as `Document`s, that take a
+    fraction of the memory of lists of Sentences but build a new Sentence
+    every time one is accessed (see `yalign.datatypes.Document`).
     """
     # Word score
     word_pair_score = WordPairScore(word_scores_filepath)
 
     if corpus_filepath.endswith(".tmx"):
-        A, B = tmx_file_to_documents(corpus_filepath, lang_a, lang_b)
+        A, B = tmx_file_to_documents(corpus_filepath, lang_a, lang_b,
+                                     compact)
     else:
-        A, B = parallel_corpus_to_documents(corpus_filepath)
+        A, B = parallel_corpus_to_documents(corpus_filepath, compact)
     alignments = training_alignments_from_documents(A, B)
 
     sentence_pair_score = SentencePairScore()
@@ -60,7 +80,7 @@ def basic_model(corpus_filepath, word_scores_filepath,
     document_aligner = SequenceAligner(sentence_pair_score, gap_penalty)
     model = YalignModel(document_aligner, threshold, metadata=metadata)
     A, B, correct = training_scrambling_from_documents(A[:OPTIMIZE_SAMPLE_SET_SIZE], B[:OPTIMIZE_SAMPLE_SET_SIZE])
-    model.optimize_gap_penalty_and_threshold(A, B, correct)
+    model.optimize_gap_penalty_and_threshold(A, B, correct, optimizer)
     return model
 
 
@@ -96,13 +116,18 @@ class YalignModel(object):
         self.document_pair_aligner = document_pair_aligner
         self.threshold = threshold
         self.metadata = MetadataHelper(metadata)
+        self.last_stats = None
 
     @classmethod
     def load(cls, model_directory):
         """
         This method to loads an existing YalignModel from the path to the
         folder where it's contained.
+        The sentence splitters stored with the model are loaded too, and
+        used from then on by `text_to_document` (see
+        `yalign.input_conversion.load_sentence_splitters`).
         """
+        load_sentence_splitters(model_directory)
         model = cls()
         metadata = os.path.join(model_directory, "metadata.json")
         aligner = os.path.join(model_directory, "aligner.pickle")
@@ -130,19 +155,72 @@ class YalignModel(object):
         alignments = self.align_indexes(document_a, document_b)
         return [(document_a[a], document_b[b]) for a, b in alignments]
 
+    def align_async(self, document_a, document_b, aligner=None):
+        """
+        Same as `align` but without blocking: the alignment runs in a
+        worker and an `AsyncCall` is returned, `call.get(timeout)` gives
+        the result.
+        `aligner` is the `yalign.parallel.AsyncAligner` to use (that
+        configures threads or processes, number of workers and maximum
+        number of pending alignments). By default the alignment runs in the
+        shared pool of threads of `yalign.parallel.default_pool`, that
+        `yalign.parallel.close_default_pool` shuts down.
+        """
+        if aligner is None:
+            return submit(default_pool(), self.align,
+                          (document_a, document_b))
+        return aligner.submit(document_a, document_b)
+
     def align_indexes(self, document_a, document_b):
         """
         Same as `align` but returning indexes in documents instead of
         sentences.
         """
-        alignments = self.document_pair_aligner(document_a, document_b)
-        alignments = pre_filter_alignments(alignments)
-        return apply_threshold(alignments, self.threshold)
+        alignments = self.align_costs(document_a, document_b)
+        return [(a, b) for a, b, c in alignments]
+
+    def align_costs(self, document_a, document_b):
+        """
+        Same as `align_indexes` but returning `(i, j, cost)` tuples, where
+        `cost` is the sentence pair score (lower is better).
+        """
+        with profiling.collect() as stats:
+            alignments = self.document_pair_aligner(document_a, document_b)
+            alignments = pre_filter_alignments(alignments)
+            with profiling.stage("thresholding"):
+                alignments = [(a, b, c) for a, b, c in alignments
+                              if c <= self.threshold]
+        self.last_stats = stats
+        return alignments
+
+    def iter_align(self, document_pairs):
+        """
+        Lazily aligns every `(document_a, document_b)` in the iterable
+        `document_pairs`, yielding `(doc_index, sentence_a, sentence_b, cost)`
+        records.
+        Documents are read from `document_pairs` only as they are needed, so
+        only one document pair is kept in memory at a time.
+        """
+        for doc_index, (document_a, document_b) in enumerate(document_pairs):
+            for a, b, cost in self.align_costs(document_a, document_b):
+                yield doc_index, document_a[a], document_b[b], cost
+
+    def align_corpus(self, document_pairs, writer):
+        """
+        Aligns every document pair in `document_pairs` writing the results
+        to `writer` (see `yalign.writers`) as a single output.
+        Returns the number of aligned sentence pairs written.
+        """
+        with writer:
+            writer.write_records(self.iter_align(document_pairs))
+        return writer.count
 
     def save(self, model_directory):
         """
         Store a serialization of a YalignModel instance in a given folder.
-        Metadata is stored in a separate file.
+        Metadata is stored in a separate file, and so are the sentence
+        splitters of the languages of the model (`lang_a` and `lang_b` in the
+        metadata) if they are available.
         """
         metadata = os.path.join(model_directory, "metadata.json")
         aligner = os.path.join(model_directory, "aligner.pickle")
@@ -150,9 +228,12 @@ class YalignModel(object):
         self.metadata.threshold = self.threshold
         self.metadata.penalty = self.document_pair_aligner.penalty
         json.dump(dict(self.metadata), open(metadata, "w"), indent=4)
+        languages = [self.metadata.get("lang_a"), self.metadata.get("lang_b")]
+        save_sentence_splitters(model_directory,
+                                [x for x in languages if x is not None])
 
     def optimize_gap_penalty_and_threshold(self, document_a, document_b,
-                                                              real_alignments):
+                                           real_alignments, optimizer=None):
         """
         Given documents `document_a` and `document_b` (not necesarily aligned)
         and the `real_alignments` for that documents train the YalignModel
@@ -162,13 +243,28 @@ class YalignModel(object):
         `document_b` respectively indicating that those sentences are aligned.
         Pairs not included in `real_alignments` are assumed to be wrong
         alignments.
+
+        `optimizer` is the name of the gap penalty search strategy, one of
+        the keys of `GAP_PENALTY_OPTIMIZERS`. Every evaluation of the
+        strategy costs a full alignment of the documents.
         """
+        if optimizer is None:
+            optimizer = DEFAULT_GAP_PENALTY_OPTIMIZER
+        if optimizer not in GAP_PENALTY_OPTIMIZERS:
+            raise ValueError("Unknown gap penalty optimizer: {!r}".format(
+                                                                    optimizer))
+
         def F(x):
             return score_with_best_threshold(self.document_pair_aligner,
                                              document_a, document_b,
                                              x,
                                              real_alignments)
-        _, gap_penalty = random_sampling_maximizer(F, 0, 0.2)
+        F = CountingFunction(F)
+        maximizer = GAP_PENALTY_OPTIMIZERS[optimizer]
+        score, gap_penalty = maximizer(F, MIN_GAP_PENALTY, MAX_GAP_PENALTY)
+        logger.info("Gap penalty optimizer %r used %d alignments: "
+                    "penalty=%f score=%f", optimizer, F.evaluations,
+                    gap_penalty, score)
         self.document_pair_aligner.penalty = gap_penalty
         alignments = self.document_pair_aligner(document_a, document_b)
         alignments = pre_filter_alignments(alignments)
@@ -198,23 +294,54 @@ def pre_filter_alignments(alignments):
                                                    b is not None]
 
 
+@profiling.timed("thresholding")
 def apply_threshold(alignments, threshold):
     return [(a, b) for a, b, c in alignments if c <= threshold]
 
 
-def best_threshold(real_alignments, predicted_alignments):
-    """Returns the best F score and threshold value for this gap_penalty"""
+def best_threshold(real_alignments, predicted_alignments, curve=False):
+    """
+    Returns the best F score and threshold value for this gap_penalty.
+    If `curve` is `True` the result of `threshold_curve` is returned as a
+    third value.
+    """
     if not predicted_alignments:
         raise ValueError("predicted_alignments cannot be empty")
+    points = threshold_curve(real_alignments, predicted_alignments)
+    scores = dict((threshold, score) for threshold, score, _, _ in points)
     best = -1, None
     for _, _, threshold in predicted_alignments:
-        xs = apply_threshold(predicted_alignments, threshold)
-        score = F_score(xs, real_alignments)[0]
+        score = scores[threshold]
         if score > best[0]:
             best = score, threshold
+    if curve:
+        return best[0], best[1], points
     return best
 
 
+def threshold_curve(real_alignments, predicted_alignments):
+    """
+    Returns a list of `(threshold, F, precision, recall)` for every distinct
+    cost in `predicted_alignments`, sorted by threshold.
+    The values are the ones `F_score` gives for
+    `apply_threshold(predicted_alignments, threshold)`, but all of them are
+    computed in a single pass over the sorted costs.
+    """
+    real = set(real_alignments)
+    n_real = float(len(real_alignments))
+    costs = sorted((c, (a, b) in real) for a, b, c in predicted_alignments)
+    result = []
+    hits = 0
+    for i, (cost, hit) in enumerate(costs):
+        hits += hit
+        if i + 1 < len(costs) and costs[i + 1][0] == cost:
+            continue
+        p = hits / float(i + 1)
+        r = hits / n_real if n_real else 0.
+        result.append((cost, F_from_precision_and_recall(p, r), p, r))
+    return result
+
+
 def score_with_best_threshold(aligner, xs, ys, gap_penalty, real_alignments):
     predicted_alignments = aligner(xs, ys, penalty=gap_penalty)
     predicted_alignments = pre_filter_alignments(predicted_alignments)
@@ -237,3 +364,105 @@ def random_sampling_maximizer(F, min_, max_, n=None):
         if score > best[0]:
             best = score, x
     return best
+
+
+def grid_refinement_maximizer(F, min_, max_, points=None, levels=None):
+    """
+    Coarse to fine grid search.
+    Evaluates `F` on `points` evenly spaced values of [`min_`, `max_`] and
+    then repeats the search on the interval between the neighbours of the
+    best value found, `levels` times in total.
+    Values shared between levels are evaluated only once, as well as the
+    values already known by `F` if it's a `CountingFunction`.
+    """
+    if points is None:
+        points = GRID_REFINEMENT_POINTS
+    if levels is None:
+        levels = GRID_REFINEMENT_LEVELS
+    if points < 2:
+        raise ValueError("points must be 2 or more")
+    if levels < 1:
+        raise ValueError("levels must be 1 or more")
+    if not isinstance(F, CountingFunction):
+        F = CountingFunction(F)
+    best = None
+    for _ in xrange(levels):
+        step = (max_ - min_) / float(points - 1)
+        xs = [min_ + step * i for i in xrange(points - 1)] + [max_]
+        xs = [F.known(x, step * 1e-6) for x in xs]
+        for i, x in enumerate(xs):
+            score = F(x)
+            if best is None or score > best[0]:
+                best = score, x
+                best_index = i
+            elif x == best[1]:
+                best_index = i
+        min_ = xs[max(best_index - 1, 0)]
+        max_ = xs[min(best_index + 1, points - 1)]
+    return best
+
+
+def golden_section_maximizer(F, min_, max_, n=None):
+    """
+    Golden section search with `n` evaluations of `F`.
+    Best suited for unimodal functions, but it always returns the best value
+    seen during the search.
+    """
+    if n is None:
+        n = GOLDEN_SECTION_ITERATIONS
+    if n < 2:
+        raise ValueError("n must be 2 or more")
+    ratio = (5 ** 0.5 - 1) / 2
+    a, b = min_, max_
+    c = b - ratio * (b - a)
+    d = a + ratio * (b - a)
+    fc, fd = F(c), F(d)
+    best = max((fc, c), (fd, d), key=lambda x: x[0])
+    for _ in xrange(n - 2):
+        if fc >= fd:
+            b, d, fd = d, c, fc
+            c = b - ratio * (b - a)
+            fc = F(c)
+            if fc > best[0]:
+                best = fc, c
+        else:
+            a, c, fc = c, d, fd
+            d = a + ratio * (b - a)
+            fd = F(d)
+            if fd > best[0]:
+                best = fd, d
+    return best
+
+
+GAP_PENALTY_OPTIMIZERS = {
+    "random": random_sampling_maximizer,
+    "grid": grid_refinement_maximizer,
+    "golden": golden_section_maximizer,
+}
+
+
+class CountingFunction(object):
+    """
+    Function wrapper that remembers the values already computed and counts
+    how many times the wrapped function was actually evaluated.
+    """
+    def __init__(self, f):
+        self.f = f
+        self.values = {}
+        self.evaluations = 0
+
+    def known(self, x, tolerance):
+        """
+        Returns an already evaluated value within `tolerance` of `x` if there
+        is one, otherwise `x`.
+        """
+        for y in self.values:
+            if abs(x - y) <= tolerance:
+                return y
+        return x
+
+    def __call__(self, x):
+        if x not in self.values:
+            self.values[x] = self.f(x)
+            self.evaluations += 1
+        return self.values[x]